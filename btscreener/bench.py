@@ -0,0 +1,98 @@
+import logging
+import argparse
+import os
+
+import pandas as pd
+
+from btscreener.benchmark.suite import (
+    run_benchmarks, select_benchmarks, load_baseline, save_baseline,
+    compare_results, DEFAULT_BASELINE, DEFAULT_REPEAT, DEFAULT_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+QUICK_SIZES = {
+    "bars": [252],
+    "symbols": [100],
+}
+"""dict: sizes of a quick run, keyed by size axis"""
+
+parser = argparse.ArgumentParser(description="""
+Times the indicators, backtests, calendar summaries and screener report on
+synthetic data at several history lengths and universe sizes, and compares the
+times with a stored baseline. Exits with status 1 if a benchmark is slower than
+its baseline by more than the threshold.
+""")
+
+parser.add_argument('-v', '--verbose', action='count', default=0,
+                    help="Logging verbosity level")
+parser.add_argument("-k", "--select",
+                    action="append",
+                    help="glob pattern of the benchmarks to run, e.g. "
+                         "'backtest.*' or '*[bars=252]', may be repeated")
+parser.add_argument("--quick",
+                    action="store_true",
+                    help="run only the middle history length and universe "
+                         "size")
+parser.add_argument("--list",
+                    action="store_true",
+                    help="list the benchmarks instead of running them")
+parser.add_argument("--repeat",
+                    type=int,
+                    default=DEFAULT_REPEAT,
+                    help="number of timings of each benchmark")
+parser.add_argument("--baseline",
+                    default=DEFAULT_BASELINE,
+                    help="baseline to compare with")
+parser.add_argument("--threshold",
+                    type=float,
+                    default=DEFAULT_THRESHOLD,
+                    help="ratio to the baseline time above which a benchmark "
+                         "regressed")
+parser.add_argument("--save",
+                    action="store_true",
+                    help="save the times as the new baseline instead of "
+                         "comparing with it")
+
+if __name__ == "__main__":
+    import sys
+
+    rootLogger = logging.getLogger()
+    consoleHandler = logging.StreamHandler(stream=sys.stdout)
+    consoleHandler.setFormatter(logging.Formatter())
+
+    args = parser.parse_args()
+
+    v_count = args.verbose if args.verbose < 3 else 3
+    # 0 - ERROR, 1 - WARNING, 2 - INFO, 3 - DEBUG
+    consoleHandler.setLevel(logging.ERROR - (10 * v_count))
+    rootLogger.addHandler(consoleHandler)
+    # records below the shown level would be built and dropped inside the
+    # timed calls, so they are not made at all
+    rootLogger.setLevel(consoleHandler.level)
+
+    sizes = QUICK_SIZES if args.quick else None
+    if args.list:
+        for key, _, _ in select_benchmarks(args.select, sizes=sizes):
+            print(key)
+        sys.exit(0)
+
+    results = run_benchmarks(args.select, sizes=sizes, repeat=args.repeat)
+    if args.save:
+        logger.info("Saving baseline: {}".format(args.baseline))
+        save_baseline(results, args.baseline)
+        sys.exit(0)
+
+    table = pd.DataFrame.from_dict(results, orient="index")
+    if os.path.exists(args.baseline):
+        comparison = compare_results(results, load_baseline(args.baseline),
+                                     threshold=args.threshold)
+        table = table.join(comparison[["baseline", "ratio", "regressed"]])
+    with pd.option_context('display.max_rows', None,
+                           'display.max_columns', None,
+                           'display.width', 120):
+        print(table)
+    if "regressed" in table and table["regressed"].fillna(False).any():
+        regressed = table.index[table["regressed"].fillna(False)]
+        logger.error("Regressed: {}".format(", ".join(regressed)))
+        sys.exit(1)
@@ -0,0 +1,387 @@
+"""
+Microbenchmarks of the hot paths of a collection.
+
+Every benchmark runs on deterministic synthetic data, so its timings depend on
+the code and the machine only, never on the network. Each one is timed at
+several history lengths or universe sizes, and the timings can be saved as a
+baseline that later runs are compared against to catch regressions.
+"""
+import logging
+import os
+import json
+import timeit
+import fnmatch
+import platform
+import datetime
+from collections import OrderedDict
+from functools import partial, lru_cache
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from btscreener.sources.iex import decode_dividends, decode_earnings
+from btscreener.sources.synthetic import (
+    make_synthetic_history, make_synthetic_universe, make_synthetic_symbols,
+    make_dividends_payload, make_earnings_payload
+)
+from btscreener.summary.dividends import make_dividend_summary
+from btscreener.summary.earnings import make_earnings_summary
+from btscreener.chart import kernels
+from btscreener.chart.supertrend import Supertrend
+from btscreener.chart.priceaction import WickReversalSignal
+from btscreener.chart.tdcount import TDSequential
+from btscreener.chart.adbreakout import ADBreakout
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.backtest import run_backtest
+from btscreener.chart.panel import PricePanel, summarize_panel
+from btscreener.chart.strategies.stadtd import BreakoutStrategy
+from btscreener.collector.collect import (
+    summarize_calendar, summarize_calendars
+)
+from btscreener.collector.sweep import run_strategy
+from btscreener.report.screener import make_screener_figure
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LENGTHS = [63, 252, 1260]
+"""list(int): bars of the histories, about 3 months, 1 year and 5 years"""
+
+UNIVERSE_SIZES = [10, 100, 1000]
+"""list(int): numbers of symbols in a universe"""
+
+UNIVERSE_BARS = 252
+"""int: bars of each history in a universe"""
+
+CALENDAR_DATE = datetime.date(2018, 6, 29)
+"""datetime.date: date the synthetic dividends and earnings go back from"""
+
+DEFAULT_REPEAT = 5
+"""int: default number of timings of each benchmark"""
+
+DEFAULT_MIN_TIME = 0.05
+"""float: seconds a timing lasts at least, calls are repeated until it does"""
+
+DEFAULT_THRESHOLD = 1.25
+"""float: ratio to the baseline time above which a benchmark regressed"""
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+"""str: baseline stored with the suite"""
+
+
+class _IndicatorStrategy(bt.Strategy):
+    params = (
+        ("indicator", None),
+    )
+
+    def __init__(self):
+        self.indicator = self.p.indicator()
+
+
+def run_indicator(table, indicator):
+    """
+    Runs a single indicator over a history in batch
+
+    Args:
+        table (pd.DataFrame): table of historical data
+        indicator (type): backtrader indicator class to run over it
+
+    Returns:
+        bt.Indicator: the indicator, run in batch over the preloaded data
+    """
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=table.set_index("date")))
+    cerebro.addstrategy(_IndicatorStrategy, indicator=indicator)
+    return cerebro.run(runonce=True)[0].indicator
+
+
+@lru_cache(maxsize=None)
+def make_synthetic_calendars(size):
+    """
+    Makes the decoded dividends and earnings of a synthetic universe. They
+    are made once per size and shared by the benchmarks, which only read
+    them.
+
+    Args:
+        size (int): number of tickers, as make_synthetic_symbols names them
+
+    Returns:
+        OrderedDict: dividends and earnings tables keyed by ticker, the
+            dividends being None for the tickers without any
+    """
+    return OrderedDict((symbol, (
+        decode_dividends(make_dividends_payload(symbol, today=CALENDAR_DATE)),
+        decode_earnings(make_earnings_payload(symbol, today=CALENDAR_DATE)),
+    )) for symbol in make_synthetic_symbols(size))
+
+
+def make_synthetic_collection(size, bars=UNIVERSE_BARS):
+    """
+    Collects a synthetic universe without the network
+
+    Args:
+        size (int): number of tickers
+        bars (int): bars of each history
+
+    Returns:
+        pd.DataFrame: collection table of a synthetic universe, as
+            run_panel_collection collects it
+    """
+    universe = make_synthetic_universe(size, bars)
+    chart_table = summarize_panel(PricePanel.from_tables(universe))
+    calendars = [pd.concat(summarize_calendar(*calendar)).astype(object)
+                 for calendar in make_synthetic_calendars(size).values()]
+    return chart_table.join(pd.DataFrame(calendars, index=list(universe)))
+
+
+def _indicator(indicator, bars):
+    return partial(run_indicator, make_synthetic_history(bars), indicator)
+
+
+def _kernel(kernel, fields, bars):
+    table = make_synthetic_history(bars)
+    return partial(kernel, *(table[field].values for field in fields))
+
+
+def _basket_backtest(bars, runonce=True):
+    return partial(run_backtest, make_synthetic_history(bars), BasketStrategy,
+                   runonce=runonce)
+
+
+def _breakout_backtest(bars):
+    return partial(run_strategy, make_synthetic_history(bars), {},
+                   strategy=BreakoutStrategy)
+
+
+def _panel(size):
+    panel = PricePanel.from_tables(make_synthetic_universe(size,
+                                                           UNIVERSE_BARS))
+    return partial(summarize_panel, panel)
+
+
+def _summaries(summarize, which, size):
+    calendars = make_synthetic_calendars(size)
+    tables = [calendar[which] for calendar in calendars.values()
+              if calendar[which] is not None]
+
+    def run():
+        return [summarize(table) for table in tables]
+
+    return run
+
+
+def _batch_summaries(size):
+    calendars = make_synthetic_calendars(size)
+    dividends = OrderedDict((symbol, calendar[0])
+                            for symbol, calendar in calendars.items())
+    earnings = OrderedDict((symbol, calendar[1])
+                           for symbol, calendar in calendars.items())
+    return partial(summarize_calendars, dividends, earnings)
+
+
+def _screener(size):
+    return partial(make_screener_figure, "benchmark",
+                   make_synthetic_collection(size))
+
+
+BENCHMARKS = OrderedDict([
+    ("indicator.supertrend", ("bars", partial(_indicator, Supertrend))),
+    ("indicator.wick_reversal", ("bars",
+                                 partial(_indicator, WickReversalSignal))),
+    ("indicator.td_sequential", ("bars", partial(_indicator, TDSequential))),
+    ("indicator.ad_breakout", ("bars", partial(_indicator, ADBreakout))),
+    ("kernel.ad_breakout", ("bars", partial(
+        _kernel, kernels.ad_breakout, ["open", "high", "low", "close"]))),
+    ("kernel.td_sequential", ("bars", partial(
+        _kernel, kernels.td_sequential, ["high", "low", "close"]))),
+    ("backtest.basket", ("bars", _basket_backtest)),
+    ("backtest.basket_next", ("bars", partial(_basket_backtest,
+                                              runonce=False))),
+    ("backtest.breakout", ("bars", _breakout_backtest)),
+    ("panel.summary", ("symbols", _panel)),
+    ("summary.dividends", ("symbols", partial(
+        _summaries, make_dividend_summary, 0))),
+    ("summary.earnings", ("symbols", partial(
+        _summaries, make_earnings_summary, 1))),
+    ("summary.calendars", ("symbols", _batch_summaries)),
+    ("report.screener", ("symbols", _screener)),
+])
+"""OrderedDict: size axis and setup of each benchmark keyed by name. A setup
+takes the size and returns the call to time."""
+
+SIZES = {
+    "bars": HISTORY_LENGTHS,
+    "symbols": UNIVERSE_SIZES,
+}
+"""dict: sizes each benchmark runs at, keyed by size axis"""
+
+
+def benchmark_key(name, axis, size):
+    """
+    Names a benchmark at one of its sizes
+
+    Args:
+        name (str): benchmark name
+        axis (str): size axis of the benchmark
+        size (int): size of the input
+
+    Returns:
+        str: key of the benchmark at that size, e.g.
+            "backtest.basket[bars=252]"
+    """
+    return "{}[{}={}]".format(name, axis, size)
+
+
+def select_benchmarks(patterns=None, sizes=None):
+    """
+    Picks the benchmarks to run and the sizes to run them at
+
+    Args:
+        patterns (list(str)): glob patterns of the benchmark keys to run,
+            None to run them all
+        sizes (dict): sizes keyed by size axis, instead of SIZES
+
+    Returns:
+        list(tuple): key, setup and size of each selected benchmark
+    """
+    sizes = dict(SIZES, **(sizes or {}))
+    selected = []
+    for name, (axis, setup) in BENCHMARKS.items():
+        for size in sizes[axis]:
+            key = benchmark_key(name, axis, size)
+            if patterns is None or any(fnmatch.fnmatchcase(key, pattern)
+                                       for pattern in patterns):
+                selected += [(key, setup, size)]
+    return selected
+
+
+def time_call(call, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """
+    Times a call, repeating it within each timing until the timing lasts at
+    least min_time
+
+    Args:
+        call (callable): call to time, taking no arguments
+        repeat (int): number of timings
+        min_time (float): shortest timing in seconds
+
+    Returns:
+        OrderedDict: best and median seconds per call, and the number of calls
+            in each timing
+    """
+    timer = timeit.Timer(call)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= max(2, min(10, int(min_time / max(elapsed, 1e-9)) + 1))
+    times = [elapsed] + timer.repeat(repeat=repeat - 1, number=number)
+    times = np.array(times) / number
+    return OrderedDict([
+        ("best", float(times.min())),
+        ("median", float(np.median(times))),
+        ("number", number),
+    ])
+
+
+def run_benchmarks(patterns=None, sizes=None, repeat=DEFAULT_REPEAT,
+                   min_time=DEFAULT_MIN_TIME):
+    """
+    Times the selected benchmarks one after the other
+
+    Args:
+        patterns (list(str)): glob patterns of the benchmark keys to run,
+            None to run them all
+        sizes (dict): sizes keyed by size axis, instead of SIZES
+        repeat (int): number of timings of each benchmark
+        min_time (float): shortest timing in seconds
+
+    Returns:
+        OrderedDict: time_call result of each benchmark keyed by
+            benchmark_key
+    """
+    results = OrderedDict()
+    for key, setup, size in select_benchmarks(patterns, sizes=sizes):
+        call = setup(size)
+        results[key] = time_call(call, repeat=repeat, min_time=min_time)
+        logger.info("{}: {:.6f}s".format(key, results[key]["best"]))
+    return results
+
+
+def environment():
+    """
+    Describes where the timings were taken
+
+    Returns:
+        OrderedDict: versions and machine the timings were taken with
+    """
+    return OrderedDict([
+        ("python", platform.python_version()),
+        ("numpy", np.__version__),
+        ("pandas", pd.__version__),
+        ("backtrader", bt.__version__),
+        ("machine", platform.machine()),
+        ("processor", platform.processor()),
+        ("cpus", os.cpu_count()),
+    ])
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    """
+    Stores timings as the baseline later runs are compared with
+
+    Args:
+        results (dict): run_benchmarks result
+        path (str): baseline file to write
+    """
+    baseline = OrderedDict([
+        ("date", datetime.date.today().isoformat()),
+        ("environment", environment()),
+        ("results", results),
+    ])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fobj:
+        json.dump(baseline, fobj, indent=2)
+        fobj.write("\n")
+    os.replace(tmp_path, path)
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    """
+    Reads a stored baseline
+
+    Args:
+        path (str): baseline file to read
+
+    Returns:
+        dict: date, environment and results of the baseline
+    """
+    with open(path) as fobj:
+        return json.load(fobj, object_pairs_hook=OrderedDict)
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares best times against a baseline. Benchmarks missing from either
+    side are left out.
+
+    Args:
+        results (dict): run_benchmarks result
+        baseline (dict): load_baseline result
+        threshold (float): ratio to the baseline time above which a benchmark
+            regressed
+
+    Returns:
+        pd.DataFrame: baseline and current best seconds, their ratio and
+            whether the benchmark regressed, indexed by benchmark key
+    """
+    previous = baseline["results"]
+    keys = [key for key in results if key in previous]
+    table = pd.DataFrame(OrderedDict([
+        ("baseline", [previous[key]["best"] for key in keys]),
+        ("current", [results[key]["best"] for key in keys]),
+    ]), index=pd.Index(keys, name="benchmark"))
+    table["ratio"] = table["current"] / table["baseline"]
+    table["regressed"] = table["ratio"] > threshold
+    return table
@@ -0,0 +1,87 @@
+import pytest
+import pandas as pd
+
+from btscreener.sources.synthetic import make_synthetic_universe
+from btscreener.benchmark.suite import (
+    run_benchmarks, select_benchmarks, time_call, save_baseline,
+    load_baseline, compare_results, make_synthetic_collection,
+    DEFAULT_BASELINE, BENCHMARKS
+)
+
+TINY_SIZES = {
+    "bars": [63],
+    "symbols": [3],
+}
+
+
+def test_synthetic_universe():
+    universe = make_synthetic_universe(3, 20)
+    assert list(universe) == ["S0000", "S0001", "S0002"]
+    again = make_synthetic_universe(3, 20)
+    for symbol, table in universe.items():
+        pd.testing.assert_frame_equal(table, again[symbol])
+    assert not universe["S0000"]["close"].equals(universe["S0001"]["close"])
+
+
+def test_synthetic_collection():
+    collection = make_synthetic_collection(4, bars=63)
+    assert list(collection.index) == ["S0000", "S0001", "S0002", "S0003"]
+    assert collection["stad_trend"].notnull().all()
+    assert collection["last_report_date"].notnull().all()
+
+
+def test_select_benchmarks():
+    keys = [key for key, _, _ in select_benchmarks(sizes=TINY_SIZES)]
+    assert len(keys) == len(BENCHMARKS)
+    assert "backtest.basket[bars=63]" in keys
+    assert "report.screener[symbols=3]" in keys
+    keys = [key for key, _, _ in select_benchmarks(["indicator.*"])]
+    assert keys[0] == "indicator.supertrend[bars=63]"
+    assert all(key.startswith("indicator.") for key in keys)
+
+
+def test_time_call():
+    calls = []
+    result = time_call(lambda: calls.append(None), repeat=3, min_time=0.001)
+    assert result["number"] > 1
+    assert 0 < result["best"] <= result["median"]
+    assert len(calls) >= 3 * result["number"]
+
+
+def test_run_benchmarks(tmpdir):
+    results = run_benchmarks(sizes=TINY_SIZES, repeat=1, min_time=0.0)
+    assert len(results) == len(BENCHMARKS)
+    assert all(result["best"] > 0 for result in results.values())
+
+    path = str(tmpdir.join("baseline.json"))
+    save_baseline(results, path)
+    baseline = load_baseline(path)
+    assert baseline["results"] == results
+    assert "python" in baseline["environment"]
+
+    comparison = compare_results(results, baseline)
+    assert list(comparison.index) == list(results)
+    assert (comparison["ratio"] == 1.0).all()
+    assert not comparison["regressed"].any()
+
+
+def test_compare_results():
+    baseline = {"results": {
+        "a[bars=1]": {"best": 1.0},
+        "b[bars=1]": {"best": 1.0},
+        "gone[bars=1]": {"best": 1.0},
+    }}
+    results = {
+        "a[bars=1]": {"best": 1.1},
+        "b[bars=1]": {"best": 2.0},
+        "new[bars=1]": {"best": 1.0},
+    }
+    comparison = compare_results(results, baseline, threshold=1.25)
+    assert list(comparison.index) == ["a[bars=1]", "b[bars=1]"]
+    assert list(comparison["regressed"]) == [False, True]
+
+
+def test_stored_baseline():
+    """ The stored baseline covers every benchmark at every size """
+    keys = [key for key, _, _ in select_benchmarks()]
+    assert list(load_baseline(DEFAULT_BASELINE)["results"]) == keys
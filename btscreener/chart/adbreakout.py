@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 import backtrader as bt
 
+from btscreener.tracing.spans import traced
+from .kernels import breakout_levels, write_line
 from .supertrend import Supertrend
 from .priceaction import WickReversalSignal
 
@@ -10,6 +12,13 @@ class ADBreakout(bt.Indicator):
     params = (
         ("trend_src", Supertrend),
         ("ad_src", WickReversalSignal),
+        # passed on to trend_src
+        ("factor", 3.0),
+        ("period", 7),
+        ("use_wick", True),
+        # passed on to ad_src
+        ("wick_multiplier_min", 2.5),
+        ("close_percent_max", 0.35),
     )
 
     lines = (
@@ -29,24 +38,34 @@ class ADBreakout(bt.Indicator):
         Creates a breakout alert indicator using trend and wick source
         indicators
         """
-        self.trendSrc = self.p.trend_src(self.data)
-        self.adSrc = self.p.ad_src(self.data)
-        self.distribution = bt.If(
-            self.trendSrc.lines.trend > 0, self.adSrc.lines.wick < 0, np.NaN)
-        self.accumulation = bt.If(
-            self.trendSrc.lines.trend < 0, self.adSrc.lines.wick > 0, np.NaN)
-
+        self.trendSrc = self.p.trend_src(self.data, factor=self.p.factor,
+                                         period=self.p.period,
+                                         use_wick=self.p.use_wick)
+        self.adSrc = self.p.ad_src(
+            self.data, wick_multiplier_min=self.p.wick_multiplier_min,
+            close_percent_max=self.p.close_percent_max)
         # pass thru the relevant lines from the sources
         self.lines.trend = self.trendSrc.lines.trend
         self.lines.stop = self.trendSrc.lines.stop
         self.lines.ad = self.adSrc.lines.wick
 
 
+    def distribution(self):
+        # taken bar by bar in next instead of as a bt.If line, which would be
+        # computed over every bar in runonce mode as well, where once does
+        # not need it
+        return (float(self.adSrc.lines.wick[0] < 0)
+                if self.trendSrc.lines.trend[0] > 0 else np.NaN)
+
+    def accumulation(self):
+        return (float(self.adSrc.lines.wick[0] > 0)
+                if self.trendSrc.lines.trend[0] < 0 else np.NaN)
+
     def next(self):
         if self.trendSrc.lines.trend[0] > 0:
             self.lines.support[0] = self.trendSrc.lines.stop[0]
 
-            if not pd.isnull(self.distribution[0]):
+            if not pd.isnull(self.distribution()):
                 if pd.isnull(self.lines.resistance[-1]):
                     self.lines.resistance[0] = self.data.high[0]
                 else:
@@ -63,7 +82,7 @@ class ADBreakout(bt.Indicator):
         elif self.trendSrc.lines.trend[0] < 0:
             self.lines.resistance[0] = self.trendSrc.lines.stop[0]
 
-            if not pd.isnull(self.accumulation[0]):
+            if not pd.isnull(self.accumulation()):
                 if pd.isnull(self.lines.support[-1]):
                     self.lines.support[0] = self.data.low[0]
                 else:
@@ -84,4 +103,17 @@ class ADBreakout(bt.Indicator):
         was_in_zone = was_below_resistance and was_above_support
         is_long = is_above_resistance and was_in_zone
         is_short = is_below_support and was_in_zone
-        self.lines.breakout[0] = 1 if is_long else (-1 if is_short else 0)
\ No newline at end of file
+        self.lines.breakout[0] = 1 if is_long else (-1 if is_short else 0)
+
+    @traced("indicator.adbreakout")
+    def once(self, start, end):
+        # in either trend the sources always give a distribution or an
+        # accumulation value, so the zone is the one breakout_levels tracks
+        lines = breakout_levels(
+            np.asarray(self.trendSrc.lines.trend.array[:end]),
+            np.asarray(self.trendSrc.lines.stop.array[:end]),
+            np.asarray(self.data.high.array[:end]),
+            np.asarray(self.data.low.array[:end]),
+            np.asarray(self.data0.close.array[:end]))
+        for line_name, values in lines.items():
+            write_line(getattr(self.lines, line_name), values, start, end)
@@ -3,29 +3,93 @@ from collections import OrderedDict
 import pandas as pd
 import backtrader as bt
 
-def run_backtest(table, basket):
+from btscreener.sources.store import RANGE_DAYS
+from btscreener.tracing.spans import span
+
+TIMEFRAMES = OrderedDict([
+    ("weekly", "W-FRI"),
+    ("monthly", "M"),
+])
+"""OrderedDict: pandas resampling rule of each timeframe the daily data can be
+resampled to"""
+
+RESAMPLE_FIELDS = OrderedDict([
+    ("open", "first"),
+    ("high", "max"),
+    ("low", "min"),
+    ("close", "last"),
+    ("volume", "sum"),
+])
+"""OrderedDict: how the bars of a timeframe aggregate each daily field"""
+
+def resample_history(table, rule):
+    '''
+    Resamples daily historical data to a longer timeframe
+
+    Args:
+        table (pd.DataFrame): table of daily historical data
+        rule (str): pandas resampling rule, e.g. "W-FRI"
+
+    Returns:
+        pd.DataFrame: table of the resampled bars, each one dated by its last
+            daily bar, so that the last one is the period in progress
+    '''
+    daily = table.set_index("date", drop=False)
+    grouped = daily.resample(rule)
+    fields = OrderedDict((field, how) for field, how in RESAMPLE_FIELDS.items()
+                         if field in table)
+    bars = grouped.agg(dict(fields, date="last"))
+    # periods without any trading day, e.g. a week of holidays, are dropped
+    bars = bars[bars["date"].notnull()]
+    return bars[["date"] + list(fields)].reset_index(drop=True)
+
+def run_backtest(table, basket, runonce=True, timeframes=()):
     '''
     Runs strategy against historical data
 
     Args:
         table (pd.DataFrame): table of historical data to backtest
         basket (.basket.Basket): basket strategy to use in backtest
+        runonce (bool): calculate indicators in batch over the preloaded data
+            instead of bar by bar
+        timeframes (list(str)): names of TIMEFRAMES to resample the daily
+            data to and evaluate in the same run, each added as a further
+            data feed of that name; the longer history they need is only
+            resampled, the daily feed still covers basket.get_min_period()
 
     Returns:
         pd.Series: the result of Basket.yield_summary
     '''
 
-    cerebro = bt.Cerebro()
+    with span("backtest.setup"):
+        cerebro = bt.Cerebro()
 
-    # Add an indicator that we can extract afterwards
-    cerebro.addstrategy(basket)
+        # Add an indicator that we can extract afterwards
+        cerebro.addstrategy(basket)
 
-    # Set up the data source
-    data = bt.feeds.PandasData(dataname=table.set_index("date"))
-    cerebro.adddata(data)
+        # Set up the data source
+        daily = table
+        if timeframes:
+            # the indicators are path dependent, so the daily ones would not
+            # match a backtest of the usual lookback if they ran over all of
+            # the history fetched for the other timeframes
+            start = table["date"].iloc[-1] - pd.Timedelta(
+                days=RANGE_DAYS[basket.get_min_period()])
+            daily = table[table["date"] >= start]
+        data = bt.feeds.PandasData(dataname=daily.set_index("date"))
+        cerebro.adddata(data)
+        # the daily table is resampled in process instead of being fetched
+        # again, and as preloaded data rather than with cerebro.resampledata,
+        # which would turn off runonce
+        for timeframe in timeframes:
+            resampled = resample_history(table, TIMEFRAMES[timeframe])
+            cerebro.adddata(bt.feeds.PandasData(
+                dataname=resampled.set_index("date")), name=timeframe)
 
     # Run over everything
-    result = cerebro.run()
+    with span("backtest.run"):
+        result = cerebro.run(runonce=runonce)
 
     result_strategy = result[0]
-    return pd.Series(OrderedDict(result_strategy.yield_summary()))
\ No newline at end of file
+    with span("backtest.summary"):
+        return pd.Series(OrderedDict(result_strategy.yield_summary()))
\ No newline at end of file
@@ -4,34 +4,77 @@ import backtrader as bt
 import pandas as pd
 import numpy as np
 
+from btscreener.sources.store import RANGE_DAYS
+
 from .adbreakout import ADBreakout
 from .tdcount import TDSequential
 
 
+TIMEFRAME_LOOKBACKS = OrderedDict([
+    ("weekly", "1y"),
+    ("monthly", "5y"),
+])
+"""OrderedDict: daily history needed by the indicators of each timeframe the
+daily data can be resampled to, as an IEX chart range, giving each timeframe
+about as many bars as the daily one gets from "3m" (62 days, 52 weeks, 60
+months) for the ATR of the Supertrend and the TD counts to settle"""
+
+
 class BasketStrategy(bt.Strategy):
+    """
+    Runs the indicators over the daily data, and over each timeframe the
+    daily data is resampled to as a further data feed named after it
+    """
 
     def __init__(self):
-        self.indicators = OrderedDict([
-            ("stad", ADBreakout()),
-            ("td", TDSequential()),
+        self.indicators = self.make_indicators(self.data)
+        self.timeframes = OrderedDict(
+            (data._name, (data, self.make_indicators(data)))
+            for data in self.datas[1:])
+
+    @staticmethod
+    def make_indicators(data):
+        return OrderedDict([
+            ("stad", ADBreakout(data)),
+            ("td", TDSequential(data)),
         ])
 
     @staticmethod
-    def get_min_period():
+    def get_min_period(timeframes=()):
+        """
+        Args:
+            timeframes (list(str)): timeframes of TIMEFRAME_LOOKBACKS evaluated
+                besides the daily one
+
+        Returns:
+            str: IEX chart range of daily history that is enough for every
+                timeframe
+        """
         # TODO: Compute based on self.indicators ?
-        return "3m"
+        lookbacks = ["3m"] + [TIMEFRAME_LOOKBACKS[timeframe]
+                              for timeframe in timeframes]
+        return max(lookbacks, key=RANGE_DAYS.get)
 
     def yield_summary(self):
-        yield ("datetime", self.data.datetime.datetime())
-        for field_name in self.data.lines.getlinealiases():
-            if field_name is "datetime":
+        yield from self.yield_data_summary(self.data, self.indicators)
+        # the fields of the other timeframes are prefixed with their name
+        for name, (data, indicators) in self.timeframes.items():
+            for field_name, value in self.yield_data_summary(data,
+                                                             indicators):
+                yield ("{}_{}".format(name, field_name), value)
+
+    @staticmethod
+    def yield_data_summary(data, indicators):
+        yield ("datetime", data.datetime.datetime())
+        for field_name in data.lines.getlinealiases():
+            if field_name == "datetime":
                 continue
-            line = getattr(self.data.lines, field_name)
+            line = getattr(data.lines, field_name)
             yield (field_name, line[0])
             yield ("prev_" + field_name, line[-1])
-        for indicator_name, indicator in self.indicators.items():
+        for indicator_name, indicator in indicators.items():
             for line_name in indicator.lines.getlinealiases():
                 field_name = "{}_{}".format(indicator_name, line_name)
                 line = getattr(indicator.lines, line_name)
                 yield (field_name, line[0])
-                yield ("prev_" + field_name, line[-1])
\ No newline at end of file
+                yield ("prev_" + field_name, line[-1])
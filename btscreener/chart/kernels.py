@@ -0,0 +1,370 @@
+"""
+Array implementations of the indicators in :mod:`btscreener.chart`.
+
+Each kernel takes OHLC arrays and returns the same lines as its backtrader
+counterpart in a single pass, without building a ``Cerebro``. Arrays are
+evaluated along the last axis, so a 1-d array is one price history and a 2-d
+array of shape ``(symbols, bars)`` evaluates a whole universe at once. Leading
+NaN bars in a row are treated as history that does not exist yet, which lets
+histories of different lengths share one right-aligned array.
+"""
+import array
+from collections import OrderedDict
+
+import numpy as np
+
+TD_SETUP_LENGTH = 9
+"""int: maximum length of a TD setup count"""
+
+TD_LOOKBACK = 4
+"""int: number of bars between the closes compared by the TD setup"""
+
+TD_WARMUP = TD_LOOKBACK + TD_SETUP_LENGTH - 1
+"""int: bars after which a TD count no longer depends on missing history"""
+
+
+def write_line(line, values, start, end):
+    """
+    Copies the bars ``start`` to ``end`` of a kernel result into the buffer of
+    a backtrader line in one slice assignment, for use in ``once``
+
+    Args:
+        line (bt.LineBuffer): line of an indicator
+        values (np.ndarray): kernel result covering at least ``end`` bars
+        start (int): first bar to copy
+        end (int): bar after the last one to copy
+    """
+    line.array[start:end] = array.array(
+        "d", np.asarray(values[start:end], dtype=float).tobytes())
+
+
+def _as_rows(*arrays):
+    """
+    Converts arrays of any leading shape into float 2-d arrays of
+    ``(rows, bars)``
+
+    Args:
+        arrays (np.ndarray): arrays of identical shape
+
+    Returns:
+        tuple: the leading shape followed by each array as a 2-d float array
+    """
+    arrays = [np.asarray(a, dtype=float) for a in arrays]
+    shape = arrays[0].shape
+    for a in arrays[1:]:
+        if a.shape != shape:
+            raise ValueError("Mismatched array shapes: {} != {}".format(
+                shape, a.shape))
+    return (shape,) + tuple(a.reshape(-1, shape[-1]) for a in arrays)
+
+
+def _shift(a, periods=1):
+    """
+    Shifts a 2-d array forward along the bar axis, filling with NaN
+
+    Args:
+        a (np.ndarray): 2-d array of ``(rows, bars)``
+        periods (int): number of bars to shift by
+
+    Returns:
+        np.ndarray: ``a[:, i - periods]`` at each bar ``i``
+    """
+    out = np.full_like(a, np.nan)
+    if periods < a.shape[1]:
+        out[:, periods:] = a[:, :a.shape[1] - periods]
+    return out
+
+
+def _rolling(a, period, how):
+    """
+    Computes a trailing window reduction, NaN until the window is full
+
+    Args:
+        a (np.ndarray): 2-d array of ``(rows, bars)``
+        period (int): window length
+        how (callable): reduction such as np.max, applied over the window axis
+
+    Returns:
+        np.ndarray: reduced array aligned with the last bar of each window
+    """
+    out = np.full_like(a, np.nan)
+    if period <= a.shape[1]:
+        windows = np.lib.stride_tricks.sliding_window_view(a, period, axis=1)
+        out[:, period - 1:] = how(windows, axis=-1)
+    return out
+
+
+def smoothed_average(values, period):
+    """
+    Wilder's smoothed moving average, seeded with the arithmetic mean of the
+    first full window of each row
+
+    Args:
+        values (np.ndarray): 2-d array of ``(rows, bars)``, with NaN before
+            each row's first value
+        period (int): smoothing period
+
+    Returns:
+        np.ndarray: smoothed values, NaN until ``period`` values are available
+    """
+    alpha = 1.0 / period
+    alpha1 = 1.0 - alpha
+    out = np.full_like(values, np.nan)
+    # the seed lands on the bar where each row completes its first window
+    count = np.cumsum(~np.isnan(values), axis=1)
+    seed = _rolling(values, period, np.sum) / period
+    prev = np.full(values.shape[0], np.nan)
+    for i in range(values.shape[1]):
+        prev = np.where(count[:, i] == period, seed[:, i],
+                        prev * alpha1 + values[:, i] * alpha)
+        out[:, i] = prev
+    return out
+
+
+def average_true_range(high, low, close, period=14):
+    """
+    Average true range using Wilder smoothing, as in
+    ``bt.indicators.AverageTrueRange``
+
+    Args:
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+        period (int): smoothing period
+
+    Returns:
+        np.ndarray: the average true range
+    """
+    shape, high, low, close = _as_rows(high, low, close)
+    prev_close = _shift(close)
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    return smoothed_average(true_range, period).reshape(shape)
+
+
+def supertrend(high, low, close, factor=3.0, period=7, use_wick=True):
+    """
+    Array version of :class:`btscreener.chart.supertrend.Supertrend`
+
+    Args:
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+        factor (float): ATR multiplier for the bands
+        period (int): lookback for the ATR and the high/low channel
+        use_wick (bool): use the high/low instead of the close to flip trend
+
+    Returns:
+        OrderedDict: the ``trend`` and ``stop`` lines
+    """
+    shape, high, low, close = _as_rows(high, low, close)
+    atr = average_true_range(high, low, close, period=period)
+    hl2 = (_rolling(high, period, np.max) + _rolling(low, period, np.min)) / 2.0
+    up = hl2 - factor * atr
+    down = hl2 + factor * atr
+    top, bottom = (high, low) if use_wick else (close, close)
+    trend, stop = trailing_bands(up, down, top, bottom, close)
+    return OrderedDict([
+        ("trend", trend.reshape(shape)),
+        ("stop", stop.reshape(shape)),
+    ])
+
+
+def trailing_bands(up, down, top, bottom, close):
+    """
+    Runs the Supertrend recursion over precomputed bands
+
+    The lower band only ratchets up (and the upper band only ratchets down)
+    while the previous close stays on the trend side of it. The trend flips
+    when the bar pierces the band from the previous bar.
+
+    Args:
+        up (np.ndarray): lower band candidates, NaN before the first valid bar
+        down (np.ndarray): upper band candidates
+        top (np.ndarray): values that flip the trend up when above the band
+        bottom (np.ndarray): values that flip the trend down when below it
+        close (np.ndarray): close prices
+
+    Returns:
+        tuple(np.ndarray): the trend and stop lines
+    """
+    shape, up, down, top, bottom, close = _as_rows(up, down, top, bottom, close)
+    prev_close = _shift(close)
+    trend = np.full_like(up, np.nan)
+    stop = np.full_like(up, np.nan)
+    last_up = np.full(up.shape[0], np.nan)
+    last_down = np.full(up.shape[0], np.nan)
+    last_trend = np.full(up.shape[0], np.nan)
+    for i in range(up.shape[1]):
+        valid = ~np.isnan(up[:, i])
+        trend_up = np.where(prev_close[:, i] > last_up,
+                            np.maximum(up[:, i], last_up), up[:, i])
+        trend_down = np.where(prev_close[:, i] < last_down,
+                              np.minimum(down[:, i], last_down), down[:, i])
+        current = np.where(
+            top[:, i] > last_down, 1.0,
+            np.where(bottom[:, i] < last_up, -1.0,
+                     np.where(np.isnan(last_trend), 1.0, last_trend)))
+        last_up = np.where(valid, trend_up, last_up)
+        last_down = np.where(valid, trend_down, last_down)
+        last_trend = np.where(valid, current, last_trend)
+        trend[:, i] = np.where(valid, current, np.nan)
+        stop[:, i] = np.where(valid, np.where(current == 1.0,
+                                              trend_up, trend_down), np.nan)
+    return trend.reshape(shape), stop.reshape(shape)
+
+
+def wick_reversal(open, high, low, close, wick_multiplier_min=2.5,
+                  close_percent_max=0.35):
+    """
+    Array version of :class:`btscreener.chart.priceaction.WickReversalSignal`
+
+    Args:
+        open (np.ndarray): open prices
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+        wick_multiplier_min (float): minimum wick size relative to the body
+        close_percent_max (float): how far into the range the close may be
+
+    Returns:
+        OrderedDict: the ``wick`` line, the low of a bullish reversal wick, the
+            high of a bearish one and NaN otherwise
+    """
+    open, high, low, close = (np.asarray(a, dtype=float)
+                              for a in (open, high, low, close))
+    wick_range = high - low
+    body_high = np.maximum(close, open)
+    body_low = np.minimum(close, open)
+    body_range = body_high - body_low
+    wick_buy = (body_low - low) >= (wick_multiplier_min * body_range)
+    wick_sell = (high - body_high) >= (wick_multiplier_min * body_range)
+    # same guard as the indicator, if wick range = 0 then close - low = 0 too
+    close_percent = (close - low) / np.where(wick_range == 0.0, 0.1, wick_range)
+    close_buy = close_percent >= (1 - close_percent_max)
+    close_sell = close_percent <= close_percent_max
+    wick = np.where(wick_buy & close_buy, low,
+                    np.where(wick_sell & close_sell, high, np.nan))
+    return OrderedDict([
+        ("wick", wick),
+    ])
+
+
+def ad_breakout(open, high, low, close, trend_args=None, ad_args=None):
+    """
+    Array version of :class:`btscreener.chart.adbreakout.ADBreakout` using the
+    default Supertrend and WickReversalSignal sources
+
+    Args:
+        open (np.ndarray): open prices
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+        trend_args (dict): keyword arguments for :func:`supertrend`
+        ad_args (dict): keyword arguments for :func:`wick_reversal`
+
+    Returns:
+        OrderedDict: the ``trend``, ``stop``, ``ad``, ``resistance``,
+            ``support`` and ``breakout`` lines
+    """
+    trend_lines = supertrend(high, low, close, **(trend_args or {}))
+    ad_lines = wick_reversal(open, high, low, close, **(ad_args or {}))
+    levels = breakout_levels(trend_lines["trend"], trend_lines["stop"],
+                             high, low, close)
+    return OrderedDict([
+        ("trend", trend_lines["trend"]),
+        ("stop", trend_lines["stop"]),
+        ("ad", ad_lines["wick"]),
+        ("resistance", levels["resistance"]),
+        ("support", levels["support"]),
+        ("breakout", levels["breakout"]),
+    ])
+
+
+def breakout_levels(trend, stop, high, low, close):
+    """
+    Tracks the support/resistance zone around a trend and flags closes that
+    break out of it
+
+    In an uptrend the stop is the support and resistance is the highest high
+    since the trend started. A downtrend mirrors this with the lowest low.
+
+    Args:
+        trend (np.ndarray): trend line, NaN before the first valid bar
+        stop (np.ndarray): stop line of the trend
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+
+    Returns:
+        OrderedDict: the ``resistance``, ``support`` and ``breakout`` lines
+    """
+    shape, trend, stop, high, low, close = _as_rows(
+        trend, stop, high, low, close)
+    resistance = np.full_like(trend, np.nan)
+    support = np.full_like(trend, np.nan)
+    last_resistance = np.full(trend.shape[0], np.nan)
+    last_support = np.full(trend.shape[0], np.nan)
+    for i in range(trend.shape[1]):
+        bull = trend[:, i] > 0
+        bear = trend[:, i] < 0
+        last_resistance = np.where(
+            bull, np.fmax(high[:, i], last_resistance),
+            np.where(bear, stop[:, i], np.nan))
+        last_support = np.where(
+            bear, np.fmin(low[:, i], last_support),
+            np.where(bull, stop[:, i], np.nan))
+        resistance[:, i] = last_resistance
+        support[:, i] = last_support
+
+    prev_close = _shift(close)
+    prev_resistance = _shift(resistance)
+    prev_support = _shift(support)
+    was_in_zone = (prev_close < prev_resistance) & (prev_close > prev_support)
+    is_long = (close > prev_resistance) & was_in_zone
+    is_short = (close < prev_support) & was_in_zone
+    breakout = np.where(is_long, 1.0, np.where(is_short, -1.0, 0.0))
+    breakout[np.isnan(trend)] = np.nan
+    return OrderedDict([
+        ("resistance", resistance.reshape(shape)),
+        ("support", support.reshape(shape)),
+        ("breakout", breakout.reshape(shape)),
+    ])
+
+
+def td_sequential(high, low, close):
+    """
+    Array version of :class:`btscreener.chart.tdcount.TDSequential`
+
+    Bars without a close four bars back count as neither up nor down.
+
+    Args:
+        high (np.ndarray): high prices
+        low (np.ndarray): low prices
+        close (np.ndarray): close prices
+
+    Returns:
+        OrderedDict: the ``count`` and ``reversal`` lines
+    """
+    shape, high, low, close = _as_rows(high, low, close)
+    base = np.nan_to_num(np.sign(close - _shift(close, TD_LOOKBACK)))
+
+    # length of the run of identical bases ending at each bar
+    bars = np.arange(base.shape[1])
+    run_start = np.ones(base.shape, dtype=bool)
+    run_start[:, 1:] = base[:, 1:] != base[:, :-1]
+    last_start = np.maximum.accumulate(np.where(run_start, bars, 0), axis=1)
+    run = bars - last_start + 1
+    count = base * np.minimum(run, TD_SETUP_LENGTH)
+
+    ta_up = (base == 1.0) & (high > _shift(high, 2))
+    ta_down = (base == -1.0) & (low < _shift(low, 2))
+    ta = ta_up.astype(float) - ta_down.astype(float)
+    reversal = np.where(np.abs(count) > TD_SETUP_LENGTH - 2, ta, 0.0)
+
+    missing = np.isnan(close)
+    count[missing] = np.nan
+    reversal[missing] = np.nan
+    return OrderedDict([
+        ("count", count.reshape(shape)),
+        ("reversal", reversal.reshape(shape)),
+    ])
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from .kernels import ad_breakout, td_sequential
+
+PANEL_FIELDS = ("open", "high", "low", "close", "volume")
+"""tuple(str): price fields stored in a PricePanel, in storage order"""
+
+SUMMARY_DATA_FIELDS = [field_name for field_name
+                       in bt.feeds.PandasData.lines.getlinealiases()
+                       if field_name != "datetime"]
+"""list(str): data lines reported by BasketStrategy.yield_summary"""
+
+
+class PricePanel(object):
+    """
+    OHLCV histories for many symbols on one aligned trading calendar.
+
+    Values are stored as a ``(symbols, dates, fields)`` array. Bars that a
+    symbol does not have (before its listing, during a halt, or simply missing
+    from its feed) are NaN and False in ``mask``.
+    """
+
+    def __init__(self, symbols, dates, values, mask=None):
+        """
+        Args:
+            symbols (list(str)): symbols along the first axis
+            dates (pd.DatetimeIndex): trading calendar along the second axis
+            values (np.ndarray): array of ``(symbols, dates, PANEL_FIELDS)``
+            mask (np.ndarray): boolean ``(symbols, dates)`` array of bars that
+                exist, defaults to the bars with a close
+        """
+        self.symbols = list(symbols)
+        self.dates = pd.DatetimeIndex(dates)
+        self.values = np.asarray(values, dtype=float)
+        expected = (len(self.symbols), len(self.dates), len(PANEL_FIELDS))
+        if self.values.shape != expected:
+            raise ValueError("Expected panel values of shape {}, got {}".format(
+                expected, self.values.shape))
+        if mask is None:
+            mask = ~np.isnan(self.field("close"))
+        self.mask = np.asarray(mask, dtype=bool)
+
+    @classmethod
+    def from_tables(cls, tables):
+        """
+        Aligns historical tables onto the union of their dates
+
+        Args:
+            tables (dict): load_historical tables keyed by symbol
+
+        Returns:
+            PricePanel: the aligned panel
+        """
+        symbols = list(tables)
+        dates = pd.DatetimeIndex(sorted(set().union(
+            *(table["date"] for table in tables.values()))))
+        values = np.full((len(symbols), len(dates), len(PANEL_FIELDS)), np.nan)
+        mask = np.zeros((len(symbols), len(dates)), dtype=bool)
+        for row, table in enumerate(tables.values()):
+            columns = dates.get_indexer(table["date"])
+            values[row, columns] = table[list(PANEL_FIELDS)].values
+            mask[row, columns] = True
+        return cls(symbols, dates, values, mask)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def field(self, field_name):
+        """
+        Args:
+            field_name (str): one of PANEL_FIELDS
+
+        Returns:
+            np.ndarray: ``(symbols, dates)`` array of the field
+        """
+        return self.values[..., PANEL_FIELDS.index(field_name)]
+
+    def right_aligned(self):
+        """
+        Packs each symbol's existing bars against the end of the calendar, so
+        missing bars are skipped the same way a per-symbol feed skips them
+
+        Returns:
+            tuple: ``(symbols, bars, fields)`` values with NaN padding on the
+                left, and the ``(symbols, bars)`` datetime64 of each bar
+        """
+        counts = self.mask.sum(axis=1)
+        width = counts.max() if len(self) else 0
+        rows, columns = np.nonzero(self.mask)
+        targets = (width - counts[rows]) + (
+            np.cumsum(self.mask, axis=1)[rows, columns] - 1)
+        values = np.full((len(self), width, len(PANEL_FIELDS)), np.nan)
+        values[rows, targets] = self.values[rows, columns]
+        dates = np.full((len(self), width), np.datetime64("NaT"),
+                        dtype="datetime64[ns]")
+        dates[rows, targets] = self.dates.values[columns]
+        return values, dates
+
+
+def _latest(line, ago=0):
+    """
+    Reads the value of a right-aligned ``(symbols, bars)`` line, like
+    ``line[-ago]`` on a backtrader line
+
+    Args:
+        line (np.ndarray): right-aligned line
+        ago (int): number of bars back from the last bar
+
+    Returns:
+        np.ndarray: one value per symbol
+    """
+    if line.shape[1] <= ago:
+        return np.full(line.shape[0], np.nan)
+    return line[:, -1 - ago]
+
+
+def run_panel_indicators(panel):
+    """
+    Evaluates the BasketStrategy indicators for every symbol of a panel
+
+    Args:
+        panel (PricePanel): price data to evaluate
+
+    Returns:
+        tuple: the right-aligned values and dates of the panel and an
+            OrderedDict of indicator lines keyed like BasketStrategy.indicators
+    """
+    values, dates = panel.right_aligned()
+    o, h, l, c = (values[..., PANEL_FIELDS.index(field_name)]
+                  for field_name in ("open", "high", "low", "close"))
+    indicators = OrderedDict([
+        ("stad", ad_breakout(o, h, l, c)),
+        ("td", td_sequential(h, l, c)),
+    ])
+    return values, dates, indicators
+
+
+def summarize_panel(panel):
+    """
+    Produces the BasketStrategy.yield_summary fields for every symbol of a
+    panel in one vectorized pass
+
+    Args:
+        panel (PricePanel): price data to summarize
+
+    Returns:
+        pd.DataFrame: one row of summary fields per symbol
+    """
+    values, dates, indicators = run_panel_indicators(panel)
+    no_data = np.full(len(panel), np.nan)
+    columns = OrderedDict()
+    columns["datetime"] = (dates[:, -1] if dates.shape[1]
+                           else np.full(len(panel), np.datetime64("NaT")))
+    for field_name in SUMMARY_DATA_FIELDS:
+        if field_name in PANEL_FIELDS:
+            line = values[..., PANEL_FIELDS.index(field_name)]
+            columns[field_name] = _latest(line)
+            columns["prev_" + field_name] = _latest(line, 1)
+        else:
+            columns[field_name] = no_data
+            columns["prev_" + field_name] = no_data
+    for indicator_name, lines in indicators.items():
+        for line_name, line in lines.items():
+            field_name = "{}_{}".format(indicator_name, line_name)
+            columns[field_name] = _latest(line)
+            columns["prev_" + field_name] = _latest(line, 1)
+    return pd.DataFrame(columns, index=panel.symbols)
@@ -0,0 +1,451 @@
+"""
+Incremental evaluation of the BasketStrategy indicators.
+
+Supertrend, ADBreakout and TDSequential only depend on a few running values
+and on the last handful of bars, so instead of replaying a whole lookback
+every day, a BasketState keeps those values and advances them one bar at a
+time. The state of each symbol is saved by a StateStore at the end of a run
+and advanced by the new bars on the next one.
+
+The indicators are path dependent: the Supertrend bands ratchet and its ATR
+is seeded from the first bars, so a state carried over from an earlier start
+does not give exactly the values of a backtest of today's lookback. The stops
+differ slightly, and now and then the trend or a breakout does too. A saved
+state is replayed from the history once it reaches back more than
+REPLAY_MARGIN bars before it, which bounds how long it drifts apart.
+"""
+import logging
+import os
+import json
+import math
+import datetime
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from .kernels import TD_LOOKBACK, TD_SETUP_LENGTH
+from .panel import PANEL_FIELDS, SUMMARY_DATA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+"""int: format of saved states, bumped when the step changes"""
+
+ADJUSTMENT_TOLERANCE = 1e-6
+"""float: relative change in a remembered bar that marks a history as adjusted"""
+
+REPLAY_MARGIN = 21
+"""int: bars a saved state may reach back before the history it is advanced
+by, before it is replayed from that history instead"""
+
+
+def _max(a, b):
+    # like np.maximum, NaN wins
+    return np.nan if math.isnan(a) or math.isnan(b) else max(a, b)
+
+
+def _min(a, b):
+    # like np.minimum, NaN wins
+    return np.nan if math.isnan(a) or math.isnan(b) else min(a, b)
+
+
+def _fmax(a, b):
+    # like np.fmax, NaN loses
+    return b if math.isnan(a) else (a if math.isnan(b) else max(a, b))
+
+
+def _fmin(a, b):
+    # like np.fmin, NaN loses
+    return b if math.isnan(a) else (a if math.isnan(b) else min(a, b))
+
+
+class BasketState(object):
+    """
+    Running state of the BasketStrategy indicators of one symbol.
+
+    Advancing a fresh state over a history gives the same lines as the
+    kernels in :mod:`btscreener.chart.kernels` over that history. Advancing it
+    further by new bars gives the lines of the longer history, without going
+    over the old bars again.
+    """
+
+    def __init__(self, factor=3.0, period=7, use_wick=True,
+                 wick_multiplier_min=2.5, close_percent_max=0.35):
+        """
+        Args:
+            factor (float): Supertrend ATR multiplier
+            period (int): Supertrend ATR and channel period
+            use_wick (bool): flip the Supertrend on the high/low
+            wick_multiplier_min (float): WickReversalSignal wick to body ratio
+            close_percent_max (float): WickReversalSignal close position
+        """
+        self.params = OrderedDict([
+            ("factor", factor),
+            ("period", period),
+            ("use_wick", use_wick),
+            ("wick_multiplier_min", wick_multiplier_min),
+            ("close_percent_max", close_percent_max),
+        ])
+        # dates and PANEL_FIELDS of the bars the windows still need
+        self.bars = deque(maxlen=max(period, TD_LOOKBACK + 1))
+        self.count = 0
+        # Supertrend
+        self.true_ranges = []
+        self.atr = np.nan
+        self.last_up = np.nan
+        self.last_down = np.nan
+        self.last_trend = np.nan
+        # ADBreakout
+        self.last_resistance = np.nan
+        self.last_support = np.nan
+        # TDSequential
+        self.td_base = None
+        self.td_run = 0
+        # lines of the last two bars
+        self.lines = None
+        self.prev_lines = None
+
+    @property
+    def last_date(self):
+        """
+        Returns:
+            pd.Timestamp: date of the last bar advanced over, or None
+        """
+        return pd.Timestamp(self.bars[-1][0]) if self.bars else None
+
+    @classmethod
+    def replay(cls, table, **params):
+        """
+        Args:
+            table (pd.DataFrame): historical table with a date column
+            **params: indicator parameters, as for BasketState
+
+        Returns:
+            BasketState: a fresh state advanced over the whole table
+        """
+        state = cls(**params)
+        state.advance(table)
+        return state
+
+    def advance(self, table):
+        """
+        Advances the state over new bars
+
+        Args:
+            table (pd.DataFrame): historical table with a date column, holding
+                only bars after last_date
+        """
+        table = table.sort_values("date")
+        dates = pd.to_datetime(table["date"]).dt.strftime("%Y-%m-%d").values
+        values = table[list(PANEL_FIELDS)].values.astype(float)
+        for date, bar in zip(dates, values):
+            self.step(date, *bar)
+
+    def step(self, date, open, high, low, close, volume):
+        """
+        Advances the state by one bar
+
+        Args:
+            date (str): date of the bar, as "YYYY-MM-DD"
+            open (float): open price
+            high (float): high price
+            low (float): low price
+            close (float): close price
+            volume (float): traded volume
+        """
+        p = self.params
+        period = p["period"]
+        prev_close = self.bars[-1][4] if self.bars else np.nan
+        prev_lines = self.lines
+        self.bars.append((date, open, high, low, close, volume))
+        self.count += 1
+
+        # Supertrend: Wilder ATR, seeded with the mean of the first window
+        true_range = _max(high, prev_close) - _min(low, prev_close)
+        if not math.isnan(true_range):
+            if len(self.true_ranges) < period:
+                self.true_ranges.append(true_range)
+                if len(self.true_ranges) == period:
+                    self.atr = np.sum(self.true_ranges) / period
+            else:
+                alpha = 1.0 / period
+                self.atr = self.atr * (1.0 - alpha) + true_range * alpha
+        if len(self.bars) >= period:
+            window = list(self.bars)[-period:]
+            hl2 = (max(bar[2] for bar in window) +
+                   min(bar[3] for bar in window)) / 2.0
+        else:
+            hl2 = np.nan
+        up = hl2 - p["factor"] * self.atr
+        down = hl2 + p["factor"] * self.atr
+
+        trend = stop = np.nan
+        if not math.isnan(up):
+            trend_up = (max(up, self.last_up) if prev_close > self.last_up
+                        else up)
+            trend_down = (min(down, self.last_down)
+                          if prev_close < self.last_down else down)
+            top, bottom = (high, low) if p["use_wick"] else (close, close)
+            if top > self.last_down:
+                trend = 1.0
+            elif bottom < self.last_up:
+                trend = -1.0
+            elif math.isnan(self.last_trend):
+                trend = 1.0
+            else:
+                trend = self.last_trend
+            self.last_up = trend_up
+            self.last_down = trend_down
+            self.last_trend = trend
+            stop = trend_up if trend == 1.0 else trend_down
+
+        # WickReversalSignal
+        wick_range = high - low
+        body_high = max(close, open)
+        body_low = min(close, open)
+        body_range = body_high - body_low
+        close_percent = (close - low) / (0.1 if wick_range == 0.0
+                                         else wick_range)
+        if ((body_low - low) >= p["wick_multiplier_min"] * body_range and
+                close_percent >= 1 - p["close_percent_max"]):
+            wick = low
+        elif ((high - body_high) >= p["wick_multiplier_min"] * body_range and
+                close_percent <= p["close_percent_max"]):
+            wick = high
+        else:
+            wick = np.nan
+
+        # ADBreakout levels
+        bull = trend > 0
+        bear = trend < 0
+        self.last_resistance = (_fmax(high, self.last_resistance) if bull
+                                else (stop if bear else np.nan))
+        self.last_support = (_fmin(low, self.last_support) if bear
+                             else (stop if bull else np.nan))
+        if math.isnan(trend):
+            breakout = np.nan
+        else:
+            prev_resistance = (prev_lines["stad_resistance"]
+                               if prev_lines else np.nan)
+            prev_support = prev_lines["stad_support"] if prev_lines else np.nan
+            in_zone = prev_support < prev_close < prev_resistance
+            if in_zone and close > prev_resistance:
+                breakout = 1.0
+            elif in_zone and close < prev_support:
+                breakout = -1.0
+            else:
+                breakout = 0.0
+
+        # TDSequential
+        if len(self.bars) > TD_LOOKBACK:
+            lookback_close = self.bars[-1 - TD_LOOKBACK][4]
+            base = float(np.nan_to_num(np.sign(close - lookback_close)))
+        else:
+            base = 0.0
+        self.td_run = self.td_run + 1 if base == self.td_base else 1
+        self.td_base = base
+        count = base * min(self.td_run, TD_SETUP_LENGTH)
+        high_2 = self.bars[-3][2] if len(self.bars) > 2 else np.nan
+        low_2 = self.bars[-3][3] if len(self.bars) > 2 else np.nan
+        ta = (1.0 if base == 1.0 and high > high_2 else 0.0) - (
+            1.0 if base == -1.0 and low < low_2 else 0.0)
+        reversal = ta if abs(count) > TD_SETUP_LENGTH - 2 else 0.0
+
+        self.prev_lines = prev_lines
+        self.lines = OrderedDict([
+            ("stad_trend", trend),
+            ("stad_stop", stop),
+            ("stad_ad", wick),
+            ("stad_resistance", self.last_resistance),
+            ("stad_support", self.last_support),
+            ("stad_breakout", breakout),
+            ("td_count", count),
+            ("td_reversal", reversal),
+        ])
+
+    def matches(self, table):
+        """
+        Checks that a history still agrees with the bars the state remembers,
+        which it does not after a split or dividend adjustment
+
+        Args:
+            table (pd.DataFrame): historical table with a date column
+
+        Returns:
+            bool: whether the history contains the remembered bars unchanged
+        """
+        if not self.bars:
+            return False
+        dates = pd.to_datetime(table["date"]).dt.strftime("%Y-%m-%d")
+        remembered = pd.DataFrame([bar[1:] for bar in self.bars],
+                                  index=[bar[0] for bar in self.bars],
+                                  columns=PANEL_FIELDS)
+        current = table.set_index(dates.values).reindex(remembered.index)
+        fields = ["open", "high", "low", "close"]
+        values = current[fields].values.astype(float)
+        if np.isnan(values).any():
+            return False
+        return np.allclose(values, remembered[fields].values,
+                           rtol=ADJUSTMENT_TOLERANCE)
+
+    def summary(self):
+        """
+        Returns:
+            pd.Series: the fields of BasketStrategy.yield_summary for the last
+                bar
+        """
+        last = self.bars[-1]
+        prev = self.bars[-2] if len(self.bars) > 1 else None
+        fields = OrderedDict()
+        fields["datetime"] = datetime.datetime.strptime(last[0], "%Y-%m-%d")
+        for field_name in SUMMARY_DATA_FIELDS:
+            if field_name in PANEL_FIELDS:
+                index = PANEL_FIELDS.index(field_name) + 1
+                fields[field_name] = last[index]
+                fields["prev_" + field_name] = (prev[index] if prev
+                                                else np.nan)
+            else:
+                fields[field_name] = np.nan
+                fields["prev_" + field_name] = np.nan
+        for field_name, value in self.lines.items():
+            fields[field_name] = value
+            fields["prev_" + field_name] = (self.prev_lines[field_name]
+                                            if self.prev_lines else np.nan)
+        return pd.Series(fields)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON serializable form of the state
+        """
+        return {
+            "version": STATE_VERSION,
+            "params": self.params,
+            "bars": list(self.bars),
+            "count": self.count,
+            "true_ranges": self.true_ranges,
+            "atr": self.atr,
+            "last_up": self.last_up,
+            "last_down": self.last_down,
+            "last_trend": self.last_trend,
+            "last_resistance": self.last_resistance,
+            "last_support": self.last_support,
+            "td_base": self.td_base,
+            "td_run": self.td_run,
+            "lines": self.lines,
+            "prev_lines": self.prev_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Args:
+            data (dict): a to_dict result
+
+        Returns:
+            BasketState: the restored state, or None if it was saved in an
+                older format
+        """
+        if data.get("version") != STATE_VERSION:
+            return None
+        state = cls(**data["params"])
+        state.bars.extend(tuple(bar) for bar in data["bars"])
+        for key in ["count", "true_ranges", "atr", "last_up", "last_down",
+                    "last_trend", "last_resistance", "last_support",
+                    "td_base", "td_run"]:
+            setattr(state, key, data[key])
+        state.lines = (OrderedDict(data["lines"]) if data["lines"]
+                       else None)
+        state.prev_lines = (OrderedDict(data["prev_lines"])
+                            if data["prev_lines"] else None)
+        return state
+
+
+class StateStore(object):
+    """
+    Saved BasketState of each symbol, one small JSON file per symbol.
+
+    Files are written to a temporary name and renamed into place, so readers in
+    other processes never see a partial file.
+    """
+
+    def __init__(self, root, **params):
+        """
+        Args:
+            root (str): directory to keep the states in, created if needed
+            **params: indicator parameters, as for BasketState
+        """
+        self.root = root
+        self.params = params
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return "StateStore({!r})".format(self.root)
+
+    def _path(self, symbol):
+        return os.path.join(self.root, "{}.state.json".format(symbol.upper()))
+
+    def read(self, symbol):
+        """
+        Args:
+            symbol (str): stock ticker
+
+        Returns:
+            BasketState: the saved state, or None if there is no usable one
+        """
+        try:
+            with open(self._path(symbol)) as fobj:
+                return BasketState.from_dict(json.load(fobj))
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+
+    def write(self, symbol, state):
+        """
+        Args:
+            symbol (str): stock ticker
+            state (BasketState): state to save
+        """
+        path = self._path(symbol)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as fobj:
+            json.dump(state.to_dict(), fobj)
+        os.replace(tmp_path, path)
+
+    def advance(self, symbol, table):
+        """
+        Brings a symbol's state up to the end of a history and saves it
+
+        Only the bars after the saved state are stepped over, so the lines
+        are those of a backtest starting where the state started, not at the
+        start of the history. The whole history is replayed instead when
+        there is no saved state, its parameters changed, the history no
+        longer reaches back to it, the history disagrees with the bars it
+        remembers, or the state would reach back more than REPLAY_MARGIN bars
+        before the history.
+
+        Args:
+            symbol (str): stock ticker
+            table (pd.DataFrame): historical table with a date column
+
+        Returns:
+            BasketState: the state at the last bar of the history
+        """
+        state = self.read(symbol)
+        params = BasketState(**self.params).params
+        new_bars = None
+        if state is not None and state.params == params and (
+                state.matches(table)):
+            new_bars = table[pd.to_datetime(table["date"]) > state.last_date]
+            if state.count + len(new_bars.index) > (
+                    len(table.index) + REPLAY_MARGIN):
+                new_bars = None
+        if new_bars is None:
+            logger.info("Replaying the indicators of {}".format(symbol))
+            state = BasketState.replay(table, **self.params)
+        else:
+            logger.debug("Advancing the indicators of {} by {} bars".format(
+                symbol, len(new_bars.index)))
+            state.advance(new_bars)
+        self.write(symbol, state)
+        return state
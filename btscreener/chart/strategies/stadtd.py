@@ -18,10 +18,20 @@ class BreakoutStrategy(bt.Strategy):
     params = (
         ("breakout_src", ADBreakout),
         ("max_entry_td", -1),
+        # passed on to breakout_src
+        ("factor", 3.0),
+        ("period", 7),
+        ("use_wick", True),
+        ("wick_multiplier_min", 2.5),
+        ("close_percent_max", 0.35),
     )
 
     def __init__(self):
-        self.breakout = self.p.breakout_src(self.data)
+        self.breakout = self.p.breakout_src(
+            self.data, factor=self.p.factor, period=self.p.period,
+            use_wick=self.p.use_wick,
+            wick_multiplier_min=self.p.wick_multiplier_min,
+            close_percent_max=self.p.close_percent_max)
         self.td = TDSequential(self.data)
 
         self.driver = BreakoutDriver(self)
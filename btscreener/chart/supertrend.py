@@ -1,6 +1,8 @@
 import numpy as np
 import backtrader as bt
 
+from btscreener.tracing.spans import traced
+
 
 class Supertrend(bt.Indicator):
     params = (
@@ -52,4 +54,44 @@ class Supertrend(bt.Indicator):
         self.last_trend_down = trend_down
 
         self.lines.trend[0] = trend
-        self.lines.stop[0] = trend_up if self.lines.trend[0] == 1.0 else trend_down
\ No newline at end of file
+        self.lines.stop[0] = trend_up if self.lines.trend[0] == 1.0 else trend_down
+
+    @traced("indicator.supertrend")
+    def once(self, start, end):
+        up = self.up.array
+        down = self.down.array
+        high = self.data.high.array
+        low = self.data.low.array
+        close = self.data.close.array
+        trend_array = self.lines.trend.array
+        stop_array = self.lines.stop.array
+
+        for i in range(start, end):
+            trend_up = (
+                max(up[i], self.last_trend_up)
+                if close[i - 1] > self.last_trend_up
+                else up[i]
+            )
+
+            trend_down = (
+                min(down[i], self.last_trend_down)
+                if close[i - 1] < self.last_trend_down
+                else down[i]
+            )
+
+            top_value = high[i] if self.p.use_wick else close[i]
+            bottom_value = low[i] if self.p.use_wick else close[i]
+            if top_value > self.last_trend_down:
+                trend = 1
+            elif bottom_value < self.last_trend_up:
+                trend = -1
+            elif np.isnan(trend_array[i - 1]):
+                trend = 1
+            else:
+                trend = trend_array[i - 1]
+
+            self.last_trend_up = trend_up
+            self.last_trend_down = trend_down
+
+            trend_array[i] = trend
+            stop_array[i] = trend_up if trend == 1.0 else trend_down
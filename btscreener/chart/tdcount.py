@@ -1,5 +1,11 @@
+import numpy as np
 import backtrader as bt
 
+from btscreener.tracing.spans import traced
+from .kernels import (
+    td_sequential, write_line, TD_LOOKBACK, TD_SETUP_LENGTH
+)
+
 
 class TDSequential(bt.Indicator):
 
@@ -19,27 +25,50 @@ class TDSequential(bt.Indicator):
     )
 
     def td_base(self, bar):
+        if len(self.data) <= bar + TD_LOOKBACK:
+            # no close to compare against yet, so there is no setup
+            return 0
         up = 1 if self.data.close[-bar] > self.data.close[-bar-4] else 0
         dn = -1 if self.data.close[-bar] < self.data.close[-bar-4] else 0
         return up + dn
 
-    def ta_base(self, bar):
-        up = 1.0 if (self.td_base(bar) == 1.0 and (
+    def ta_base(self, bar, td=None):
+        td = self.td_base(bar) if td is None else td
+        up = 1.0 if (td == 1.0 and (
                 self.data.high[-bar] > self.data.high[-bar-2])) else 0
-        dn = -1.0 if (self.td_base(bar) == -1.0 and (
+        dn = -1.0 if (td == -1.0 and (
                 self.data.low[-bar] < self.data.low[-bar-2])) else 0
         return up + dn
 
     def nextstart(self):
-        self.lines.count[0] = 0
+        # the count is carried from bar to bar as the length of the current
+        # run of identical td_base values
+        self.last_td = None
+        self.run_length = 0
+        self.counted = 0
+        self.next()
 
     def next(self):
+        if self.counted != len(self):
+            # on a data slower than the strategy's clock, next is called again
+            # for the same bar until it completes, so the run carried over is
+            # the one the previous bar ended with
+            self.prev_td, self.prev_run_length = self.last_td, self.run_length
+            self.counted = len(self)
         tdf = self.td_base(0)
-        tdc = tdf
-        for i in range(8):
-            if self.td_base(i+1) == tdf:
-                tdc += tdf
-            else:
-                break
+        self.run_length = (self.prev_run_length + 1 if tdf == self.prev_td
+                           else 1)
+        self.last_td = tdf
+        tdc = tdf * min(self.run_length, TD_SETUP_LENGTH)
         self.lines.count[0] = tdc
-        self.lines.reversal[0] = self.ta_base(0) if (abs(tdc) > 7) else 0
\ No newline at end of file
+        self.lines.reversal[0] = self.ta_base(0, tdf) if (abs(tdc) > 7) else 0
+
+    @traced("indicator.tdsequential")
+    def once(self, start, end):
+        # the count only depends on a fixed window of closes, so the whole
+        # buffer can be computed with array operations
+        lines = td_sequential(np.asarray(self.data.high.array[:end]),
+                              np.asarray(self.data.low.array[:end]),
+                              np.asarray(self.data.close.array[:end]))
+        for line_name, values in lines.items():
+            write_line(getattr(self.lines, line_name), values, start, end)
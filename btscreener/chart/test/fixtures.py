@@ -2,12 +2,17 @@ import pytest
 import backtrader as bt
 
 from btscreener.sources.iex import load_historical
+from btscreener.sources.synthetic import make_synthetic_history
 
 @pytest.fixture(scope="module")
 def historical_data(request):
     data = load_historical("AAPL", lookback="1y")
     return data
 
+@pytest.fixture(scope="module")
+def synthetic_data(request):
+    return make_synthetic_history(1260)
+
 @pytest.fixture(scope="function")
 def cerebro(request, historical_data):
     cerebro = bt.Cerebro()
@@ -3,6 +3,7 @@ import backtrader as bt
 from btscreener.chart.priceaction import WickReversalSignal
 from btscreener.chart.supertrend import Supertrend
 from btscreener.chart.tdcount import TDSequential
+from btscreener.chart.kernels import TD_LOOKBACK, TD_SETUP_LENGTH
 from btscreener.chart.adbreakout import ADBreakout
 
 from .fixtures import *
@@ -33,4 +34,85 @@ def test_simple(cerebro, indicatorClass):
 
     # Run over everything
     result = cerebro.run()
-    print(result)
\ No newline at end of file
+    print(result)
+
+class NineBarTDSequential(bt.Indicator):
+    """ The original TD count, which rebuilds the count from up to nine
+    td_base lookups every bar, and looks before the first bar during warmup
+    """
+
+    lines = (
+        "count",
+        "reversal",
+    )
+
+    def td_base(self, bar):
+        up = 1 if self.data.close[-bar] > self.data.close[-bar-4] else 0
+        dn = -1 if self.data.close[-bar] < self.data.close[-bar-4] else 0
+        return up + dn
+
+    def ta_base(self, bar):
+        up = 1.0 if (self.td_base(bar) == 1.0 and (
+                self.data.high[-bar] > self.data.high[-bar-2])) else 0
+        dn = -1.0 if (self.td_base(bar) == -1.0 and (
+                self.data.low[-bar] < self.data.low[-bar-2])) else 0
+        return up + dn
+
+    def nextstart(self):
+        self.lines.count[0] = 0
+
+    def next(self):
+        tdf = self.td_base(0)
+        tdc = tdf
+        for i in range(8):
+            if self.td_base(i+1) == tdf:
+                tdc += tdf
+            else:
+                break
+        self.lines.count[0] = tdc
+        self.lines.reversal[0] = self.ta_base(0) if (abs(tdc) > 7) else 0
+
+
+def test_td_incremental(synthetic_data):
+    """ The carried count matches the count rebuilt from the lookback """
+    lines = {}
+    for indicatorClass in [TDSequential, NineBarTDSequential]:
+        cerebro = bt.Cerebro()
+        cerebro.adddata(bt.feeds.PandasData(
+            dataname=synthetic_data.set_index("date")))
+        cerebro.addstrategy(SimpleStrategy, indicatorClass=indicatorClass)
+        result = cerebro.run(runonce=False)
+        indicator = result[0].indicator
+        lines[indicatorClass] = (list(indicator.lines.count.array),
+                                 list(indicator.lines.reversal.array))
+    counts, reversals = lines[TDSequential]
+    baseline_counts, baseline_reversals = lines[NineBarTDSequential]
+    # once all nine lookups have a close four bars back, both agree
+    warmup = TD_LOOKBACK + TD_SETUP_LENGTH - 1
+    assert counts[warmup:] == baseline_counts[warmup:]
+    assert reversals[warmup:] == baseline_reversals[warmup:]
+    # before that, there is no setup until there is a close to compare to,
+    # and the count only runs from there, where the baseline counted closes
+    # from before the first bar
+    assert counts[:TD_LOOKBACK] == [0.0] * TD_LOOKBACK
+    assert reversals[:TD_LOOKBACK] == [0.0] * TD_LOOKBACK
+    assert baseline_counts[1:TD_LOOKBACK] != counts[1:TD_LOOKBACK]
+    for bar in range(TD_LOOKBACK, warmup):
+        assert abs(counts[bar]) <= bar - TD_LOOKBACK + 1
+
+
+def test_adbreakout_params(synthetic_data):
+    """ The Supertrend and wick settings reach the source indicators """
+    stops = []
+    for factor in [2.0, 3.0]:
+        cerebro = bt.Cerebro()
+        cerebro.adddata(bt.feeds.PandasData(
+            dataname=synthetic_data.set_index("date")))
+        cerebro.addstrategy(SimpleStrategy, indicatorClass=lambda: ADBreakout(
+            factor=factor, period=10, wick_multiplier_min=2.0))
+        indicator = cerebro.run()[0].indicator
+        assert indicator.trendSrc.p.factor == factor
+        assert indicator.trendSrc.p.period == 10
+        assert indicator.adSrc.p.wick_multiplier_min == 2.0
+        stops += [list(indicator.lines.stop.array)]
+    assert stops[0] != stops[1]
@@ -0,0 +1,76 @@
+import numpy as np
+import backtrader as bt
+
+from btscreener.chart import kernels
+from btscreener.chart.priceaction import WickReversalSignal
+from btscreener.chart.supertrend import Supertrend
+from btscreener.chart.tdcount import TDSequential
+from btscreener.chart.adbreakout import ADBreakout
+
+from .fixtures import *
+
+
+class RecordingStrategy(bt.Strategy):
+
+    def __init__(self, indicatorClass):
+        self.indicator = indicatorClass()
+
+
+def run_indicator(table, indicatorClass, runonce):
+    """
+    Runs an indicator through backtrader and returns all of its lines
+    """
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=table.set_index("date")))
+    cerebro.addstrategy(RecordingStrategy, indicatorClass=indicatorClass)
+    result = cerebro.run(runonce=runonce)
+    indicator = result[0].indicator
+    return {line_name: np.array(getattr(indicator.lines, line_name).array)
+            for line_name in indicator.lines.getlinealiases()}
+
+
+def run_kernel(table, indicatorClass):
+    o, h, l, c = (table[col].values for col in ["open", "high", "low", "close"])
+    if indicatorClass is WickReversalSignal:
+        return kernels.wick_reversal(o, h, l, c)
+    elif indicatorClass is Supertrend:
+        return kernels.supertrend(h, l, c)
+    elif indicatorClass is TDSequential:
+        return kernels.td_sequential(h, l, c)
+    elif indicatorClass is ADBreakout:
+        return kernels.ad_breakout(o, h, l, c)
+
+
+@pytest.mark.parametrize("runonce", [True, False])
+@pytest.mark.parametrize("indicatorClass", [
+    WickReversalSignal, Supertrend, TDSequential, ADBreakout
+])
+def test_kernel_parity(synthetic_data, indicatorClass, runonce):
+    expected = run_indicator(synthetic_data, indicatorClass, runonce)
+    actual = run_kernel(synthetic_data, indicatorClass)
+    assert list(actual) == list(expected)
+    for line_name, line in expected.items():
+        np.testing.assert_allclose(actual[line_name], line, err_msg=line_name)
+
+
+def test_kernel_rows(synthetic_data):
+    """ A 2-d array of right-aligned histories gives the same lines as each
+    history on its own
+    """
+    lengths = [len(synthetic_data.index), 200, 63]
+    tables = [make_synthetic_history(bars, seed=seed)
+              for seed, bars in enumerate(lengths)]
+    panel = np.full((len(tables), 4, max(lengths)), np.nan)
+    for row, table in enumerate(tables):
+        ohlc = table[["open", "high", "low", "close"]].values.T
+        panel[row, :, -len(table.index):] = ohlc
+
+    batched = kernels.ad_breakout(*(panel[:, i] for i in range(4)))
+    batched.update(kernels.td_sequential(*(panel[:, i] for i in range(1, 4))))
+    for row, table in enumerate(tables):
+        single = run_kernel(table, ADBreakout)
+        single.update(run_kernel(table, TDSequential))
+        for line_name, line in single.items():
+            np.testing.assert_allclose(
+                batched[line_name][row, -len(table.index):], line,
+                err_msg=line_name)
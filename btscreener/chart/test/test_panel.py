@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.backtest import run_backtest
+from btscreener.chart.panel import PricePanel, summarize_panel
+
+from .fixtures import *
+
+
+@pytest.fixture(scope="module")
+def tables():
+    tables = {
+        "LONG": make_synthetic_history(300, seed=1),
+        "SHORT": make_synthetic_history(80, seed=2, start="2015-11-02"),
+        "STALE": make_synthetic_history(250, seed=3),
+    }
+    # knock a few bars out of the middle of one history, like a halt
+    gappy = make_synthetic_history(300, seed=4)
+    tables["GAPPY"] = gappy.drop(gappy.index[[100, 101, 102, 250]])
+    return tables
+
+
+def test_panel_alignment(tables):
+    panel = PricePanel.from_tables(tables)
+    assert panel.symbols == list(tables)
+    assert panel.values.shape == (len(tables), len(panel.dates), 5)
+    assert panel.mask.sum(axis=1).tolist() == [
+        len(table.index) for table in tables.values()]
+
+    values, dates = panel.right_aligned()
+    for row, table in enumerate(tables.values()):
+        bars = len(table.index)
+        np.testing.assert_array_equal(values[row, -bars:, 3],
+                                      table["close"].values)
+        assert np.isnan(values[row, :-bars]).all()
+        assert (dates[row, -bars:] == table["date"].values).all()
+
+
+def test_summarize_panel(tables):
+    summary = summarize_panel(PricePanel.from_tables(tables))
+    for symbol, table in tables.items():
+        expected = run_backtest(table, BasketStrategy)
+        actual = summary.loc[symbol]
+        assert list(actual.index) == list(expected.index)
+        assert actual.datetime == expected.datetime
+        np.testing.assert_allclose(actual.drop("datetime").astype(float),
+                                   expected.drop("datetime").astype(float),
+                                   err_msg=symbol)
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+
+import pytest
+import pandas as pd
+import backtrader as bt
+
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.backtest import run_backtest
+from btscreener.chart.strategies.stadtd import BreakoutStrategy
+
+from .fixtures import *
+
+HISTORY_BARS = {
+    "1y": 252,
+    "5y": 1260,
+}
+
+
+def run_cerebro(table, strategy, runonce):
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=table.set_index("date")))
+    cerebro.addstrategy(strategy)
+    return cerebro.run(runonce=runonce)[0]
+
+
+@pytest.mark.parametrize("lookback", list(HISTORY_BARS))
+def test_basket_runonce(lookback):
+    table = make_synthetic_history(HISTORY_BARS[lookback])
+    next_strategy = run_cerebro(table, BasketStrategy, False)
+    once_strategy = run_cerebro(table, BasketStrategy, True)
+    next_summary = pd.Series(OrderedDict(next_strategy.yield_summary()))
+    once_summary = pd.Series(OrderedDict(once_strategy.yield_summary()))
+    pd.testing.assert_series_equal(once_summary, next_summary)
+
+
+@pytest.mark.parametrize("lookback", list(HISTORY_BARS))
+def test_breakout_runonce(lookback):
+    table = make_synthetic_history(HISTORY_BARS[lookback])
+    next_strategy = run_cerebro(table, BreakoutStrategy, False)
+    once_strategy = run_cerebro(table, BreakoutStrategy, True)
+    assert once_strategy.broker.getvalue() == next_strategy.broker.getvalue()
+
+
+def test_run_backtest_runonce():
+    table = make_synthetic_history(HISTORY_BARS["1y"])
+    pd.testing.assert_series_equal(run_backtest(table, BasketStrategy),
+                                   run_backtest(table, BasketStrategy,
+                                                runonce=False))
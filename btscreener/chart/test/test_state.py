@@ -0,0 +1,103 @@
+import json
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from btscreener.chart import kernels
+from btscreener.chart.backtest import run_backtest
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.state import BasketState, StateStore, REPLAY_MARGIN
+
+from .fixtures import *
+
+
+@pytest.mark.parametrize("bars", [30, 63, 250])
+def test_state_replay(synthetic_data, bars):
+    history = synthetic_data.tail(bars).reset_index(drop=True)
+    expected = run_backtest(history, BasketStrategy)
+    actual = BasketState.replay(history).summary()
+    pd.testing.assert_series_equal(actual, expected, check_exact=False,
+                                   rtol=1e-12)
+
+
+def test_state_kernels(synthetic_data):
+    state = BasketState()
+    trend = []
+    for i in range(len(synthetic_data.index)):
+        state.advance(synthetic_data.iloc[i:i + 1])
+        trend += [state.lines["stad_stop"]]
+    lines = kernels.ad_breakout(*(synthetic_data[field].values for field in
+                                  ("open", "high", "low", "close")))
+    np.testing.assert_allclose(trend, lines["stop"], rtol=1e-12)
+
+
+@pytest.mark.parametrize("step", [1, 5])
+def test_state_advance(synthetic_data, step):
+    history = synthetic_data.head(300)
+    expected = BasketState.replay(history).summary()
+    state = BasketState.replay(history.head(63))
+    for start in range(63, len(history.index), step):
+        # round trip through the saved form between runs
+        state = BasketState.from_dict(json.loads(json.dumps(state.to_dict())))
+        state.advance(history.iloc[start:start + step])
+    pd.testing.assert_series_equal(state.summary(), expected)
+
+
+def test_state_store(synthetic_data, tmpdir):
+    states = StateStore(str(tmpdir))
+    day_one = synthetic_data.iloc[100:163]
+    day_two = synthetic_data.iloc[101:164]
+    assert states.advance("AAPL", day_one).count == len(day_one.index)
+
+    # only the new bar is stepped, on top of the state from day one, so the
+    # state starts a bar before day two's history
+    state = states.advance("AAPL", day_two)
+    assert state.count == len(day_one.index) + 1
+    expected = BasketState.replay(synthetic_data.iloc[100:164]).summary()
+    pd.testing.assert_series_equal(state.summary(), expected)
+    assert states.read("AAPL").last_date == day_two["date"].iloc[-1]
+
+
+def test_state_store_divergence(synthetic_data, tmpdir):
+    states = StateStore(str(tmpdir))
+    divergence = []
+    replays = 0
+    for day in range(50):
+        history = synthetic_data.iloc[100 + day:163 + day]
+        state = states.advance("AAPL", history)
+        assert state.count <= len(history.index) + REPLAY_MARGIN
+        expected = run_backtest(history, BasketStrategy)
+        actual = state.summary()
+        error = abs(actual["stad_stop"] / expected["stad_stop"] - 1.0)
+        if state.count == len(history.index):
+            # just replayed from the history
+            pd.testing.assert_series_equal(actual, expected,
+                                           check_exact=False, rtol=1e-12)
+            replays += 1
+        divergence += [error]
+    # the carried state drifts from a backtest of each day's history, but
+    # only so far before it is replayed again
+    assert 0.0 < max(divergence) < 0.05
+    assert replays == 1 + 50 // (REPLAY_MARGIN + 1)
+
+
+def test_state_store_replays(synthetic_data, tmpdir):
+    states = StateStore(str(tmpdir))
+    states.advance("AAPL", synthetic_data.iloc[100:163])
+
+    # a split adjusts every past price
+    adjusted = synthetic_data.iloc[101:164].copy()
+    for field in ["open", "high", "low", "close"]:
+        adjusted[field] /= 2.0
+    state = states.advance("AAPL", adjusted)
+    assert state.count == len(adjusted.index)
+
+    # a history that no longer reaches back to the saved state
+    later = synthetic_data.iloc[300:363]
+    assert states.advance("AAPL", later).count == len(later.index)
+
+    # a state saved with other parameters
+    other = StateStore(str(tmpdir), factor=2.0)
+    assert other.advance("AAPL", later.iloc[:-1]).count == (
+        len(later.index) - 1)
@@ -0,0 +1,54 @@
+import pytest
+import pandas as pd
+
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.backtest import (
+    run_backtest, resample_history, TIMEFRAMES
+)
+from btscreener.sources.store import RANGE_DAYS
+from btscreener.sources.synthetic import make_synthetic_history
+
+
+@pytest.fixture(scope="module")
+def history():
+    return make_synthetic_history(500)
+
+
+def test_resample_history(history):
+    weekly = resample_history(history, TIMEFRAMES["weekly"])
+    assert list(weekly.columns) == list(history.columns)
+    assert weekly["volume"].sum() == history["volume"].sum()
+    # the week in progress is dated by its last daily bar
+    assert weekly["date"].iloc[-1] == history["date"].iloc[-1]
+    assert weekly["close"].iloc[-1] == history["close"].iloc[-1]
+    week = history[history["date"] > weekly["date"].iloc[-2]]
+    assert weekly["open"].iloc[-1] == week["open"].iloc[0]
+    assert weekly["high"].iloc[-1] == week["high"].max()
+    assert weekly["low"].iloc[-1] == week["low"].min()
+
+
+@pytest.mark.parametrize("runonce", [True, False])
+def test_timeframe_backtest(history, runonce):
+    # the daily fields are those of a plain backtest of the usual lookback,
+    # not of the longer history fetched for the other timeframes
+    start = history["date"].iloc[-1] - pd.Timedelta(days=RANGE_DAYS["3m"])
+    daily = run_backtest(history[history["date"] >= start], BasketStrategy)
+    summary = run_backtest(history, BasketStrategy, runonce=runonce,
+                           timeframes=list(TIMEFRAMES))
+    # exactly, as the difference is only in the last digits of the stops
+    pd.testing.assert_series_equal(summary[daily.index], daily, rtol=0,
+                                   atol=0)
+    for timeframe, rule in TIMEFRAMES.items():
+        # the same as a backtest of the resampled history on its own
+        expected = run_backtest(resample_history(history, rule),
+                                BasketStrategy)
+        actual = summary[["{}_{}".format(timeframe, field)
+                          for field in expected.index]]
+        pd.testing.assert_series_equal(actual.set_axis(expected.index),
+                                       expected)
+
+
+def test_timeframe_min_period():
+    assert BasketStrategy.get_min_period() == "3m"
+    assert BasketStrategy.get_min_period(["weekly"]) == "1y"
+    assert BasketStrategy.get_min_period(["weekly", "monthly"]) == "5y"
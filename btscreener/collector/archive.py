@@ -0,0 +1,234 @@
+"""
+Archive of the daily collections, for queries across dates.
+
+Every daily collection file of a group is folded into one Parquet file of that
+group, keyed by date and symbol. The rows are sorted by symbol and then date,
+so the row group statistics let a query for a few symbols skip the rest of
+the file, and a query for a few fields reads only their columns. Compacting
+folds in the daily files that are new or were written again since they were
+last folded.
+"""
+import logging
+import os
+import json
+import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from btscreener.collector.columnar import (
+    write_arrow, COLLECTION_SCHEMA, INDEX_FIELD
+)
+
+logger = logging.getLogger(__name__)
+
+DATE_FIELD = "date"
+"""str: column holding the date of the collection a row came from"""
+
+ROW_GROUP_SIZE = 4096
+"""int: rows per row group of an archive file"""
+
+SOURCES_KEY = b"btscreener.sources"
+"""bytes: metadata key of the daily files folded into an archive file"""
+
+
+def find_collections(collection_dir):
+    """
+    Args:
+        collection_dir (str): directory of daily collections, searched
+            recursively
+
+    Yields:
+        tuple: date, group and path of each daily collection file
+    """
+    for root, dirs, files in os.walk(collection_dir):
+        for file in sorted(files):
+            if file.endswith("_collection.parquet"):
+                date, group, suffix = file.split("_")
+                yield (datetime.date.fromisoformat(date), group,
+                       os.path.join(root, file))
+
+
+class CollectionArchive(object):
+    """
+    Directory with one archive file per symbol group
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root (str): archive directory, created when first compacted
+        """
+        self.root = root
+
+    def __repr__(self):
+        return "CollectionArchive({!r})".format(self.root)
+
+    def path(self, group):
+        """
+        Args:
+            group (str): symbol group
+
+        Returns:
+            str: archive file of the group
+        """
+        return os.path.join(self.root, "{}.parquet".format(group))
+
+    def groups(self):
+        """
+        Returns:
+            list(str): symbol groups in the archive
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(os.path.splitext(file)[0]
+                      for file in os.listdir(self.root)
+                      if file.endswith(".parquet"))
+
+    def sources(self, group):
+        """
+        Args:
+            group (str): symbol group
+
+        Returns:
+            dict: modification time in ns of each daily file folded into the
+                archive file, keyed by file name
+        """
+        path = self.path(group)
+        if not os.path.exists(path):
+            return {}
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata.get(SOURCES_KEY, b"{}").decode())
+
+    def dates(self, group):
+        """
+        Args:
+            group (str): symbol group
+
+        Returns:
+            list(datetime.date): dates in the archive file, oldest first
+        """
+        path = self.path(group)
+        if not os.path.exists(path):
+            return []
+        dates = pq.read_table(path, columns=[DATE_FIELD])[DATE_FIELD]
+        return sorted(pc.unique(dates).to_pylist())
+
+    def compact(self, collection_dir):
+        """
+        Folds the daily collections that are new or changed into the archive.
+        A daily file replaces the rows of its date.
+
+        Args:
+            collection_dir (str): directory of daily collections
+
+        Returns:
+            list(str): daily files that were folded in
+        """
+        found = {}
+        for date, group, path in find_collections(collection_dir):
+            found.setdefault(group, []).append((date, path))
+        folded = []
+        for group, collections in sorted(found.items()):
+            sources = self.sources(group)
+            changed = [(date, path) for date, path in collections
+                       if sources.get(os.path.basename(path))
+                       != os.stat(path).st_mtime_ns]
+            if not changed:
+                continue
+            self._fold(group, sources, changed)
+            folded += [path for _, path in changed]
+        return folded
+
+    def _fold(self, group, sources, collections):
+        path = self.path(group)
+        tables = []
+        if os.path.exists(path):
+            archived = pq.read_table(path)
+            replaced = pa.array([date for date, _ in collections],
+                                type=pa.date32())
+            tables += [archived.filter(pc.invert(
+                pc.is_in(archived[DATE_FIELD], value_set=replaced)))]
+        for date, fn in collections:
+            table = pq.read_table(fn)
+            tables += [table.add_column(
+                0, DATE_FIELD, pa.array([date] * table.num_rows,
+                                        type=pa.date32()))]
+            sources[os.path.basename(fn)] = os.stat(fn).st_mtime_ns
+        table = pa.concat_tables(tables, promote_options="default").sort_by(
+            [(INDEX_FIELD, "ascending"), (DATE_FIELD, "ascending")])
+        metadata = dict(COLLECTION_SCHEMA.metadata)
+        metadata[SOURCES_KEY] = json.dumps(sources, sort_keys=True)
+        write_arrow(table.replace_schema_metadata(metadata), path,
+                    row_group_size=ROW_GROUP_SIZE)
+        logger.info("Folded {} collections into {}".format(len(collections),
+                                                           path))
+
+    def read(self, group, symbols=None, fields=None, start=None, end=None,
+             last=None):
+        """
+        Reads rows of the archive, touching only the row groups and columns
+        the query needs
+
+        Args:
+            group (str): symbol group
+            symbols (list(str)): tickers to read, None for all of them
+            fields (list(str)): collection fields to read, None for all
+            start (datetime.date): first date to read, None from the oldest
+            end (datetime.date): last date to read, None to the newest
+            last (int): read only the last dates of the archive, e.g. the
+                last 60 screens
+
+        Returns:
+            pd.DataFrame: rows with their date and symbol columns, sorted by
+                symbol and date
+        """
+        path = self.path(group)
+        if last is not None:
+            dates = self.dates(group)[-last:]
+            if dates:
+                start = max(start or dates[0], dates[0])
+        filters = []
+        if symbols is not None:
+            filters += [(INDEX_FIELD, "in", list(symbols))]
+        if start is not None:
+            filters += [(DATE_FIELD, ">=", start)]
+        if end is not None:
+            filters += [(DATE_FIELD, "<=", end)]
+        columns = None
+        if fields is not None:
+            columns = [DATE_FIELD, INDEX_FIELD] + [
+                field for field in fields
+                if field not in (DATE_FIELD, INDEX_FIELD)]
+        table = pq.read_table(path, columns=columns, filters=filters or None)
+        return table.to_pandas(date_as_object=False)
+
+    def history(self, symbol, group, fields=None, **kwargs):
+        """
+        Args:
+            symbol (str): ticker to look up
+            group (str): symbol group
+            fields (list(str)): collection fields to read, None for all
+            **kwargs: date range, as for read
+
+        Returns:
+            pd.DataFrame: the fields of the ticker indexed by date
+        """
+        table = self.read(group, symbols=[symbol], fields=fields, **kwargs)
+        return table.drop(columns=INDEX_FIELD).set_index(DATE_FIELD)
+
+    def field_history(self, field, group, symbols=None, **kwargs):
+        """
+        Args:
+            field (str): collection field to read
+            group (str): symbol group
+            symbols (list(str)): tickers to read, None for all of them
+            **kwargs: date range, as for read
+
+        Returns:
+            pd.DataFrame: the field indexed by date, with a column per ticker
+        """
+        table = self.read(group, symbols=symbols, fields=[field], **kwargs)
+        return table.pivot(index=DATE_FIELD, columns=INDEX_FIELD,
+                           values=field)
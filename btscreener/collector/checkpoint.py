@@ -0,0 +1,163 @@
+import logging
+import os
+import pickle
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_ROWS = 50
+"""int: default number of rows buffered before they are written out"""
+
+
+class Checkpoint(object):
+    """
+    Append-only file of collected rows, so that a run that stops part way can
+    be resumed without collecting the finished symbols again.
+
+    Rows are buffered and appended in chunks, each chunk being one pickled
+    DataFrame. A chunk that was only partly written when the run stopped is
+    ignored on reading, and its symbols are simply collected again.
+    """
+
+    def __init__(self, path, chunk_rows=DEFAULT_CHECKPOINT_ROWS):
+        """
+        Args:
+            path (str): checkpoint file, created if needed
+            chunk_rows (int): rows buffered before they are written out
+        """
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.symbols = []
+        self.rows = []
+        self.valid_size = 0
+
+    def __repr__(self):
+        return "Checkpoint({!r})".format(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # keep whatever finished, even if the run failed
+        self.flush()
+
+    def yield_chunks(self):
+        """
+        Yields:
+            pd.DataFrame: each complete chunk in the file, indexed by symbol
+        """
+        try:
+            fobj = open(self.path, "rb")
+        except IOError:
+            return
+        with fobj:
+            while True:
+                try:
+                    chunk = pickle.load(fobj)
+                except EOFError:
+                    return
+                except (pickle.UnpicklingError, ValueError, TypeError,
+                        AttributeError, IndexError):
+                    logger.warning("Ignoring a partly written chunk at the end "
+                                   "of {}".format(self.path))
+                    return
+                self.valid_size = fobj.tell()
+                yield chunk
+
+    def done(self):
+        """
+        Returns:
+            set(str): symbols already in the file, except those that failed
+        """
+        done = set()
+        for chunk in self.yield_chunks():
+            if "error" in chunk:
+                chunk = chunk[chunk["error"].isnull()]
+            done.update(chunk.index)
+        return done
+
+    def resume(self):
+        """
+        Cuts off a partly written chunk left by a run that stopped, so that new
+        chunks can be appended after the complete ones
+
+        Returns:
+            set(str): symbols already in the file, which need no collecting
+                again
+        """
+        self.valid_size = 0
+        done = self.done()
+        if os.path.exists(self.path) and (
+                os.path.getsize(self.path) > self.valid_size):
+            with open(self.path, "r+b") as fobj:
+                fobj.truncate(self.valid_size)
+        return done
+
+    def load(self):
+        """
+        Returns:
+            pd.DataFrame: every row in the file, indexed by symbol
+        """
+        chunks = list(self.yield_chunks())
+        if not chunks:
+            return pd.DataFrame()
+        table = pd.concat(chunks, sort=False)
+        return table[~table.index.duplicated(keep="last")]
+
+    def append(self, symbol, row):
+        """
+        Buffers a collected row, writing out the buffer once it is full
+
+        Args:
+            symbol (str): ticker of the row
+            row (pd.Series): collected row
+        """
+        self.symbols += [symbol]
+        self.rows += [row]
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered rows to the file as one chunk
+        """
+        if not self.rows:
+            return
+        chunk = pd.DataFrame(self.rows, index=self.symbols)
+        self.symbols, self.rows = [], []
+        with open(self.path, "ab") as fobj:
+            pickle.dump(chunk, fobj)
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        logger.debug("Checkpointed {} rows to {}".format(len(chunk.index),
+                                                         self.path))
+
+    def clear(self):
+        """
+        Removes the file and drops the buffered rows
+        """
+        self.symbols, self.rows = [], []
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def run_checkpointed(rows, checkpoint, symbols):
+    """
+    Drains a stream of collected rows into a checkpoint
+
+    Args:
+        rows (iterable(tuple)): symbol and row pairs, e.g. from yield_rows
+        checkpoint (Checkpoint): where to append the rows
+        symbols (list(str)): every ticker of the run, to order the table by
+
+    Returns:
+        pd.DataFrame: the whole checkpoint, indexed by symbol in the order of
+            symbols
+    """
+    with checkpoint:
+        for symbol, row in rows:
+            checkpoint.append(symbol, row)
+    return checkpoint.load().reindex(symbols)
@@ -1,49 +1,520 @@
 import logging
-from multiprocessing import Pool
+import time
+from collections import OrderedDict, deque
+from functools import partial
+from multiprocessing import Process, Pipe
+from multiprocessing.connection import wait
 
+import numpy as np
 import pandas as pd
 
 from btscreener.sources.iex import (
-    load_historical, load_dividends, load_earnings
+    load_historical, load_dividends, load_earnings, load_universe
+)
+from btscreener.summary.dividends import (
+    make_dividend_summary, make_dividend_summaries
+)
+from btscreener.summary.earnings import (
+    make_earnings_summary, make_earnings_summaries
 )
-from btscreener.summary.dividends import make_dividend_summary
-from btscreener.summary.earnings import make_earnings_summary
 from btscreener.chart.basket import BasketStrategy
 from btscreener.chart.backtest import run_backtest
+from btscreener.chart.panel import PricePanel, summarize_panel
+from btscreener.tracing.spans import span, trace_symbol
 
 logger = logging.getLogger(__name__)
 
-def create_row(symbol):
+DEFAULT_CHUNK_SIZE = 20
+"""int: default number of symbols fetched together"""
+
+DEFAULT_SYMBOL_TIMEOUT = 30.0
+"""float: default seconds a worker gets per symbol before it is a straggler"""
+
+DEFAULT_STRAGGLER_RETRIES = 1
+"""int: default number of times a straggling ticker is queued again"""
+
+POLL_INTERVAL = 0.05
+"""float: seconds between checks on the pool workers"""
+
+def chunked(symbols, chunk_size):
+    """
+    Args:
+        symbols (list(str)): tickers to split
+        chunk_size (int): maximum number of tickers per chunk
+
+    Returns:
+        list(list(str)): consecutive chunks of the tickers
+    """
+    return [symbols[i:i + chunk_size]
+            for i in range(0, len(symbols), chunk_size)]
+
+def load_basket_history(symbol, store=None, timeframes=()):
+    """
+    Loads enough historical data for a ticker to run the BasketStrategy
+
+    Args:
+        symbol (str): ticker to look up
+        store (btscreener.sources.store.BarStore): local store to serve the
+            history from, None to always download it
+        timeframes (list(str)): timeframes evaluated besides the daily one,
+            which need a longer history
+
+    Returns:
+        pd.DataFrame: historical data table
+    """
+    return load_historical(symbol,
+                           lookback=BasketStrategy.get_min_period(timeframes),
+                           store=store)
+
+def load_basket_symbol(symbol, store=None, timeframes=()):
+    """
+    Loads the chart and calendar data of a ticker, one request each
+
+    Args:
+        symbol (str): ticker to look up
+        store (btscreener.sources.store.BarStore): local store to serve the
+            history from, None to always download it
+        timeframes (list(str)): timeframes evaluated besides the daily one,
+            which need a longer history
+
+    Returns:
+        tuple: historical, dividends and earnings tables
+    """
+    return (load_basket_history(symbol, store=store, timeframes=timeframes),
+            load_dividends(symbol), load_earnings(symbol))
+
+def load_basket_universe(symbols, store=None, timeframes=()):
+    """
+    Loads the chart and calendar data of many tickers with batch requests
+
+    Args:
+        symbols (list(str)): tickers to look up
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+        timeframes (list(str)): timeframes evaluated besides the daily one,
+            which need a longer history
+
+    Returns:
+        dict: historical, dividends and earnings tables keyed by symbol
+    """
+    return load_universe(symbols,
+                         lookback=BasketStrategy.get_min_period(timeframes),
+                         store=store)
+
+def summarize_calendar(dividend_history, earnings_history):
+    """
+    Summarizes the dividend and earnings data of a ticker
+
+    Args:
+        dividend_history (pd.DataFrame): dividends table, or None
+        earnings_history (pd.DataFrame): earnings table, or None
+
+    Returns:
+        list(pd.Series): dividend and earnings summaries that are available
+    """
+    chunks = []
+    if dividend_history is not None:
+        with span("summary.dividends"):
+            chunks += [make_dividend_summary(dividend_history)]
+    if earnings_history is not None:
+        with span("summary.earnings"):
+            chunks += [make_earnings_summary(earnings_history)]
+    return chunks
+
+def stack_calendars(histories, columns):
+    """
+    Args:
+        histories (dict): dividends or earnings table keyed by ticker, the
+            table being None for the tickers without any
+        columns (list(str)): columns of the tables to keep
+
+    Returns:
+        pd.DataFrame: the columns of the tables stacked in one, with a
+            "symbol" column, or None if no ticker has any
+    """
+    tables = [(symbol, table) for symbol, table in histories.items()
+              if table is not None and len(table.index) > 0]
+    if not tables:
+        return None
+    # stacking the column arrays costs a fraction of concatenating frames
+    lengths = [len(table.index) for _, table in tables]
+    stacked = OrderedDict([
+        ("symbol", np.repeat([symbol for symbol, _ in tables], lengths)),
+    ])
+    for column in columns:
+        stacked[column] = np.concatenate([table[column].values
+                                          for _, table in tables])
+    return pd.DataFrame(stacked)
+
+def summarize_calendars(dividend_histories, earnings_histories):
+    """
+    Summarizes the dividend and earnings data of every ticker at once, with
+    the same results as summarize_calendar gives ticker by ticker
+
+    Args:
+        dividend_histories (dict): dividends table keyed by ticker, or None
+        earnings_histories (dict): earnings table keyed by ticker, or None
+
+    Returns:
+        list(pd.DataFrame): dividend and earnings summaries that are
+            available, indexed by ticker
+    """
+    chunks = []
+    dividend_history = stack_calendars(dividend_histories,
+                                       ["exDate", "amount"])
+    if dividend_history is not None:
+        with span("summary.dividends"):
+            chunks += [make_dividend_summaries(dividend_history)]
+    earnings_history = stack_calendars(earnings_histories,
+                                       ["EPSReportDate"])
+    if earnings_history is not None:
+        with span("summary.earnings"):
+            chunks += [make_earnings_summaries(earnings_history)]
+    return chunks
+
+def create_calendar_chunks(symbol):
+    """
+    Collects dividend and earnings data for a ticker and summarizes them
+
+    Args:
+        symbol (str): ticker to look up
+
+    Returns:
+        list(pd.Series): dividend and earnings summaries that are available
+    """
+    return summarize_calendar(load_dividends(symbol), load_earnings(symbol))
+
+def summarize_row(hist, dividend_history, earnings_history, symbol=None,
+                  states=None, timeframes=()):
+    """
+    Runs the backtest and calendar summaries over data that is already loaded
+
+    Args:
+        hist (pd.DataFrame): historical data table
+        dividend_history (pd.DataFrame): dividends table, or None
+        earnings_history (pd.DataFrame): earnings table, or None
+        symbol (str): ticker of the data, needed with states
+        states (btscreener.chart.state.StateStore): saved indicator states to
+            advance by the new bars instead of running a backtest, None to
+            always run one
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one in the same backtest, with fields prefixed by their name. The
+            states only cover the daily one, so they are not used with these.
+
+    Returns:
+        pd.Series: the combined summaries
+    """
+    with trace_symbol(symbol):
+        if states is None or timeframes:
+            with span("backtest"):
+                chart_summary = run_backtest(hist, BasketStrategy,
+                                             timeframes=timeframes)
+        else:
+            with span("state.advance"):
+                chart_summary = states.advance(symbol, hist).summary()
+        chunks = [chart_summary] + summarize_calendar(dividend_history,
+                                                      earnings_history)
+        with span("concat"):
+            combined = pd.concat(chunks)
+    return combined
+
+def create_row(symbol, store=None, states=None, timeframes=()):
     """
     Collects chart and calendar data for a ticker and returns a DataFrame
     containing the combined results
 
     Args:
         symbol (str): ticker to look up
+        store (btscreener.sources.store.BarStore): local store to serve the
+            history from, None to always download it
+        states (btscreener.chart.state.StateStore): saved indicator states,
+            None to run a backtest
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one, with fields prefixed by their name
 
     Yields:
         OrderedDict: A dict-like row for an array-like, with the first key
             being "symbol".
     """
     logger.info("Collecting stats for symbol: {}".format(symbol))
-    hist = load_historical(symbol, lookback=BasketStrategy.get_min_period())
-    chart_summary = run_backtest(hist, BasketStrategy)
-    chunks = [chart_summary]
-    dividend_history = load_dividends(symbol)
-    if dividend_history is not None:
-        chunks += [make_dividend_summary(dividend_history)]
-    earnings_history = load_earnings(symbol)
-    if earnings_history is not None:
-        chunks += [make_earnings_summary(earnings_history)]
-    combined = pd.concat(chunks)
-    return combined
+    with trace_symbol(symbol):
+        with span("load"):
+            data = load_basket_symbol(symbol, store=store,
+                                      timeframes=timeframes)
+        return summarize_row(*data, symbol=symbol, states=states,
+                             timeframes=timeframes)
+
+def error_row(e):
+    """
+    Args:
+        e (Exception): why a ticker could not be collected
+
+    Returns:
+        pd.Series: row recording the failure in its "error" field
+    """
+    return pd.Series(OrderedDict([
+        ("error", "{}: {}".format(type(e).__name__, e)),
+    ]))
+
+def collect_chunk(symbols, store=None, states=None, timeframes=()):
+    """
+    Loads a chunk of tickers with batch requests and summarizes each of them
+
+    When the batch requests fail, the tickers are loaded one at a time. A
+    ticker that still fails gets an error_row instead of failing the chunk.
+
+    Args:
+        symbols (list(str)): tickers to collect
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+        states (btscreener.chart.state.StateStore): saved indicator states,
+            None to run backtests
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one, with fields prefixed by their name
+
+    Returns:
+        list(tuple): symbol and row of each ticker
+    """
+    logger.info("Collecting stats for symbols: {}".format(symbols))
+    try:
+        with span("load.batch"):
+            universe = load_basket_universe(symbols, store=store,
+                                            timeframes=timeframes)
+    except Exception as e:
+        logger.warning("Batch load of {} failed, loading them one at a time: "
+                       "{}".format(symbols, e))
+        universe = None
+    rows = []
+    for symbol in symbols:
+        try:
+            if universe is None:
+                row = create_row(symbol, store=store, states=states,
+                                 timeframes=timeframes)
+            else:
+                row = summarize_row(*universe[symbol], symbol=symbol,
+                                    states=states, timeframes=timeframes)
+        except Exception as e:
+            logger.error("Failed to collect {}: {}".format(symbol, e))
+            row = error_row(e)
+        rows += [(symbol, row)]
+    return rows
 
-def run_collection(symbols, pool_size=0):
+def yield_rows(symbols, pool_size=0, store=None, chunk_size=None,
+               symbol_timeout=DEFAULT_SYMBOL_TIMEOUT,
+               straggler_retries=DEFAULT_STRAGGLER_RETRIES, states=None,
+               timeframes=()):
+    """
+    Collects tickers chunk by chunk, yielding the rows as soon as their chunk
+    is done, in no particular order
+
+    With a pool, a chunk still running symbol_timeout seconds per ticker
+    after its worker started it is a straggler. Its worker is terminated and
+    started again, and its tickers are queued again one at a time, so that a
+    single hung ticker does not hold up the rest of its chunk. A ticker that
+    straggles on its own is queued again straggler_retries times, and then
+    gets an error_row. Every worker is a process of its own, so stopping one
+    cannot leave the others waiting on a lock it held.
+
+    Run serially there is no deadline, as a hung ticker cannot be
+    interrupted in the same process; only the IEX request timeout bounds it.
+
+    Args:
+        symbols (list(str)): tickers to collect
+        pool_size (int): pool size for multiprocessing, 0 to run serially
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+        chunk_size (int): tickers fetched and summarized together, defaults
+            to spreading the tickers over the pool in chunks of at most
+            DEFAULT_CHUNK_SIZE
+        symbol_timeout (float): seconds a pool worker gets per ticker
+        straggler_retries (int): times a ticker straggling on its own is
+            queued again
+        states (btscreener.chart.state.StateStore): saved indicator states,
+            None to run backtests
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one, with fields prefixed by their name
+
+    Yields:
+        tuple: symbol and row of each ticker
+    """
+    symbols = list(symbols)
+    if chunk_size is None:
+        per_worker = -(-len(symbols) // max(pool_size, 1))
+        chunk_size = max(1, min(DEFAULT_CHUNK_SIZE, per_worker))
+    chunks = chunked(symbols, chunk_size)
+    collect = partial(collect_chunk, store=store, states=states,
+                      timeframes=timeframes)
     if pool_size > 0:
-        p = Pool(pool_size)
-        table = pd.DataFrame(p.map(create_row, symbols), index=symbols)
-        return table
+        workers = [ChunkWorker(collect) for _ in range(pool_size)]
+        try:
+            yield from _yield_pool_rows(workers, chunks, symbol_timeout,
+                                        straggler_retries)
+        finally:
+            for worker in workers:
+                worker.close()
     else:
-        values = [create_row(symbol) for symbol in symbols]
-        table = pd.DataFrame(values, index=symbols)
-        return table
\ No newline at end of file
+        for chunk in chunks:
+            yield from collect(chunk)
+
+class ChunkWorker(object):
+    """
+    A process of its own that collects one chunk at a time, sent to it over a
+    pipe only it and the collector share, so that a hung one can be
+    terminated and replaced without leaving anything else in a broken state.
+    """
+
+    def __init__(self, collect):
+        """
+        Args:
+            collect (callable): called in the process with each chunk, returns
+                its rows
+        """
+        self.collect = collect
+        self.task = None
+        self.deadline = None
+        self._start()
+
+    def _start(self):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=_work_chunks,
+                               args=(child_conn, self.collect), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def submit(self, task, timeout):
+        """
+        Args:
+            task (tuple): chunk of tickers and the attempt it is on
+            timeout (float): seconds the chunk gets from now
+        """
+        self.conn.send(task[0])
+        self.task = task
+        self.deadline = time.monotonic() + timeout
+
+    def result(self):
+        """
+        Returns:
+            list(tuple): symbol and row of each ticker of the finished task,
+                or None if the process died on it
+        """
+        self.task = None
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def restart(self):
+        """
+        Terminates the process, whatever it is doing, and starts another
+        """
+        self.close()
+        self.task = None
+        self._start()
+
+    def close(self):
+        """
+        Stops the process
+        """
+        if self.task is None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(POLL_INTERVAL)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+def _work_chunks(conn, collect):
+    while True:
+        chunk = conn.recv()
+        if chunk is None:
+            break
+        try:
+            rows = collect(chunk)
+        except Exception as e:
+            rows = [(symbol, error_row(e)) for symbol in chunk]
+        conn.send(rows)
+
+def _yield_pool_rows(workers, chunks, symbol_timeout, straggler_retries):
+    waiting = deque((chunk, 0) for chunk in chunks)
+    while waiting or any(worker.task for worker in workers):
+        for worker in workers:
+            if worker.task is None and waiting:
+                chunk, attempt = waiting.popleft()
+                worker.submit((chunk, attempt),
+                              symbol_timeout * len(chunk))
+
+        busy = [worker for worker in workers if worker.task]
+        ready = wait([worker.conn for worker in busy], POLL_INTERVAL)
+        now = time.monotonic()
+        for worker in busy:
+            chunk, attempt = worker.task
+            if worker.conn in ready:
+                rows = worker.result()
+                if rows is not None:
+                    yield from rows
+                    continue
+                logger.warning("Worker died on chunk {}".format(chunk))
+                worker.restart()
+            elif now >= worker.deadline:
+                logger.warning("Stopping straggling chunk {}".format(chunk))
+                worker.restart()
+            else:
+                continue
+            if len(chunk) > 1:
+                # one at a time, to find the ticker that holds it up
+                waiting.extendleft(reversed([([symbol], attempt)
+                                             for symbol in chunk]))
+            elif attempt < straggler_retries:
+                waiting.appendleft((chunk, attempt + 1))
+            else:
+                e = TimeoutError("no result after {} attempts".format(
+                    attempt + 1))
+                yield from ((symbol, error_row(e)) for symbol in chunk)
+
+def run_collection(symbols, pool_size=0, store=None, states=None,
+                   timeframes=()):
+    symbols = list(symbols)
+    rows = dict(yield_rows(symbols, pool_size=pool_size, store=store,
+                           states=states, timeframes=timeframes))
+    table = pd.DataFrame([rows[symbol] for symbol in symbols], index=symbols)
+    return table
+
+def run_panel_collection(symbols, store=None):
+    """
+    Collects the same table as run_collection, but evaluates the chart
+    indicators for every symbol in one vectorized pass over a PricePanel
+    instead of running a backtest per symbol
+
+    Args:
+        symbols (list(str)): tickers to collect
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+
+    Returns:
+        pd.DataFrame: collection table indexed by symbol
+    """
+    symbols = list(symbols)
+    universe = load_basket_universe(symbols, store=store)
+    tables = {symbol: universe[symbol][0] for symbol in symbols
+              if universe[symbol][0] is not None
+              and len(universe[symbol][0].index) > 0}
+    chart_table = summarize_panel(PricePanel.from_tables(tables))
+    chunks = summarize_calendars(
+        OrderedDict((symbol, universe[symbol][1]) for symbol in symbols),
+        OrderedDict((symbol, universe[symbol][2]) for symbol in symbols))
+    calendar_table = pd.DataFrame(index=symbols)
+    if chunks:
+        # stacking rows puts the fields in the order their first symbol has
+        # them, so the earnings come first if that symbol has no dividends
+        first = [symbols.index(chunk.index[0]) for chunk in chunks]
+        if len(chunks) > 1 and first[1] < first[0]:
+            chunks = chunks[::-1]
+        calendar_table = pd.concat(chunks, axis=1).reindex(symbols)
+    return chart_table.reindex(symbols).join(calendar_table)
@@ -0,0 +1,227 @@
+"""
+Typed, columnar file format for collection tables.
+
+A collection is stored as a compressed Parquet file with an explicit schema for
+the fields of BasketStrategy.yield_summary and of the calendar summaries, so a
+column always comes back with the same type whatever the rows it was written
+from. The file is written next to its destination and moved into place, so a
+reader never sees a partly written collection, and readers can load just the
+columns they need.
+"""
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from btscreener.chart.backtest import TIMEFRAMES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = "1"
+"""str: version of COLLECTION_SCHEMA, stored in the file metadata"""
+
+COMPRESSION = "zstd"
+"""str: Parquet compression codec of collection files"""
+
+INDEX_FIELD = "symbol"
+"""str: column holding the index of the collection table"""
+
+
+def _with_prev(fields):
+    return [(prefix + name, dtype) for name, dtype in fields
+            for prefix in ("", "prev_")]
+
+
+CHART_FIELDS = [("datetime", pa.timestamp("us"))] + _with_prev([
+    ("close", pa.float64()),
+    ("low", pa.float64()),
+    ("high", pa.float64()),
+    ("open", pa.float64()),
+    ("volume", pa.float64()),
+    ("openinterest", pa.float64()),
+    ("stad_trend", pa.float64()),
+    ("stad_stop", pa.float64()),
+    ("stad_ad", pa.float64()),
+    ("stad_resistance", pa.float64()),
+    ("stad_support", pa.float64()),
+    ("stad_breakout", pa.float64()),
+    ("td_count", pa.float64()),
+    ("td_reversal", pa.float64()),
+])
+"""list(tuple): name and type of the BasketStrategy.yield_summary fields"""
+
+TIMEFRAME_FIELDS = OrderedDict(
+    (timeframe, [("{}_{}".format(timeframe, name), dtype)
+                 for name, dtype in CHART_FIELDS])
+    for timeframe in TIMEFRAMES)
+"""OrderedDict: name and type of the BasketStrategy.yield_summary fields of
+each timeframe the daily data can be resampled to, prefixed with its name"""
+
+CALENDAR_FIELDS = [
+    ("last_ex_date", pa.timestamp("us")),
+    ("last_dividend_amount", pa.float64()),
+    ("dividend_period", pa.float64()),
+    ("next_ex_date", pa.date32()),
+    ("last_report_date", pa.timestamp("us")),
+    ("next_report_date", pa.timestamp("us")),
+]
+"""list(tuple): name and type of the dividend and earnings summary fields"""
+
+COLLECTION_SCHEMA = pa.schema(
+    [(INDEX_FIELD, pa.string())] + CHART_FIELDS + CALENDAR_FIELDS
+    + [("error", pa.string())],
+    metadata={"btscreener.schema": SCHEMA_VERSION})
+"""pa.Schema: columns of a collection file, in order"""
+
+
+def collection_schema(timeframes=()):
+    """
+    Args:
+        timeframes (list(str)): timeframes of TIMEFRAMES the collection was
+            evaluated over besides the daily one
+
+    Returns:
+        pa.Schema: COLLECTION_SCHEMA with the fields of each timeframe after
+            the daily chart fields
+    """
+    fields = list(COLLECTION_SCHEMA)
+    end = 1 + len(CHART_FIELDS)
+    timeframe_fields = [pa.field(name, dtype) for timeframe in timeframes
+                        for name, dtype in TIMEFRAME_FIELDS[timeframe]]
+    return pa.schema(fields[:end] + timeframe_fields + fields[end:],
+                     metadata=COLLECTION_SCHEMA.metadata)
+
+
+def to_arrow(table, schema=COLLECTION_SCHEMA):
+    """
+    Converts a collection table to the types of a schema
+
+    Fields of the schema missing from the table are written as nulls, and
+    values that do not convert to their field's type become nulls. Columns
+    the schema does not know are kept after the schema fields, with the type
+    arrow infers for them.
+
+    Args:
+        table (pd.DataFrame): collection table indexed by symbol
+        schema (pa.Schema): types to convert to
+
+    Returns:
+        pa.Table: the typed table, with the index as its INDEX_FIELD column
+    """
+    fields = list(schema)
+    arrays = [pa.array([str(symbol) for symbol in table.index],
+                       type=pa.string())]
+    for field in fields[1:]:
+        if field.name in table:
+            arrays += [_to_array(table[field.name], field.type)]
+        else:
+            arrays += [pa.nulls(len(table.index), type=field.type)]
+    for column in table.columns:
+        if column not in schema.names:
+            logger.debug("Column {} is not in the collection schema".format(
+                column))
+            field = pa.field(column, pa.Array.from_pandas(table[column]).type)
+            fields += [field]
+            arrays += [pa.Array.from_pandas(table[column])]
+    return pa.Table.from_arrays(arrays,
+                                schema=pa.schema(fields,
+                                                 metadata=schema.metadata))
+
+
+def _to_array(column, dtype):
+    if pa.types.is_timestamp(dtype):
+        values = pd.to_datetime(column, errors="coerce")
+    elif pa.types.is_date(dtype):
+        values = pd.to_datetime(column, errors="coerce").values.astype(
+            "datetime64[D]")
+    elif pa.types.is_floating(dtype):
+        values = pd.to_numeric(column, errors="coerce").astype(float)
+    else:
+        values = column.where(column.notnull(), None).astype(object)
+        values = values.map(lambda value: value if value is None
+                            else str(value))
+    return pa.Array.from_pandas(values, type=dtype)
+
+
+def write_arrow(table, path, **kwargs):
+    """
+    Writes an arrow table to a compressed Parquet file, replacing the file in
+    one step once it is complete
+
+    Args:
+        table (pa.Table): table to write
+        path (str): destination file
+        **kwargs: further options of pyarrow.parquet.write_table
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fobj:
+            pq.write_table(table, fobj, compression=COMPRESSION, **kwargs)
+            fobj.flush()
+            os.fsync(fobj.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_collection(table, path, schema=COLLECTION_SCHEMA):
+    """
+    Writes a collection table to a compressed columnar file, replacing the
+    file in one step once it is complete
+
+    Args:
+        table (pd.DataFrame): collection table indexed by symbol
+        path (str): destination file
+        schema (pa.Schema): types to write the columns with
+    """
+    write_arrow(to_arrow(table, schema), path)
+    logger.debug("Saved collection of {} rows: {}".format(len(table.index),
+                                                          path))
+
+
+def read_collection(path, columns=None):
+    """
+    Reads a collection table, or just some of its columns
+
+    Args:
+        path (str): collection file
+        columns (list(str)): columns to read, None to read them all
+
+    Returns:
+        pd.DataFrame: collection table indexed by symbol
+    """
+    if columns is not None:
+        columns = [INDEX_FIELD] + [column for column in columns
+                                   if column != INDEX_FIELD]
+    table = pq.read_table(path, columns=columns).to_pandas()
+    return table.set_index(INDEX_FIELD).rename_axis(None)
+
+
+def read_schema(path):
+    """
+    Args:
+        path (str): collection file
+
+    Returns:
+        pa.Schema: columns and types of the file, without reading its rows
+    """
+    return pq.read_schema(path)
+
+
+def export_csv(path, csv_path, columns=None):
+    """
+    Exports a collection file, or just some of its columns, as CSV
+
+    Args:
+        path (str): collection file
+        csv_path (str): destination CSV file
+        columns (list(str)): columns to export, None to export them all
+    """
+    read_collection(path, columns=columns).to_csv(csv_path)
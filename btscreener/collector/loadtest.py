@@ -0,0 +1,214 @@
+"""
+End to end load tests of the collector against a local IEX stand-in.
+
+Each scenario starts a StubIEXServer serving a synthetic universe, and then
+collects every symbol of it in a fresh process, either through run_collection
+or through the whole of run.py. The process is timed and its peak memory read
+back when it is reaped, while the server records how long each request took to
+answer and with which status, so the scenarios can be compared as the
+universe size and the pool size grow.
+"""
+import logging
+import os
+import sys
+import json
+import time
+import tempfile
+import itertools
+import subprocess
+from collections import OrderedDict
+
+import pandas as pd
+
+from btscreener.sources.iex import load_symbols
+from btscreener.sources.stubserver import StubIEXServer
+from btscreener.collector.collect import run_collection
+from btscreener.collector.archive import find_collections
+from btscreener.collector.columnar import read_collection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UNIVERSE_SIZES = [100, 1000, 10000]
+"""list(int): default numbers of symbols served"""
+
+DEFAULT_POOL_SIZES = [1, 4]
+"""list(int): default pool sizes of the collector"""
+
+MODES = ["collection", "run"]
+"""list(str): ways of collecting, run_collection alone or the whole of run.py"""
+
+COLLECTION_COMMAND = ("import sys; "
+                      "from btscreener.collector.loadtest import "
+                      "collect_universe; "
+                      "collect_universe(int(sys.argv[1]))")
+"""str: script of the process collecting in collection mode"""
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+"""str: directory the btscreener package is imported from"""
+
+
+def collect_universe(pool_size):
+    """
+    Collects every symbol the server lists with run_collection, and prints
+    the number of symbols and failures as JSON
+
+    Args:
+        pool_size (int): pool size for multiprocessing
+    """
+    symbols = load_symbols()
+    collection = run_collection(symbols, pool_size=pool_size)
+    failed = (int(collection["error"].notnull().sum())
+              if "error" in collection else 0)
+    print(json.dumps({"symbols": len(symbols), "failed": failed}))
+
+
+def scenario_command(mode, pool_size, run_args=()):
+    """
+    Args:
+        mode (str): one of MODES
+        pool_size (int): pool size for multiprocessing
+        run_args (list(str)): further arguments of run.py in run mode
+
+    Returns:
+        list(str): command line of the collecting process
+    """
+    if mode == "collection":
+        return [sys.executable, "-c", COLLECTION_COMMAND, str(pool_size)]
+    elif mode == "run":
+        return [sys.executable, "-m", "btscreener.run", "--group", "iex",
+                "--pool-size", str(pool_size)] + list(run_args)
+    else:
+        raise KeyError("No mode '{}'".format(mode))
+
+
+def run_process(command, cwd, env, log_path):
+    """
+    Runs a command to completion, with its output going to a log file
+
+    Args:
+        command (list(str)): command line
+        cwd (str): working directory
+        env (dict): environment variables
+        log_path (str): file the output is written to
+
+    Returns:
+        tuple: exit code, seconds it ran and peak resident memory in bytes of
+            its largest process, pool workers included
+    """
+    start_time = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log,
+                                   stderr=subprocess.STDOUT)
+        # reaping it here gives the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start_time
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux
+    return process.returncode, seconds, usage.ru_maxrss * 1024
+
+
+def count_failures(mode, work_dir, log_path):
+    """
+    Args:
+        mode (str): one of MODES
+        work_dir (str): working directory of the collecting process
+        log_path (str): output of the collecting process
+
+    Returns:
+        int: number of symbols that failed to collect, None if the process
+            left no collection behind
+    """
+    if mode == "collection":
+        with open(log_path) as fobj:
+            lines = [line for line in fobj if line.startswith("{")]
+        return json.loads(lines[-1])["failed"] if lines else None
+    for _, _, path in find_collections(os.path.join(work_dir, "collections")):
+        collection = read_collection(path, columns=["error"])
+        return int(collection["error"].notnull().sum())
+    return None
+
+
+def run_scenario(mode, universe, pool_size, work_dir, run_args=(),
+                 **server_args):
+    """
+    Collects a synthetic universe from a fresh stub server
+
+    Args:
+        mode (str): one of MODES
+        universe (int): number of symbols served
+        pool_size (int): pool size for multiprocessing
+        work_dir (str): directory for the output of the scenario
+        run_args (list(str)): further arguments of run.py in run mode
+        **server_args: latency, errors and rate limit of the server, as for
+            StubIEXServer
+
+    Returns:
+        OrderedDict: throughput, request latency percentiles, peak memory and
+            failures of the scenario
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    log_path = os.path.join(work_dir, "output.log")
+    with StubIEXServer(universe=universe, **server_args) as server:
+        env = dict(os.environ, IEX_BASE_URL=server.base_url)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+        logger.info("Running {} of {} symbols with pool size {}".format(
+            mode, universe, pool_size))
+        returncode, seconds, peak_rss = run_process(
+            scenario_command(mode, pool_size, run_args=run_args),
+            work_dir, env, log_path)
+        stats = server.stats()
+    if returncode != 0:
+        logger.error("{} of {} symbols exited with {}, see {}".format(
+            mode, universe, returncode, log_path))
+    statuses = stats["statuses"]
+    return OrderedDict([
+        ("mode", mode),
+        ("symbols", universe),
+        ("pool_size", pool_size),
+        ("seconds", seconds),
+        ("symbols_per_second", universe / seconds),
+        ("requests", stats["requests"]),
+        ("rejected", sum(count for status, count in statuses.items()
+                         if status >= 400)),
+        ("p50_ms", _ms(stats["p50"])),
+        ("p95_ms", _ms(stats["p95"])),
+        ("p99_ms", _ms(stats["p99"])),
+        ("peak_rss_mb", peak_rss / 2 ** 20),
+        ("failed", count_failures(mode, work_dir, log_path)),
+        ("returncode", returncode),
+    ])
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+def run_load_test(universe_sizes=DEFAULT_UNIVERSE_SIZES,
+                  pool_sizes=DEFAULT_POOL_SIZES, modes=MODES, work_dir=None,
+                  **kwargs):
+    """
+    Runs a scenario for every mode, universe size and pool size
+
+    Args:
+        universe_sizes (list(int)): numbers of symbols served
+        pool_sizes (list(int)): pool sizes of the collector
+        modes (list(str)): ways of collecting, from MODES
+        work_dir (str): directory for the output of the scenarios, None for a
+            temporary one
+        **kwargs: further settings, as for run_scenario
+
+    Returns:
+        pd.DataFrame: run_scenario result of each scenario
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = work_dir or tmp_dir
+        rows = []
+        for mode, universe, pool_size in itertools.product(
+                modes, universe_sizes, pool_sizes):
+            scenario_dir = os.path.join(work_dir, "{}_{}_{}".format(
+                mode, universe, pool_size))
+            rows += [run_scenario(mode, universe, pool_size, scenario_dir,
+                                  **kwargs)]
+    return pd.DataFrame(rows)
@@ -0,0 +1,210 @@
+"""
+Collection as a two-stage producer/consumer pipeline.
+
+A pool of threads fetches chunks of symbols with batch requests and hands them
+over through a bounded queue to a pool of processes, which run the backtests
+and calendar summaries. The network and the CPUs are busy at the same time, so
+a run takes about as long as the slower of the two stages rather than the sum.
+The histories of each fetched chunk are published to a PriceArena, which the
+processes map instead of unpickling a copy of every history.
+"""
+import logging
+import queue
+from collections import OrderedDict
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait,
+    as_completed
+)
+
+import pandas as pd
+
+from btscreener.collector.collect import (
+    load_basket_universe, load_basket_symbol, summarize_row, error_row,
+    chunked, DEFAULT_CHUNK_SIZE
+)
+from btscreener.sources.arena import PriceArena
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FETCH_WORKERS = 8
+"""int: default number of threads fetching chunks"""
+
+DEFAULT_COMPUTE_WORKERS = 4
+"""int: default number of processes running backtests"""
+
+
+def yield_pipeline_rows(symbols, fetch_workers=DEFAULT_FETCH_WORKERS,
+                        compute_workers=DEFAULT_COMPUTE_WORKERS,
+                        chunk_size=DEFAULT_CHUNK_SIZE, queue_size=None,
+                        store=None, states=None, timeframes=()):
+    """
+    Collects tickers, overlapping the downloads with the backtests and
+    yielding the rows as they finish, in no particular order
+
+    Unlike yield_rows with a pool, there is no deadline per ticker: the
+    fetching threads and the backtest processes cannot be stopped safely, so
+    only the IEX request timeout bounds a hung download.
+
+    Args:
+        symbols (list(str)): tickers to collect
+        fetch_workers (int): threads fetching chunks of symbols
+        compute_workers (int): processes running the backtests, 0 to run them
+            in this process
+        chunk_size (int): symbols fetched together in one batch
+        queue_size (int): fetched chunks waiting for the compute stage before
+            the fetchers block, defaults to twice the compute workers
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+        states (btscreener.chart.state.StateStore): saved indicator states,
+            None to run backtests
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one, with fields prefixed by their name
+
+    Yields:
+        tuple: symbol and row of each ticker
+    """
+    symbols = list(symbols)
+    chunks = chunked(symbols, chunk_size)
+    fetched = queue.Queue(maxsize=queue_size or 2 * max(compute_workers, 1))
+    max_pending = 4 * max(compute_workers, 1)
+
+    def fetch(chunk):
+        try:
+            universe = load_basket_universe(chunk, store=store,
+                                            timeframes=timeframes)
+        except Exception as e:
+            logger.warning("Batch load of {} failed, loading them one at a "
+                           "time: {}".format(chunk, e))
+            universe = {}
+            for symbol in chunk:
+                try:
+                    universe[symbol] = load_basket_symbol(
+                        symbol, store=store, timeframes=timeframes)
+                except Exception as e:
+                    universe[symbol] = e
+        fetched.put((chunk, universe))
+
+    fetchers = ThreadPoolExecutor(max_workers=fetch_workers)
+    computers = (ProcessPoolExecutor(max_workers=compute_workers)
+                 if compute_workers > 0 else None)
+    fetches = []
+    # future -> symbol and the arena holding its history
+    pending = {}
+    # arena -> pending futures using it, plus one while its chunk is submitted
+    users = OrderedDict()
+
+    def release(arena):
+        users[arena] -= 1
+        if users[arena] == 0:
+            del users[arena]
+            arena.close()
+
+    def finish(future):
+        symbol, arena = pending.pop(future)
+        release(arena)
+        return symbol, _result(future)
+
+    try:
+        fetches = [fetchers.submit(fetch, chunk) for chunk in chunks]
+
+        for _ in chunks:
+            chunk, universe = fetched.get()
+            logger.debug("Fetched chunk of {} symbols".format(len(chunk)))
+            if computers is not None:
+                arena = PriceArena.publish(OrderedDict(
+                    (symbol, universe[symbol][0]) for symbol in chunk
+                    if not isinstance(universe[symbol], Exception)))
+                users[arena] = 1
+            for symbol in chunk:
+                if isinstance(universe[symbol], Exception):
+                    yield symbol, error_row(universe[symbol])
+                elif computers is None:
+                    yield symbol, _summarize(universe[symbol], symbol, states,
+                                             timeframes)
+                else:
+                    pending[computers.submit(
+                        summarize_shared, arena.handle, symbol,
+                        *universe[symbol][1:], states=states,
+                        timeframes=timeframes)] = (symbol, arena)
+                    users[arena] += 1
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield finish(future)
+            if computers is not None:
+                release(arena)
+
+        for future in as_completed(list(pending)):
+            yield finish(future)
+    finally:
+        # if the caller stops early, drain the queue so that no fetcher stays
+        # blocked on it
+        for future in fetches:
+            future.cancel()
+        while not all(future.done() for future in fetches):
+            try:
+                fetched.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        fetchers.shutdown()
+        if computers is not None:
+            computers.shutdown(cancel_futures=True)
+        for arena in users:
+            arena.close()
+
+
+def summarize_shared(handle, symbol, dividend_history, earnings_history,
+                     states=None, timeframes=()):
+    """
+    Runs summarize_row on a history mapped from a PriceArena
+
+    Args:
+        handle (btscreener.sources.arena.ArenaHandle): arena of the history
+        symbol (str): ticker to summarize
+        dividend_history (pd.DataFrame): dividends table, or None
+        earnings_history (pd.DataFrame): earnings table, or None
+        states (btscreener.chart.state.StateStore): saved indicator states,
+            None to run a backtest
+        timeframes (list(str)): timeframes of
+            btscreener.chart.backtest.TIMEFRAMES to evaluate besides the daily
+            one, with fields prefixed by their name
+
+    Returns:
+        pd.Series: the combined summaries
+    """
+    hist = PriceArena.attach(handle).table(symbol)
+    return summarize_row(hist, dividend_history, earnings_history,
+                         symbol=symbol, states=states, timeframes=timeframes)
+
+
+def _summarize(data, symbol, states, timeframes):
+    try:
+        return summarize_row(*data, symbol=symbol, states=states,
+                             timeframes=timeframes)
+    except Exception as e:
+        return error_row(e)
+
+
+def _result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return error_row(e)
+
+
+def run_pipeline(symbols, **kwargs):
+    """
+    Collects the same table as run_collection, overlapping the downloads with
+    the backtests
+
+    Args:
+        symbols (list(str)): tickers to collect
+        **kwargs: stage settings, as for yield_pipeline_rows
+
+    Returns:
+        pd.DataFrame: collection table indexed by symbol
+    """
+    symbols = list(symbols)
+    rows = dict(yield_pipeline_rows(symbols, **kwargs))
+    return pd.DataFrame([rows[symbol] for symbol in symbols], index=symbols)
@@ -0,0 +1,193 @@
+"""
+Collections split across machines.
+
+A symbol group is split into shards by a stable hash of each ticker, so every
+node given the same shard of the same group collects the same symbols, and
+writes them to its own partial collection file next to where the whole
+collection would go. Each partial records which shard of how many it holds,
+and the symbols of the whole group, so that once the partials are gathered in
+one directory they can be merged into the normal collection, and a shard that
+never arrived is caught instead of leaving its symbols out.
+"""
+import logging
+import os
+import re
+import glob
+import json
+import zlib
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from btscreener.collector.columnar import (
+    to_arrow, write_arrow, read_collection, COLLECTION_SCHEMA
+)
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEY = b"btscreener.shard"
+"""bytes: metadata key of the shard a partial collection file holds"""
+
+SHARD_FORMAT = "{index}-of-{count}"
+"""str: part of the file name of a partial collection telling its shard"""
+
+_SHARD_PATTERN = re.compile(r"^(\d+)/(\d+)$")
+
+
+def parse_shard(text):
+    """
+    Args:
+        text (str): shard as "i/n", the i-th of n shards counting from 1
+
+    Returns:
+        tuple(int): index and count of the shard
+    """
+    match = _SHARD_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError("Shard '{}' is not of the form i/n".format(text))
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError("Shard {} is not within 1/{} to {}/{}".format(
+            text, count, count, count))
+    return index, count
+
+
+def shard_of(symbol, count):
+    """
+    Args:
+        symbol (str): stock ticker
+        count (int): number of shards
+
+    Returns:
+        int: shard of the ticker counting from 1, the same on every machine
+            and every run, unlike hash() which is salted per process
+    """
+    return zlib.crc32(symbol.encode()) % count + 1
+
+
+def select_shard(symbols, index, count):
+    """
+    Args:
+        symbols (list(str)): tickers of the whole group
+        index (int): shard counting from 1
+        count (int): number of shards
+
+    Returns:
+        list(str): tickers of the shard, in the order of the group
+    """
+    return [symbol for symbol in symbols if shard_of(symbol, count) == index]
+
+
+def shard_path(path, index, count):
+    """
+    Args:
+        path (str): file of the whole collection, or of another of its
+            artifacts such as the checkpoint
+        index (int): shard counting from 1
+        count (int): number of shards
+
+    Returns:
+        str: the file of the shard, e.g. "x_collection.2-of-4.parquet" for
+            "x_collection.parquet"
+    """
+    root, ext = os.path.splitext(path)
+    return "{}.{}{}".format(root, SHARD_FORMAT.format(index=index,
+                                                      count=count), ext)
+
+
+def find_shards(path):
+    """
+    Args:
+        path (str): file of the whole collection
+
+    Returns:
+        list(str): partial collection files of it, of any shard count
+    """
+    root, ext = os.path.splitext(path)
+    pattern = "{}.*-of-*{}".format(glob.escape(root), ext)
+    return sorted(glob.glob(pattern))
+
+
+def write_shard(table, path, index, count, symbols,
+                schema=COLLECTION_SCHEMA):
+    """
+    Writes a partial collection with the shard it holds in its metadata
+
+    Args:
+        table (pd.DataFrame): collection table of the symbols of the shard
+        path (str): destination file, as shard_path names it
+        index (int): shard counting from 1
+        count (int): number of shards
+        symbols (list(str)): tickers of the whole group, so the merge can
+            put the rows back in their order
+        schema (pa.Schema): types to write the columns with
+    """
+    arrow_table = to_arrow(table, schema)
+    metadata = dict(arrow_table.schema.metadata or {})
+    metadata[SHARD_KEY] = json.dumps({
+        "index": index,
+        "count": count,
+        "symbols": list(symbols),
+    })
+    write_arrow(arrow_table.replace_schema_metadata(metadata), path)
+    logger.debug("Saved shard {}/{} of {} rows: {}".format(
+        index, count, len(table.index), path))
+
+
+def read_shard_info(path):
+    """
+    Args:
+        path (str): partial collection file
+
+    Returns:
+        dict: index and count of the shard the file holds, and the tickers of
+            the whole group
+    """
+    metadata = pq.read_schema(path).metadata or {}
+    if SHARD_KEY not in metadata:
+        raise ValueError("{} is not a partial collection".format(path))
+    return json.loads(metadata[SHARD_KEY].decode())
+
+
+def merge_shards(paths):
+    """
+    Merges the partial collections of every shard of a group into the table
+    the whole group would have been collected into
+
+    Args:
+        paths (list(str)): partial collection files, one per shard
+
+    Returns:
+        pd.DataFrame: collection table indexed by symbol, in the order of the
+            group as the first partial lists it, with a warning for symbols
+            none of the shards has
+    """
+    if not paths:
+        raise ValueError("No partial collections to merge")
+    infos = [read_shard_info(path) for path in paths]
+    count = infos[0]["count"]
+    symbols = infos[0]["symbols"]
+    shards = {}
+    for path, info in zip(paths, infos):
+        # a group kept in a set comes out in another order on every node
+        if info["count"] != count or set(info["symbols"]) != set(symbols):
+            raise ValueError("{} is shard {}/{} of another split than "
+                             "{}".format(path, info["index"], info["count"],
+                                         paths[0]))
+        if info["index"] in shards:
+            raise ValueError("Shard {}/{} is both {} and {}".format(
+                info["index"], count, shards[info["index"]], path))
+        shards[info["index"]] = path
+    missing = [index for index in range(1, count + 1) if index not in shards]
+    if missing:
+        raise ValueError("Missing shards {} of {}".format(
+            ", ".join("{}/{}".format(index, count) for index in missing),
+            count))
+    table = pd.concat([read_collection(shards[index])
+                       for index in range(1, count + 1)])
+    absent = [symbol for symbol in symbols if symbol not in table.index]
+    if absent:
+        logger.warning("Merged shards lack {} symbols: {}".format(
+            len(absent), ", ".join(absent)))
+    return table.reindex([symbol for symbol in symbols
+                          if symbol in table.index])
@@ -0,0 +1,261 @@
+"""
+Parameter sweeps of a strategy over many symbols.
+
+A sweep backtests every cell of a parameter grid against every symbol. The
+histories are loaded once, with batch requests, and published to a PriceArena
+that the pool workers map, so no history is pickled. Each pool job backtests
+cells of one symbol. The analyzer results of each cell are appended to a
+Checkpoint keyed by symbol and parameters, so an interrupted sweep resumes
+with the cells it has not finished.
+"""
+import logging
+import json
+import itertools
+from collections import OrderedDict
+from multiprocessing import Pool
+
+import pandas as pd
+import backtrader as bt
+
+from btscreener.sources.iex import load_histories
+from btscreener.sources.arena import PriceArena, ArenaHandle
+from btscreener.chart.strategies.stadtd import BreakoutStrategy
+from btscreener.collector.collect import chunked, error_row
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKBACK = "1y"
+"""str: default history each cell is backtested over"""
+
+DEFAULT_CASH = 10000.0
+"""float: starting cash of each backtest"""
+
+DEFAULT_STAKE_PERCENT = 90
+"""int: percent of the cash put into each entry"""
+
+DEFAULT_CELLS_PER_JOB = 32
+"""int: default number of grid cells of a symbol backtested in one pool job"""
+
+RESULT_FIELDS = ["total_return", "max_drawdown", "trades", "won"]
+"""list(str): analyzer results of each cell"""
+
+
+def expand_grid(grid):
+    """
+    Args:
+        grid (dict): values to try keyed by parameter name
+
+    Returns:
+        list(OrderedDict): every combination of the values, the last
+            parameter varying fastest
+    """
+    names = list(grid)
+    return [OrderedDict(zip(names, values))
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def cell_key(symbol, params):
+    """
+    Args:
+        symbol (str): ticker of the cell
+        params (dict): parameters of the cell
+
+    Returns:
+        str: key of the cell in a sweep checkpoint
+    """
+    return "{} {}".format(symbol, json.dumps(params, sort_keys=True))
+
+
+def run_strategy(table, params, strategy=BreakoutStrategy, cash=DEFAULT_CASH):
+    """
+    Backtests a strategy with one set of parameters
+
+    Args:
+        table (pd.DataFrame): table of historical data to backtest
+        params (dict): strategy parameters
+        strategy (bt.Strategy): strategy to backtest
+        cash (float): starting cash
+
+    Returns:
+        OrderedDict: the RESULT_FIELDS of the backtest
+    """
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.addstrategy(strategy, **params)
+    cerebro.adddata(bt.feeds.PandasData(dataname=table.set_index("date")))
+    cerebro.broker.setcash(cash)
+    cerebro.addsizer(bt.sizers.PercentSizer, percents=DEFAULT_STAKE_PERCENT)
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
+    result = cerebro.run(runonce=True)[0]
+    drawdown = result.analyzers.drawdown.get_analysis()
+    trades = result.analyzers.trades.get_analysis()
+    return OrderedDict([
+        ("total_return", result.broker.getvalue() / cash - 1.0),
+        ("max_drawdown", drawdown["max"]["drawdown"] / 100.0),
+        ("trades", trades.get("total", {}).get("closed", 0)),
+        ("won", trades.get("won", {}).get("total", 0)),
+    ])
+
+
+def sweep_symbol(symbol, table, cells, strategy=BreakoutStrategy,
+                 cash=DEFAULT_CASH):
+    """
+    Backtests cells of a grid against one symbol. A cell that fails gets an
+    error_row instead of failing the others.
+
+    Args:
+        symbol (str): ticker of the history
+        table (pd.DataFrame): table of historical data to backtest
+        cells (list(dict)): parameters of each cell
+        strategy (bt.Strategy): strategy to backtest
+        cash (float): starting cash
+
+    Returns:
+        list(tuple): key and result row of each cell
+    """
+    rows = []
+    for params in cells:
+        try:
+            results = run_strategy(table, params, strategy=strategy,
+                                   cash=cash)
+        except Exception as e:
+            logger.error("Failed to backtest {} with {}: {}".format(
+                symbol, params, e))
+            results = error_row(e)
+        row = pd.Series(OrderedDict(
+            [("symbol", symbol)] + list(params.items())
+            + list(results.items())))
+        rows += [(cell_key(symbol, params), row)]
+    return rows
+
+
+def _sweep_job(job):
+    symbol, table = job[:2]
+    if isinstance(table, ArenaHandle):
+        table = PriceArena.attach(table).table(symbol)
+    return sweep_symbol(symbol, table, *job[2:])
+
+
+def yield_sweep_rows(tables, cells, pool_size=0, strategy=BreakoutStrategy,
+                     cash=DEFAULT_CASH, done=(),
+                     cells_per_job=DEFAULT_CELLS_PER_JOB):
+    """
+    Backtests every cell against every history, yielding the rows as their
+    job finishes, in no particular order
+
+    Args:
+        tables (dict): historical data tables keyed by symbol
+        cells (list(dict)): parameters of each cell, e.g. from expand_grid
+        pool_size (int): pool size for multiprocessing, 0 to run serially
+        strategy (bt.Strategy): strategy to backtest
+        cash (float): starting cash
+        done (set(str)): keys of the cells to skip
+        cells_per_job (int): cells of a symbol backtested in one pool job
+
+    Yields:
+        tuple: key and result row of each cell
+    """
+    jobs = []
+    for symbol, table in tables.items():
+        if table is None or len(table.index) == 0:
+            e = ValueError("no history for {}".format(symbol))
+            for params in cells:
+                if cell_key(symbol, params) not in done:
+                    yield cell_key(symbol, params), pd.Series(OrderedDict(
+                        [("symbol", symbol)] + list(params.items())
+                        + list(error_row(e).items())))
+            continue
+        remaining = [params for params in cells
+                     if cell_key(symbol, params) not in done]
+        jobs += [(symbol, table, chunk, strategy, cash)
+                 for chunk in chunked(remaining, cells_per_job)]
+    logger.info("Sweeping {} jobs".format(len(jobs)))
+    if pool_size > 0:
+        # the workers map the histories instead of unpickling them per job
+        with PriceArena.publish(OrderedDict(
+                (job[0], job[1]) for job in jobs)) as arena:
+            jobs = [(symbol, arena.handle, chunk, strategy, cash)
+                    for symbol, _, chunk, strategy, cash in jobs]
+            with Pool(pool_size) as p:
+                for rows in p.imap_unordered(_sweep_job, jobs):
+                    yield from rows
+    else:
+        for job in jobs:
+            yield from _sweep_job(job)
+
+
+def run_sweep(symbols, grid, pool_size=0, checkpoint=None,
+              lookback=DEFAULT_LOOKBACK, store=None, tables=None,
+              strategy=BreakoutStrategy, **kwargs):
+    """
+    Backtests every cell of a parameter grid against every symbol
+
+    Args:
+        symbols (list(str)): tickers to backtest
+        grid (dict): values to try keyed by strategy parameter name
+        pool_size (int): pool size for multiprocessing, 0 to run serially
+        checkpoint (btscreener.collector.checkpoint.Checkpoint): where to
+            append the finished cells, skipping those already in it. None to
+            keep them in memory only.
+        lookback (str): history each cell is backtested over
+        store (btscreener.sources.store.BarStore): local store to serve the
+            histories from, None to always download them
+        tables (dict): historical data tables keyed by symbol, instead of
+            loading them
+        strategy (bt.Strategy): strategy to backtest
+        **kwargs: further settings, as for yield_sweep_rows
+
+    Returns:
+        pd.DataFrame: symbol, parameters and RESULT_FIELDS of each cell, in
+            order of the symbols and then of the grid
+    """
+    unknown = set(grid) - set(strategy.params._getkeys())
+    if unknown:
+        raise ValueError("{} has no parameters {}".format(
+            strategy.__name__, ", ".join(sorted(unknown))))
+    symbols = list(symbols)
+    cells = expand_grid(grid)
+    keys = [cell_key(symbol, params) for symbol in symbols
+            for params in cells]
+    done = checkpoint.resume() if checkpoint is not None else set()
+    if len(done.intersection(keys)) == len(keys):
+        tables = {}
+    elif tables is None:
+        tables = load_histories(symbols, lookback=lookback, store=store)
+    tables = {symbol: tables[symbol] for symbol in symbols if any(
+        cell_key(symbol, params) not in done for params in cells)}
+    rows = yield_sweep_rows(tables, cells, pool_size=pool_size,
+                            strategy=strategy, done=done, **kwargs)
+    if checkpoint is None:
+        rows = dict(rows)
+        table = pd.DataFrame(list(rows.values()), index=list(rows))
+    else:
+        with checkpoint:
+            for key, row in rows:
+                checkpoint.append(key, row)
+        table = checkpoint.load()
+    return table.reindex(keys).reset_index(drop=True)
+
+
+def summarize_sweep(table, params=None):
+    """
+    Averages the results of a sweep over the symbols
+
+    Args:
+        table (pd.DataFrame): run_sweep result
+        params (list(str)): parameter columns to group by, defaults to every
+            column that is not the symbol, a result or an error
+
+    Returns:
+        pd.DataFrame: mean RESULT_FIELDS and number of symbols of each cell,
+            best total return first
+    """
+    if params is None:
+        params = [column for column in table.columns
+                  if column not in ["symbol", "error"] + RESULT_FIELDS]
+    if "error" in table:
+        table = table[table["error"].isnull()]
+    grouped = table.groupby(params)
+    summary = grouped[RESULT_FIELDS].mean()
+    summary["symbols"] = grouped["symbol"].nunique()
+    return summary.sort_values("total_return", ascending=False)
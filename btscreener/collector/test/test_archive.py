@@ -0,0 +1,109 @@
+import os
+import datetime
+
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from btscreener.collector.columnar import write_collection
+from btscreener.collector.archive import (
+    CollectionArchive, find_collections, ROW_GROUP_SIZE
+)
+
+SYMBOLS = ["AAPL", "MSFT", "SPY"]
+START = datetime.date(2019, 1, 2)
+
+
+def make_collection(day, symbols=SYMBOLS):
+    # values encode the day and symbol, so every row can be checked
+    return pd.DataFrame({
+        "datetime": [pd.Timestamp(START + datetime.timedelta(days=day))] * len(
+            symbols),
+        "close": [100.0 * (i + 1) + day for i in range(len(symbols))],
+        "td_count": [float(day % 9)] * len(symbols),
+        "stad_trend": [1.0 if day % 2 else -1.0] * len(symbols),
+    }, index=symbols)
+
+
+def save_collection(collection_dir, day, group="faves", **kwargs):
+    date = START + datetime.timedelta(days=day)
+    path = os.path.join(collection_dir, str(date),
+                        "{}_{}_collection.parquet".format(date, group))
+    write_collection(make_collection(day, **kwargs), path)
+    return path
+
+
+@pytest.fixture
+def collections(tmpdir):
+    collection_dir = str(tmpdir.join("collections"))
+    for day in range(10):
+        save_collection(collection_dir, day)
+    save_collection(collection_dir, 0, group="dji", symbols=["KO"])
+    return collection_dir
+
+
+@pytest.fixture
+def archive(tmpdir):
+    return CollectionArchive(str(tmpdir.join("archive")))
+
+
+def test_find_collections(collections):
+    found = list(find_collections(collections))
+    assert len(found) == 11
+    assert (START, "dji") in [(date, group) for date, group, _ in found]
+
+
+def test_compact(collections, archive):
+    assert len(archive.compact(collections)) == 11
+    assert archive.groups() == ["dji", "faves"]
+    assert len(archive.dates("faves")) == 10
+    # nothing changed, nothing to fold
+    assert archive.compact(collections) == []
+
+    save_collection(collections, 10)
+    assert len(archive.compact(collections)) == 1
+    assert len(archive.dates("faves")) == 11
+
+
+def test_compact_replaces_date(collections, archive):
+    archive.compact(collections)
+    path = save_collection(collections, 3, symbols=["AAPL"])
+    # make sure the rewritten file looks changed
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert archive.compact(collections) == [path]
+    day = START + datetime.timedelta(days=3)
+    table = archive.read("faves", start=day, end=day)
+    assert list(table["symbol"]) == ["AAPL"]
+
+
+def test_history(collections, archive):
+    archive.compact(collections)
+    history = archive.history("MSFT", "faves",
+                              fields=["stad_trend", "td_count"])
+    assert list(history.columns) == ["stad_trend", "td_count"]
+    assert len(history.index) == 10
+    assert history.index.is_monotonic_increasing
+    np.testing.assert_array_equal(history["td_count"], np.arange(10) % 9)
+
+    recent = archive.history("MSFT", "faves", fields=["close"], last=4)
+    np.testing.assert_array_equal(recent["close"], 200.0 + np.arange(6, 10))
+
+
+def test_field_history(collections, archive):
+    archive.compact(collections)
+    closes = archive.field_history("close", "faves", symbols=["AAPL", "SPY"],
+                                   start=START + datetime.timedelta(days=5))
+    assert list(closes.columns) == ["AAPL", "SPY"]
+    assert len(closes.index) == 5
+    np.testing.assert_array_equal(closes["SPY"], 300.0 + np.arange(5, 10))
+
+
+def test_sorted_by_symbol(collections, archive):
+    archive.compact(collections)
+    table = pq.read_table(archive.path("faves"))
+    symbols = table["symbol"].to_pylist()
+    assert symbols == sorted(symbols)
+    assert pq.ParquetFile(archive.path("faves")).metadata.row_group(
+        0).num_rows <= ROW_GROUP_SIZE
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+import pandas as pd
+
+from btscreener.collector.collect import run_collection, yield_rows
+from btscreener.collector.checkpoint import Checkpoint, run_checkpointed
+from btscreener.sources.test.fixtures import stub_server
+
+TEST_TICKERS = ["SPY", "QQQ", "IWM", "AAPL", "FB", "NFLX", "AMZN", "GOOGL"]
+
+
+@pytest.fixture
+def checkpoint(tmpdir):
+    return Checkpoint(str(tmpdir.join("collection.checkpoint")), chunk_rows=3)
+
+
+def test_yield_rows(stub_server):
+    expected = run_collection(TEST_TICKERS)
+    rows = list(yield_rows(TEST_TICKERS, pool_size=2, chunk_size=3))
+    assert sorted(symbol for symbol, _ in rows) == sorted(TEST_TICKERS)
+    for symbol, row in rows:
+        pd.testing.assert_series_equal(row.reindex(expected.columns),
+                                       expected.loc[symbol],
+                                       check_names=False, check_dtype=False)
+
+
+def test_checkpoint_resume(stub_server, checkpoint):
+    expected = run_collection(TEST_TICKERS)
+
+    def crash_after(rows, count):
+        for i, row in enumerate(rows):
+            if i == count:
+                raise RuntimeError("collection crashed")
+            yield row
+
+    with pytest.raises(RuntimeError):
+        run_checkpointed(crash_after(yield_rows(TEST_TICKERS), 5),
+                         checkpoint, TEST_TICKERS)
+    # the finished rows survive the crash, chunked or not
+    assert checkpoint.done() == set(TEST_TICKERS[:5])
+
+    # simulate a chunk cut short by the crash
+    with open(checkpoint.path, "ab") as fobj:
+        fobj.write(b"\x80\x04\x95partial")
+    done = checkpoint.resume()
+    assert done == set(TEST_TICKERS[:5])
+
+    remaining = [symbol for symbol in TEST_TICKERS if symbol not in done]
+    actual = run_checkpointed(yield_rows(remaining), checkpoint,
+                              TEST_TICKERS)
+    assert list(actual.index) == TEST_TICKERS
+    pd.testing.assert_frame_equal(actual[expected.columns], expected,
+                                  check_dtype=False)
+
+
+def test_checkpoint_clear(checkpoint):
+    checkpoint.append("SPY", pd.Series({"close": 1.0}))
+    checkpoint.flush()
+    assert checkpoint.done() == {"SPY"}
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.path)
+    assert checkpoint.load().empty
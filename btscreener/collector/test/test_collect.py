@@ -6,6 +6,7 @@ import pickle
 import pandas as pd
 
 from btscreener.collector.collect import create_row, run_collection
+from btscreener.sources.test.fixtures import stub_server
 
 TEST_TICKERS = ["SPY", "QQQ", "IWM", "AAPL", "FB", "NFLX", "AMZN", "GOOGL"]
 
@@ -34,4 +35,43 @@ def test_collect(pool_size):
     if pytest.config.getoption("--pickle", None):
         fn = os.path.join(os.path.dirname(__file__), "collection.pickle")
         with open(fn, mode="wb") as fobj:
-            pickle.dump(scan, fobj)
\ No newline at end of file
+            pickle.dump(scan, fobj)
+
+def test_panel_collection(stub_server):
+    from btscreener.collector.collect import run_panel_collection
+
+    expected = run_collection(TEST_TICKERS)
+    actual = run_panel_collection(TEST_TICKERS)
+    assert list(actual.columns) == list(expected.columns)
+    assert list(actual.index) == list(expected.index)
+    chart_columns = [column for column in expected.columns
+                     if column.startswith(("stad_", "prev_", "td_"))]
+    pd.testing.assert_frame_equal(actual[chart_columns].astype(float),
+                                  expected[chart_columns].astype(float))
+    calendar_columns = list(expected.columns[expected.columns.get_loc(
+        "prev_td_reversal") + 1:])
+    pd.testing.assert_frame_equal(actual[calendar_columns],
+                                  expected[calendar_columns],
+                                  check_dtype=False)
+
+def test_batch_collection(stub_server):
+    requests_before = stub_server.requests
+    scan = run_collection(TEST_TICKERS)
+    # one chart batch and one calendar batch, instead of three per symbol
+    assert stub_server.requests - requests_before == 2
+    for symbol in TEST_TICKERS[:2]:
+        row = create_row(symbol).reindex(scan.columns)
+        pd.testing.assert_series_equal(scan.loc[symbol], row,
+                                       check_names=False, check_dtype=False)
+
+def test_state_collection(stub_server, tmpdir):
+    from btscreener.chart.state import StateStore
+
+    states = StateStore(str(tmpdir))
+    expected = run_collection(TEST_TICKERS)
+    first = run_collection(TEST_TICKERS, states=states)
+    pd.testing.assert_frame_equal(first, expected, check_exact=False,
+                                  rtol=1e-12)
+    # nothing new to step over, so the saved states give the same rows
+    second = run_collection(TEST_TICKERS, pool_size=2, states=states)
+    pd.testing.assert_frame_equal(second, first)
@@ -0,0 +1,130 @@
+import os
+import pickle
+import datetime
+
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from btscreener.collector.collect import run_collection, error_row
+from btscreener.collector.columnar import (
+    write_collection, read_collection, read_schema, export_csv,
+    collection_schema, COLLECTION_SCHEMA, TIMEFRAME_FIELDS
+)
+from btscreener.sources.test.fixtures import stub_server
+
+TEST_TICKERS = ["SPY", "QQQ", "AAPL", "FB"]
+
+SAMPLE_COLLECTION = os.path.join(os.path.dirname(__file__), os.pardir,
+                                 os.pardir, "report", "test",
+                                 "collection.pickle")
+
+
+@pytest.fixture(scope="module")
+def sample():
+    with open(SAMPLE_COLLECTION, "rb") as fobj:
+        return pickle.load(fobj)
+
+
+def test_round_trip(sample, tmpdir):
+    path = str(tmpdir.join("collection.parquet"))
+    write_collection(sample, path)
+    table = read_collection(path)
+    assert list(table.index) == list(sample.index)
+    assert list(table.columns) == COLLECTION_SCHEMA.names[1:]
+    for column in sample.columns:
+        if column == "next_ex_date":
+            # kept as dates, not timestamps
+            assert (table[column].dropna() == sample[column].dropna()).all()
+            assert all(isinstance(value, datetime.date)
+                       for value in table[column].dropna())
+        elif column == "last_dividend_amount":
+            # blanks in the sample are not numbers
+            pd.testing.assert_series_equal(
+                table[column], pd.to_numeric(sample[column], errors="coerce"),
+                check_names=False)
+        else:
+            pd.testing.assert_series_equal(table[column], sample[column],
+                                           check_names=False)
+    assert table["error"].isnull().all()
+
+
+def test_timeframe_schema(tmpdir):
+    schema = collection_schema(["weekly"])
+    assert schema.names[:3] == ["symbol", "datetime", "close"]
+    assert "weekly_td_count" in schema.names
+    assert "monthly_td_count" not in schema.names
+    tables = []
+    # a day on which the weekly fields are all null, and one on which not
+    for day, weekly_close in enumerate([[None, None], [1.5, None]]):
+        path = str(tmpdir.join("{}.parquet".format(day)))
+        write_collection(pd.DataFrame({
+            "close": [1.0, 2.0],
+            "weekly_datetime": [None, None],
+            "weekly_close": weekly_close,
+        }, index=["SPY", "QQQ"]), path, schema=schema)
+        tables += [pq.read_table(path)]
+    for name, dtype in TIMEFRAME_FIELDS["weekly"]:
+        assert tables[0].schema.field(name).type == dtype
+    # so the days fold together without promoting any types
+    assert pa.concat_tables(tables).num_rows == 4
+
+
+def test_schema_types(sample, tmpdir):
+    path = str(tmpdir.join("collection.parquet"))
+    # types come from the schema, not from the rows that were collected
+    write_collection(sample.iloc[:1].astype(object), path)
+    schema = read_schema(path)
+    for field in COLLECTION_SCHEMA:
+        assert schema.field(field.name).type == field.type
+    assert schema.metadata[b"btscreener.schema"] == b"1"
+
+
+def test_select_columns(sample, tmpdir):
+    path = str(tmpdir.join("collection.parquet"))
+    write_collection(sample, path)
+    table = read_collection(path, columns=["close", "td_count"])
+    assert list(table.columns) == ["close", "td_count"]
+    pd.testing.assert_frame_equal(table, sample[["close", "td_count"]])
+
+
+def test_errors_and_extra_columns(stub_server, tmpdir):
+    collection = run_collection(TEST_TICKERS[:-1])
+    failed = error_row(ValueError("no data")).rename("FB")
+    collection = pd.concat([collection, failed.to_frame().T])
+    collection["note"] = "x"
+    path = str(tmpdir.join("collection.parquet"))
+    write_collection(collection, path)
+    table = read_collection(path)
+    assert table.loc["FB", "error"] == "ValueError: no data"
+    assert np.isnan(table.loc["FB", "close"])
+    assert table["error"].isnull().sum() == len(TEST_TICKERS) - 1
+    assert list(table["note"]) == ["x"] * len(TEST_TICKERS)
+    assert table.loc["SPY", "close"] == collection.loc["SPY", "close"]
+
+
+def test_atomic_write(sample, tmpdir, monkeypatch):
+    path = str(tmpdir.join("collection.parquet"))
+    write_collection(sample, path)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr("pyarrow.parquet.write_table", fail)
+    with pytest.raises(RuntimeError):
+        write_collection(sample.iloc[:1], path)
+    # the old file is untouched and no temporary file is left behind
+    assert len(read_collection(path).index) == len(sample.index)
+    assert os.listdir(str(tmpdir)) == ["collection.parquet"]
+
+
+def test_export_csv(sample, tmpdir):
+    path = str(tmpdir.join("collection.parquet"))
+    csv_path = str(tmpdir.join("collection.csv"))
+    write_collection(sample, path)
+    export_csv(path, csv_path, columns=["close"])
+    exported = pd.read_csv(csv_path, index_col=0)
+    assert list(exported.columns) == ["close"]
+    pd.testing.assert_series_equal(exported["close"], sample["close"])
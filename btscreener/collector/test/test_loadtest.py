@@ -0,0 +1,19 @@
+from btscreener.collector.loadtest import run_scenario
+
+
+def test_collection_scenario(tmpdir):
+    result = run_scenario("collection", 3, 0, str(tmpdir))
+    assert result["returncode"] == 0
+    assert result["failed"] == 0
+    assert result["requests"] == 3
+    assert result["rejected"] == 0
+    assert result["peak_rss_mb"] > 0
+    assert result["p50_ms"] <= result["p99_ms"]
+
+
+def test_run_scenario_errors(tmpdir):
+    """ A run that cannot list the symbols fails without a collection """
+    result = run_scenario("run", 3, 0, str(tmpdir), error_rate=1.0,
+                          run_args=["--retries", "0"])
+    assert result["returncode"] != 0
+    assert result["failed"] is None
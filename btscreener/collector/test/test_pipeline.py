@@ -0,0 +1,50 @@
+import time
+
+import pytest
+import pandas as pd
+
+from btscreener.collector import pipeline
+from btscreener.collector.collect import run_collection
+from btscreener.collector.pipeline import run_pipeline, chunked
+from btscreener.sources.test.fixtures import stub_server
+
+TEST_TICKERS = ["SPY", "QQQ", "IWM", "AAPL", "FB", "NFLX", "AMZN", "GOOGL"]
+
+
+def test_chunked():
+    assert chunked(TEST_TICKERS, 3) == [TEST_TICKERS[:3], TEST_TICKERS[3:6],
+                                        TEST_TICKERS[6:]]
+    assert chunked([], 3) == []
+
+
+@pytest.mark.parametrize("compute_workers", [0, 2])
+def test_pipeline(stub_server, compute_workers):
+    expected = run_collection(TEST_TICKERS)
+    start_time = time.perf_counter()
+    actual = run_pipeline(TEST_TICKERS, fetch_workers=3,
+                          compute_workers=compute_workers, chunk_size=3)
+    print("Pipeline took {}s".format(time.perf_counter() - start_time))
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_pipeline_fetch_error(stub_server, monkeypatch):
+    load_basket_universe = pipeline.load_basket_universe
+
+    def failing_universe(chunk, store=None):
+        if "FB" in chunk:
+            raise RuntimeError("fetch failed")
+        return load_basket_universe(chunk, store=store)
+
+    monkeypatch.setattr(pipeline, "load_basket_universe", failing_universe)
+    stub_server.fail_symbols = {"FB"}
+    try:
+        actual = run_pipeline(TEST_TICKERS, fetch_workers=2, compute_workers=0,
+                              chunk_size=2, queue_size=1)
+    finally:
+        stub_server.fail_symbols = set()
+    # the failure is recorded instead of aborting the run, and the rest of
+    # the failed chunk is loaded one symbol at a time
+    assert list(actual.index) == TEST_TICKERS
+    assert actual["error"].notnull().tolist() == [
+        symbol == "FB" for symbol in TEST_TICKERS]
+    assert actual["close"].notnull().sum() == len(TEST_TICKERS) - 1
@@ -0,0 +1,93 @@
+import os
+import pickle
+
+import pytest
+import pandas as pd
+
+from btscreener.collector.columnar import (
+    write_collection, read_collection, read_schema
+)
+from btscreener.collector.archive import find_collections
+from btscreener.collector.shard import (
+    parse_shard, shard_of, select_shard, shard_path, find_shards,
+    write_shard, merge_shards
+)
+
+SAMPLE_COLLECTION = os.path.join(os.path.dirname(__file__), os.pardir,
+                                 os.pardir, "report", "test",
+                                 "collection.pickle")
+
+
+@pytest.fixture(scope="module")
+def sample():
+    with open(SAMPLE_COLLECTION, "rb") as fobj:
+        return pickle.load(fobj)
+
+
+def write_shards(table, path, count, indexes=None):
+    symbols = list(table.index)
+    for index in indexes or range(1, count + 1):
+        shard = table.loc[select_shard(symbols, index, count)]
+        write_shard(shard, shard_path(path, index, count), index, count,
+                    symbols=symbols)
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    assert parse_shard("4/4") == (4, 4)
+    for text in ["0/4", "5/4", "1", "a/b", "1/0"]:
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_select_shard():
+    symbols = ["S{:04d}".format(i) for i in range(1000)]
+    shards = [select_shard(symbols, index, 4) for index in range(1, 5)]
+    # every symbol lands in exactly one shard, in the order of the group
+    assert sorted(sum(shards, [])) == symbols
+    assert all(shard == sorted(shard) for shard in shards)
+    assert all(150 < len(shard) < 350 for shard in shards)
+    # the split does not depend on the rest of the group
+    assert all(shard_of(symbol, 4) == index
+               for index, shard in enumerate(shards, 1) for symbol in shard)
+    assert select_shard(symbols[:10], 1, 1) == symbols[:10]
+
+
+def test_shard_path(tmpdir):
+    path = str(tmpdir.join("2018-06-29_iex_collection.parquet"))
+    assert shard_path(path, 2, 4) == str(tmpdir.join(
+        "2018-06-29_iex_collection.2-of-4.parquet"))
+    write_collection(pd.DataFrame(index=["SPY"]), path)
+    for index in [1, 2]:
+        write_collection(pd.DataFrame(index=["SPY"]),
+                         shard_path(path, index, 2))
+    assert find_shards(path) == [shard_path(path, 1, 2),
+                                 shard_path(path, 2, 2)]
+    # the partials are not mistaken for daily collections
+    assert [fn for _, _, fn in find_collections(str(tmpdir))] == [path]
+
+
+def test_merge_shards(sample, tmpdir):
+    path = str(tmpdir.join("2018-06-29_faves_collection.parquet"))
+    write_collection(sample, path)
+    expected = read_collection(path)
+    write_shards(sample, path, 3)
+    merged = merge_shards(find_shards(path))
+    pd.testing.assert_frame_equal(merged, expected)
+    write_collection(merged, path)
+    assert read_schema(path).equals(read_schema(shard_path(path, 1, 3)),
+                                    check_metadata=False)
+
+
+def test_merge_missing_shards(sample, tmpdir):
+    path = str(tmpdir.join("2018-06-29_faves_collection.parquet"))
+    write_shards(sample, path, 4, indexes=[1, 3])
+    with pytest.raises(ValueError, match="2/4, 4/4"):
+        merge_shards(find_shards(path))
+    with pytest.raises(ValueError):
+        merge_shards([])
+    # a partial of another split is not merged with these
+    write_shards(sample, path, 2, indexes=[2])
+    write_shards(sample, path, 4, indexes=[2, 4])
+    with pytest.raises(ValueError, match="another split"):
+        merge_shards(find_shards(path))
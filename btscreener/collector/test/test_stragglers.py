@@ -0,0 +1,120 @@
+import time
+import multiprocessing
+
+import pytest
+import pandas as pd
+
+from btscreener.sources import iex
+from btscreener.sources.iex import RequestException, load_earnings
+from btscreener.collector.collect import run_collection, yield_rows
+from btscreener.collector.checkpoint import Checkpoint, run_checkpointed
+from btscreener.sources.test.fixtures import stub_server
+
+TEST_TICKERS = ["SPY", "QQQ", "IWM", "AAPL", "FB", "NFLX", "AMZN", "GOOGL"]
+
+
+@pytest.fixture
+def faults(stub_server, monkeypatch):
+    monkeypatch.setattr(iex, "RETRY_BACKOFF", 0.01)
+    yield stub_server
+    stub_server.failures = 0
+    stub_server.fail_symbols = set()
+    stub_server.stalls = {}
+    stub_server.stall_time = 0.0
+
+
+def test_retry_transient(faults):
+    faults.failures = 2
+    requests_before = faults.requests
+    assert load_earnings("AAPL") is not None
+    assert faults.requests - requests_before == 3
+
+
+def test_request_timeout(faults, monkeypatch):
+    monkeypatch.setattr(iex, "REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(iex, "RETRIES", 1)
+    faults.stalls = {"AAPL": 2}
+    faults.stall_time = 1.0
+    start_time = time.perf_counter()
+    with pytest.raises(RequestException):
+        load_earnings("AAPL")
+    assert time.perf_counter() - start_time < 1.0
+
+
+@pytest.mark.parametrize("pool_size", [0, 2])
+def test_error_rows(faults, pool_size):
+    faults.fail_symbols = {"FB"}
+    table = run_collection(TEST_TICKERS, pool_size=pool_size)
+    assert list(table.index) == TEST_TICKERS
+    assert table["error"].notnull().tolist() == [
+        symbol == "FB" for symbol in TEST_TICKERS]
+    assert table.loc["FB", "error"].startswith("RequestException")
+    assert table["close"].notnull().sum() == len(TEST_TICKERS) - 1
+
+
+def test_checkpoint_retries_errors(faults, tmpdir):
+    checkpoint = Checkpoint(str(tmpdir.join("collection.checkpoint")))
+    faults.fail_symbols = {"FB"}
+    run_checkpointed(yield_rows(TEST_TICKERS), checkpoint, TEST_TICKERS)
+    faults.fail_symbols = set()
+    assert checkpoint.resume() == set(TEST_TICKERS) - {"FB"}
+    table = run_checkpointed(yield_rows(["FB"]), checkpoint, TEST_TICKERS)
+    assert table["error"].isnull().all()
+
+
+def test_straggler_requeued(faults):
+    expected = run_collection(TEST_TICKERS)
+    # the first chart batch naming AAPL stalls, its copy does not
+    faults.stalls = {"AAPL": 1}
+    faults.stall_time = 5.0
+    start_time = time.perf_counter()
+    rows = dict(yield_rows(TEST_TICKERS, pool_size=2, chunk_size=2,
+                           symbol_timeout=0.5))
+    assert time.perf_counter() - start_time < faults.stall_time
+    actual = pd.DataFrame([rows[symbol] for symbol in TEST_TICKERS],
+                          index=TEST_TICKERS)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_straggler_gives_up(faults):
+    faults.stalls = {"AAPL": 10}
+    faults.stall_time = 5.0
+    rows = dict(yield_rows(TEST_TICKERS, pool_size=2, chunk_size=2,
+                           symbol_timeout=0.3, straggler_retries=1))
+    assert set(rows) == set(TEST_TICKERS)
+    assert rows["AAPL"]["error"].startswith("TimeoutError")
+    # only the hung ticker fails, not the rest of its chunk
+    assert [symbol for symbol in TEST_TICKERS
+            if "error" in rows[symbol]] == ["AAPL"]
+
+
+def test_straggler_hung_worker(faults):
+    expected = run_collection(TEST_TICKERS)
+    # the only worker hangs on the chunk of AAPL, the chunks after it are
+    # fast and must not time out waiting behind it
+    faults.stalls = {"AAPL": 1}
+    faults.stall_time = 5.0
+    start_time = time.perf_counter()
+    rows = dict(yield_rows(TEST_TICKERS, pool_size=1, chunk_size=2,
+                           symbol_timeout=0.5))
+    assert time.perf_counter() - start_time < faults.stall_time
+    actual = pd.DataFrame([rows[symbol] for symbol in TEST_TICKERS],
+                          index=TEST_TICKERS)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_straggler_stopped(faults):
+    expected = run_collection(TEST_TICKERS)
+    # the worker is stopped in the middle of the stalled request, every time
+    faults.stalls = {"AAPL": 10}
+    faults.stall_time = 30.0
+    start_time = time.perf_counter()
+    rows = dict(yield_rows(TEST_TICKERS, pool_size=1, chunk_size=4,
+                           symbol_timeout=0.3, straggler_retries=1))
+    assert time.perf_counter() - start_time < 10.0
+    assert multiprocessing.active_children() == []
+    assert rows.pop("AAPL")["error"].startswith("TimeoutError")
+    expected = expected.drop("AAPL")
+    actual = pd.DataFrame([rows[symbol] for symbol in expected.index],
+                          index=expected.index)
+    pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+
+from btscreener.sources.synthetic import make_synthetic_history, symbol_seed
+from btscreener.collector import sweep
+from btscreener.collector.sweep import (
+    expand_grid, cell_key, run_strategy, run_sweep, summarize_sweep,
+    RESULT_FIELDS
+)
+from btscreener.collector.checkpoint import Checkpoint
+from btscreener.sources.test.fixtures import stub_server
+
+SYMBOLS = ["AAPL", "MSFT", "SPY"]
+GRID = {"factor": [2.0, 3.0], "max_entry_td": [-1, 4]}
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return {symbol: make_synthetic_history(126, seed=symbol_seed(symbol))
+            for symbol in SYMBOLS}
+
+
+def test_expand_grid():
+    cells = expand_grid(GRID)
+    assert len(cells) == 4
+    assert cells[0] == {"factor": 2.0, "max_entry_td": -1}
+    assert cells[1] == {"factor": 2.0, "max_entry_td": 4}
+    assert cell_key("SPY", cells[1]) == cell_key(
+        "SPY", {"max_entry_td": 4, "factor": 2.0})
+
+
+@pytest.mark.parametrize("pool_size", [0, 2])
+def test_sweep(tables, pool_size):
+    table = run_sweep(SYMBOLS, GRID, pool_size=pool_size, tables=tables,
+                      cells_per_job=3)
+    assert list(table.columns) == ["symbol", "factor",
+                                   "max_entry_td"] + RESULT_FIELDS
+    assert list(table["symbol"]) == [symbol for symbol in SYMBOLS
+                                     for _ in range(4)]
+    expected = run_strategy(tables["MSFT"], {"factor": 3.0,
+                                             "max_entry_td": -1})
+    row = table[(table["symbol"] == "MSFT") & (table["factor"] == 3.0) &
+                (table["max_entry_td"] == -1)].iloc[0]
+    for field in RESULT_FIELDS:
+        assert row[field] == pytest.approx(expected[field])
+
+    summary = summarize_sweep(table)
+    assert len(summary.index) == 4
+    assert (summary["symbols"] == len(SYMBOLS)).all()
+    assert summary["total_return"].is_monotonic_decreasing
+
+
+def test_sweep_resume(tables, tmpdir, monkeypatch):
+    checkpoint = Checkpoint(str(tmpdir.join("sweep.checkpoint")),
+                            chunk_rows=2)
+    run_sweep(SYMBOLS, {"factor": [2.0], "max_entry_td": [-1, 4]},
+              checkpoint=checkpoint, tables=tables)
+
+    backtests = []
+
+    def counted(table, params, **kwargs):
+        backtests.append(params)
+        return run_strategy(table, params, **kwargs)
+
+    monkeypatch.setattr(sweep, "run_strategy", counted)
+    table = run_sweep(SYMBOLS, GRID, checkpoint=checkpoint, tables=tables)
+    # only the cells of the new factor are backtested
+    assert len(backtests) == len(SYMBOLS) * 2
+    assert all(params["factor"] == 3.0 for params in backtests)
+    assert len(table.index) == len(SYMBOLS) * 4
+    assert not table[RESULT_FIELDS].isnull().any().any()
+
+
+def test_sweep_errors(tables):
+    with pytest.raises(ValueError):
+        run_sweep(SYMBOLS, {"factr": [2.0]}, tables=tables)
+    table = run_sweep(SYMBOLS + ["NONE"], {"factor": [2.0]},
+                      tables=dict(tables, NONE=None))
+    assert table["error"].notnull().sum() == 1
+    assert table["error"].iloc[-1].startswith("ValueError")
+    assert np.isnan(table["total_return"].iloc[-1])
+
+
+def test_sweep_loads_once(stub_server):
+    requests_before = stub_server.requests
+    table = run_sweep(SYMBOLS, {"factor": [2.0, 3.0]}, lookback="6m")
+    assert stub_server.requests - requests_before == 1
+    assert "error" not in table
+    assert len(table.index) == len(SYMBOLS) * 2
@@ -0,0 +1,42 @@
+import logging
+import argparse
+
+from btscreener.collector.archive import CollectionArchive
+
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser(description="""
+Folds the daily collections saved by run.py into a collection archive, which
+keeps one file per symbol group keyed by date and symbol, so a symbol or a
+field can be queried across dates without loading every daily collection.
+""")
+
+parser.add_argument('-v', '--verbose', action='count', default=0,
+                    help="Logging verbosity level")
+parser.add_argument("--collections",
+                    default="collections",
+                    help="directory of daily collections to fold in")
+parser.add_argument("archive",
+                    help="directory of the collection archive")
+
+if __name__ == "__main__":
+    import sys
+
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(logging.DEBUG)
+    consoleHandler = logging.StreamHandler(stream=sys.stdout)
+    consoleHandler.setFormatter(logging.Formatter())
+
+    args = parser.parse_args()
+
+    v_count = args.verbose if args.verbose < 3 else 3
+    # 0 - ERROR, 1 - WARNING, 2 - INFO, 3 - DEBUG
+    consoleHandler.setLevel(logging.ERROR - (10 * v_count))
+    rootLogger.addHandler(consoleHandler)
+
+    archive = CollectionArchive(args.archive)
+    folded = archive.compact(args.collections)
+    for fn in folded:
+        logger.info("Folded in: {}".format(fn))
+    for group in archive.groups():
+        logger.info("{}: {} dates".format(group, len(archive.dates(group))))
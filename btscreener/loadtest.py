@@ -0,0 +1,94 @@
+import logging
+import argparse
+
+import pandas as pd
+
+from btscreener.collector.loadtest import (
+    run_load_test, DEFAULT_UNIVERSE_SIZES, DEFAULT_POOL_SIZES, MODES
+)
+
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser(description="""
+Load tests the collector end to end against a local IEX stand-in serving
+synthetic universes. For every mode, universe size and pool size, a fresh
+process collects every symbol of the universe, either with run_collection or
+with run.py, and its throughput, the tail latency of the requests it made and
+its peak memory are reported.
+""")
+
+parser.add_argument('-v', '--verbose', action='count', default=0,
+                    help="Logging verbosity level")
+parser.add_argument("--universe",
+                    type=int,
+                    action="append",
+                    help="number of symbols served, may be repeated, "
+                         "default: {}".format(DEFAULT_UNIVERSE_SIZES))
+parser.add_argument("--pool-size",
+                    type=int,
+                    action="append",
+                    help="pool size of the collector, may be repeated, "
+                         "default: {}".format(DEFAULT_POOL_SIZES))
+parser.add_argument("--mode",
+                    choices=MODES,
+                    action="append",
+                    help="collect with run_collection or run.py, may be "
+                         "repeated, default: both")
+parser.add_argument("--latency",
+                    type=float,
+                    default=0.0,
+                    help="seconds the server waits before answering")
+parser.add_argument("--latency-jitter",
+                    type=float,
+                    default=0.0,
+                    help="up to this many more seconds the server waits, "
+                         "picked at random")
+parser.add_argument("--error-rate",
+                    type=float,
+                    default=0.0,
+                    help="fraction of the requests answered with a 500")
+parser.add_argument("--rate-limit",
+                    type=float,
+                    help="requests the server answers per second before "
+                         "answering with a 429")
+parser.add_argument("--run-arg",
+                    action="append",
+                    default=[],
+                    help="further argument of run.py in run mode, e.g. "
+                         "--run-arg=--pipeline")
+parser.add_argument("--work-dir",
+                    help="directory to keep the output of each scenario in, "
+                         "default: a temporary one")
+parser.add_argument("--output",
+                    help="csv file to save the results to")
+
+if __name__ == "__main__":
+    import sys
+
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(logging.DEBUG)
+    consoleHandler = logging.StreamHandler(stream=sys.stdout)
+    consoleHandler.setFormatter(logging.Formatter())
+
+    args = parser.parse_args()
+
+    v_count = args.verbose if args.verbose < 3 else 3
+    # 0 - ERROR, 1 - WARNING, 2 - INFO, 3 - DEBUG
+    consoleHandler.setLevel(logging.ERROR - (10 * v_count))
+    rootLogger.addHandler(consoleHandler)
+
+    results = run_load_test(
+        universe_sizes=args.universe or DEFAULT_UNIVERSE_SIZES,
+        pool_sizes=args.pool_size or DEFAULT_POOL_SIZES,
+        modes=args.mode or MODES, work_dir=args.work_dir,
+        run_args=args.run_arg, latency=args.latency,
+        latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit)
+
+    if args.output:
+        logger.info("Saving results: {}".format(args.output))
+        results.to_csv(args.output, index=False)
+    with pd.option_context('display.max_rows', None,
+                           'display.max_columns', None,
+                           'display.width', 160):
+        print(results)
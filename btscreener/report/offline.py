@@ -0,0 +1,219 @@
+"""
+Offline screener report.
+
+Writes the screener table as one self-contained HTML file, with the rows
+embedded as JSON and a small script that shows them a page at a time. Only the
+rows of the current page are in the document, so a screen of thousands of
+symbols opens instantly, and writing the report needs no network.
+"""
+import logging
+import os
+import json
+import html
+import datetime
+from string import Template
+
+import numpy as np
+import pandas as pd
+
+from btscreener.tracing.spans import span
+from .screener import (
+    make_screener_frame, rank_screener_rows, COLOR_NEUTRAL_MID,
+    COLOR_NEUTRAL_DARK
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+"""int: default number of rows shown per page"""
+
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+body { font-family: Overpass, sans-serif; font-size: 12px; margin: 16px; }
+h1 { color: $dark; font-size: 18px; }
+table { border-collapse: collapse; }
+th { background: $header; cursor: pointer; text-align: left; }
+th, td { border: 1px solid #FFFFFF; padding: 2px 8px; white-space: nowrap; }
+#controls { margin: 8px 0; }
+#controls > * { margin-right: 8px; }
+</style>
+</head>
+<body>
+<h1>$title</h1>
+<div id="controls">
+<input id="filter" type="search" placeholder="Filter symbols">
+<button id="prev">&lt;</button><span id="page"></span><button id="next">&gt;</button>
+<select id="size"><option>50</option><option>100</option><option>500</option></select>
+</div>
+<table><thead id="head"></thead><tbody id="body"></tbody></table>
+<script id="report-data" type="application/json">$data</script>
+<script>
+(function () {
+  var report = JSON.parse(document.getElementById("report-data").textContent);
+  var pageSize = $page_size;
+  var page = 0;
+  var order = report.rows.map(function (row, i) { return i; });
+  var shown = order;
+  var sortColumn = -1;
+  var sortDescending = false;
+  var select = document.getElementById("size");
+  if (![50, 100, 500].includes(pageSize)) {
+    select.add(new Option(String(pageSize)));
+  }
+  select.value = String(pageSize);
+
+  function escape(text) {
+    return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;")
+      .replace(/>/g, "&gt;");
+  }
+
+  function render() {
+    var pages = Math.max(1, Math.ceil(shown.length / pageSize));
+    page = Math.min(Math.max(page, 0), pages - 1);
+    var cells = [];
+    var end = Math.min(shown.length, (page + 1) * pageSize);
+    for (var i = page * pageSize; i < end; i++) {
+      var row = report.rows[shown[i]];
+      cells.push('<tr style="background:' + report.colors[shown[i]] + '">');
+      for (var j = 0; j < row.length; j++) {
+        cells.push("<td>" + escape(row[j]) + "</td>");
+      }
+      cells.push("</tr>");
+    }
+    document.getElementById("body").innerHTML = cells.join("");
+    document.getElementById("page").textContent =
+      " " + (page + 1) + " / " + pages + " (" + shown.length + " rows) ";
+  }
+
+  function filter() {
+    var text = document.getElementById("filter").value.toUpperCase();
+    shown = order.filter(function (i) {
+      return String(report.rows[i][0]).toUpperCase().indexOf(text) >= 0;
+    });
+    page = 0;
+    render();
+  }
+
+  function sortBy(column) {
+    sortDescending = column === sortColumn ? !sortDescending : false;
+    sortColumn = column;
+    order = report.rows.map(function (row, i) { return i; });
+    order.sort(function (a, b) {
+      var x = report.rows[a][column], y = report.rows[b][column];
+      var nx = parseFloat(x), ny = parseFloat(y);
+      var result = (!isNaN(nx) && !isNaN(ny)) ? nx - ny :
+        String(x).localeCompare(String(y));
+      return sortDescending ? -result : result;
+    });
+    filter();
+  }
+
+  document.getElementById("head").innerHTML = "<tr>" +
+    report.columns.map(function (column) {
+      return "<th>" + escape(column) + "</th>";
+    }).join("") + "</tr>";
+  Array.prototype.forEach.call(document.querySelectorAll("th"),
+    function (th, column) {
+      th.addEventListener("click", function () { sortBy(column); });
+    });
+  document.getElementById("filter").addEventListener("input", filter);
+  document.getElementById("prev").addEventListener("click", function () {
+    page -= 1; render();
+  });
+  document.getElementById("next").addEventListener("click", function () {
+    page += 1; render();
+  });
+  select.addEventListener("change", function () {
+    pageSize = parseInt(select.value, 10); page = 0; render();
+  });
+  render();
+})();
+</script>
+</body>
+</html>
+""")
+"""string.Template: the report page, with the rows embedded as JSON"""
+
+
+def make_report_data(title, backtest, top=None):
+    """
+    Creates the contents of the offline report from a backtest summary table
+
+    Args:
+        title (str): report title
+        backtest (pd.DataFrame): backtest summary table
+        top (int): keep only this many of the highest ranked rows, None to
+            keep them all
+
+    Returns:
+        dict: JSON-ready title, columns, rows of text and row colors of the
+            screener table
+    """
+    with span("report.frame"):
+        df = make_screener_frame(rank_screener_rows(backtest, top=top))
+    df = df.rename_axis("Symbol").reset_index()
+    bgcolor = df.pop("BgColor")
+    last_datetime = backtest["datetime"].dropna()
+    if len(last_datetime.index) > 0:
+        title = "{} ({})".format(title, last_datetime.iloc[-1].date())
+    columns = [[_cell_text(value) for value in df[column].values]
+               for column in df.columns]
+    return {
+        "title": title,
+        "columns": list(df.columns),
+        "rows": [list(row) for row in zip(*columns)],
+        "colors": list(bgcolor),
+    }
+
+
+def _cell_text(value):
+    # the screener formats the prices itself, only the dates are shortened
+    if isinstance(value, (datetime.date, np.datetime64)):
+        return str(pd.Timestamp(value).date())
+    return str(value)
+
+
+def render_screener_html(title, backtest, path, top=None,
+                         page_size=DEFAULT_PAGE_SIZE):
+    """
+    Writes the screener table as a self-contained HTML page, and its rows as
+    a JSON file next to it
+
+    Args:
+        title (str): report title
+        backtest (pd.DataFrame): backtest summary table
+        path (str): HTML file to write, the JSON file gets the same name with
+            a .json extension
+        top (int): show only this many of the highest ranked rows, None to
+            show them all
+        page_size (int): rows shown per page
+
+    Returns:
+        str: path of the HTML file
+    """
+    data = make_report_data(title, backtest, top=top)
+    text = json.dumps(data, separators=(",", ":"))
+    page = PAGE_TEMPLATE.substitute(
+        title=html.escape(data["title"]),
+        dark=COLOR_NEUTRAL_DARK,
+        header=COLOR_NEUTRAL_MID,
+        page_size=int(page_size),
+        # keep the rows from closing the script element
+        data=text.replace("</", "<\\/"),
+    )
+    with span("report.write"):
+        _write_text(page, path)
+        _write_text(text, os.path.splitext(path)[0] + ".json")
+    logger.info("Wrote report of {} rows: {}".format(len(data["rows"]), path))
+    return path
+
+
+def _write_text(text, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fobj:
+        fobj.write(text)
+    os.replace(tmp_path, path)
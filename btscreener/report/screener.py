@@ -2,10 +2,13 @@ import logging
 from collections import OrderedDict
 import datetime
 
+import numpy as np
 import pandas as pd
 import plotly.plotly as py
 import plotly.graph_objs as go
 
+from btscreener.tracing.spans import span
+
 logger = logging.getLogger(__name__)
 
 COLOR_NEUTRAL_LIGHT = '#E6E6FF'
@@ -25,6 +28,9 @@ EVENT_STAD_BREAKOUT = "Breakout"
 EVENT_TD_WARN = "Warn"
 EVENT_TD_FRESH = "Fresh"
 
+SORT_COLUMNS = ["td_count", "stad_breakout", "stad_trend", "next_report_date",
+                "next_ex_date"]
+
 def get_bg_color(trend=0, flip=0, breakout=0, **kwargs):
     """
     :param trend:
@@ -91,21 +97,101 @@ def make_screener_row(backtest_row):
                                  backtest_row.stad_breakout))
     ]))
 
-def make_screener_table(title, backtest):
+def rank_screener_rows(backtest, top=None):
     """
-    Creates a giant table from the scan result
+    Orders a backtest summary table the way the screener shows it
+
+    Args:
+        backtest (pd.DataFrame): backtest summary table
+        top (int): keep only this many of the highest ranked rows, None to
+            keep them all
+
+    Returns:
+        pd.DataFrame: the ranked rows
+    """
+    df = backtest.sort_values(by=SORT_COLUMNS, ascending=False)
+    return df if top is None else df.head(top)
+
+def make_screener_frame(backtest):
+    """
+    Creates the summary rows of make_screener_row for a whole table at once,
+    with column operations instead of a Series per row
 
     Args:
-        title (str): title to use for filename and chart title
         backtest (pd.DataFrame): backtest summary table
 
     Returns:
-        figure
+        pd.DataFrame: the rows make_screener_row creates, indexed like the
+            backtest summary table
+    """
+    trend = backtest["stad_trend"].values
+    prev_trend = backtest["prev_stad_trend"].values
+    breakout = backtest["stad_breakout"].values
+    td_count = backtest["td_count"].values
+    with np.errstate(invalid="ignore"):
+        flipped = np.select([(trend > 0) & (prev_trend <= 0),
+                             (trend < 0) & (prev_trend >= 0)], [1, -1], 0)
+        # each event brings its own separator, which is stripped at the end
+        s_events = _cat(
+            np.where(trend > 0, EVENT_STAD_TREND_UP + " ", ""),
+            np.where(trend < 0, EVENT_STAD_TREND_DN + " ", ""),
+            np.where(flipped != 0, EVENT_STAD_FLIP + " ", ""),
+            np.where(breakout != 0, EVENT_STAD_BREAKOUT + " ", ""),
+        )
+        td_events = _cat(
+            _format("%.0f", td_count),
+            np.where(np.abs(backtest["td_reversal"].values) > 0,
+                     " " + EVENT_TD_WARN, ""),
+            np.where((np.abs(td_count) == 1) &
+                     (np.abs(backtest["prev_td_reversal"].values) > 0),
+                     " " + EVENT_TD_FRESH, ""),
+        )
+        bgcolor = np.select(
+            [(breakout > 0) | (flipped > 0), (breakout < 0) | (flipped < 0),
+             trend == 1, trend == -1],
+            [COLOR_BULLISH_BOLD, COLOR_BEARISH_BOLD, COLOR_BULLISH_LIGHT,
+             COLOR_BEARISH_LIGHT], COLOR_NEUTRAL_LIGHT)
+    return pd.DataFrame(OrderedDict([
+        ("SuperTrend", np.char.rstrip(s_events)),
+        ("TD Count", td_events),
+        ("Close", _format("%.2f", backtest["close"].values)),
+        ("Support", _format("%.2f", backtest["stad_support"].values)),
+        ("Resistance", _format("%.2f", backtest["stad_resistance"].values)),
+        ("Next Earnings", _blank_null(backtest["next_report_date"])),
+        ("Next Ex-Div", _blank_null(backtest["next_ex_date"])),
+        ("Dividend Amount", _blank_null(backtest["last_dividend_amount"])),
+        ("BgColor", bgcolor),
+    ]), index=backtest.index, dtype=object)
+
+def _cat(*parts):
+    combined = parts[0].astype(str)
+    for part in parts[1:]:
+        combined = np.char.add(combined, part.astype(str))
+    return combined
+
+def _format(fmt, values):
+    # same text as str.format with the matching {:.Nf} spec
+    return np.char.mod(fmt, values.astype(float))
+
+def _blank_null(column):
+    return column.astype(object).where(column.notnull(), "").values
+
+def make_screener_figure(title, backtest, top=None):
     """
-    df = backtest.sort_values(by=["td_count", "stad_breakout", "stad_trend",
-                                  "next_report_date", "next_ex_date"],
-                              ascending=False)
-    df = df.apply(make_screener_row, axis=1).reset_index()
+    Creates the figure of a giant table from the scan result
+
+    Args:
+        title (str): chart title
+        backtest (pd.DataFrame): backtest summary table
+        top (int): show only this many of the highest ranked rows, None to
+            show them all
+
+    Returns:
+        dict: plotly figure of the table
+    """
+    with span("report.frame"):
+        df = make_screener_frame(rank_screener_rows(backtest, top=top))
+    df = df.reset_index()
     bgcolor = df.pop("BgColor")
     trace = go.Table(
         header=dict(values=df.columns,
@@ -117,8 +203,24 @@ def make_screener_table(title, backtest):
     last_datetime = backtest.datetime.dropna().iloc[-1].date()
     layout = dict(title="{} ({})".format(title, last_datetime))
     data = [trace]
-    figure = dict(data=data, layout=layout)
+    return dict(data=data, layout=layout)
+
+def make_screener_table(title, backtest, top=None):
+    """
+    Creates a giant table from the scan result and uploads it to plotly
+
+    Args:
+        title (str): title to use for filename and chart title
+        backtest (pd.DataFrame): backtest summary table
+        top (int): show only this many of the highest ranked rows, None to
+            show them all
+
+    Returns:
+        str: URL of the plot
+    """
+    figure = make_screener_figure(title, backtest, top=top)
     logger.info("Creating plot '{}'".format(title))
-    url = py.plot(figure, filename=title, auto_open=False)
+    with span("report.upload"):
+        url = py.plot(figure, filename=title, auto_open=False)
     logger.info("Plot URL: {}".format(url))
     return url
@@ -0,0 +1,72 @@
+import re
+import json
+import pickle
+
+import pytest
+import pandas as pd
+
+from btscreener.report.screener import make_screener_frame, rank_screener_rows
+from btscreener.report.offline import make_report_data, render_screener_html
+
+
+@pytest.fixture(scope="module")
+def backtest(request):
+    fn = request.config.getoption("--collection")
+    with open(fn, "rb") as fobj:
+        df = pickle.load(fobj)
+    return df
+
+
+def embedded_data(page):
+    match = re.search(r'<script id="report-data" type="application/json">'
+                      r'(.*?)</script>', page, re.S)
+    return json.loads(match.group(1).replace("<\\/", "</"))
+
+
+def test_report_data(backtest):
+    data = make_report_data("dev", backtest)
+    frame = make_screener_frame(rank_screener_rows(backtest))
+    assert data["title"].startswith("dev (")
+    assert data["columns"][0] == "Symbol"
+    assert [row[0] for row in data["rows"]] == list(frame.index)
+    assert data["colors"] == list(frame["BgColor"])
+    # everything is text, so the page needs no formatting of its own
+    assert all(isinstance(cell, str) for row in data["rows"] for cell in row)
+
+
+def test_report_amounts(backtest):
+    backtest = backtest.copy()
+    backtest["last_dividend_amount"] = 0.123456789
+    data = make_report_data("dev", backtest)
+    column = data["columns"].index("Dividend Amount")
+    assert {row[column] for row in data["rows"]} == {"0.123456789"}
+
+
+def test_render(backtest, tmpdir):
+    path = render_screener_html("dev", backtest, str(tmpdir.join("dev.html")),
+                                top=3, page_size=2)
+    with open(path) as fobj:
+        page = fobj.read()
+    data = embedded_data(page)
+    assert len(data["rows"]) == 3
+    assert "var pageSize = 2;" in page
+    with open(str(tmpdir.join("dev.json"))) as fobj:
+        assert json.load(fobj) == data
+
+
+def test_render_escapes(backtest, tmpdir):
+    evil = backtest.iloc[:1].rename(index={backtest.index[0]: "</script>"})
+    path = render_screener_html("<b>", evil, str(tmpdir.join("evil.html")))
+    with open(path) as fobj:
+        page = fobj.read()
+    assert "<title>&lt;b&gt;" in page
+    assert page.count("</script>") == 2
+    assert embedded_data(page)["rows"][0][0] == "</script>"
+
+
+def test_large_report(backtest, tmpdir):
+    large = pd.concat([backtest] * 100)
+    large.index = ["S{}".format(i) for i in range(len(large.index))]
+    path = render_screener_html("large", large, str(tmpdir.join("large.html")))
+    with open(path) as fobj:
+        assert len(embedded_data(fobj.read())["rows"]) == len(large.index)
@@ -1,7 +1,14 @@
 import pytest
 import pickle
+import datetime
 
-from btscreener.report.screener import make_screener_row, make_screener_table
+import numpy as np
+import pandas as pd
+
+from btscreener.report.screener import (
+    make_screener_row, make_screener_table, make_screener_frame,
+    rank_screener_rows
+)
 
 @pytest.fixture(scope="module")
 def backtest(request):
@@ -17,4 +24,38 @@ def test_screener_row(backtest):
 
 def test_screener_table(backtest):
     url = make_screener_table("dev", backtest)
-    print(url)
\ No newline at end of file
+    print(url)
+
+def test_screener_frame(backtest):
+    expected = backtest.apply(make_screener_row, axis=1)
+    pd.testing.assert_frame_equal(make_screener_frame(backtest), expected)
+
+def test_screener_frame_edge_cases():
+    nan = np.nan
+    # flips both ways, missing values and negative zero counts
+    backtest = pd.DataFrame({
+        "stad_trend": [1.0, -1.0, 1.0, -1.0, nan, 0.0, 1.0],
+        "prev_stad_trend": [-1.0, 1.0, 1.0, -1.0, 1.0, 0.0, nan],
+        "stad_breakout": [0.0, 0.0, 1.0, -1.0, nan, 0.0, 0.0],
+        "td_count": [1.0, -1.0, 9.0, -0.0, nan, 12.5, 3.0],
+        "td_reversal": [0.0, 0.0, 1.0, -1.0, nan, 0.0, 0.0],
+        "prev_td_reversal": [1.0, -1.0, 0.0, 0.0, nan, 0.0, 0.0],
+        "close": [1.005, 2.0, nan, 4.0, 5.0, 6.0, 7.0],
+        "stad_support": [1.0, nan, 3.0, 4.0, 5.0, 6.0, 7.0],
+        "stad_resistance": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, nan],
+        "next_report_date": [pd.Timestamp("2019-01-01"), pd.NaT] * 3 + [
+            pd.NaT],
+        "next_ex_date": [datetime.date(2019, 3, 1), None] * 3 + [None],
+        "last_dividend_amount": [0.5, nan] * 3 + [1.0],
+    }, index=list("ABCDEFG"))
+    frame = make_screener_frame(backtest)
+    # row by row, as apply would turn the blank dates into NaT
+    for symbol in backtest.index:
+        pd.testing.assert_series_equal(
+            frame.loc[symbol], make_screener_row(backtest.loc[symbol]),
+            check_names=False)
+
+def test_screener_top(backtest):
+    ranked = rank_screener_rows(backtest)
+    top = rank_screener_rows(backtest, top=5)
+    pd.testing.assert_frame_equal(top, ranked.iloc[:5])
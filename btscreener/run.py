@@ -1,21 +1,46 @@
 import logging
 import argparse
-import pickle
 import os
+import shutil
 import datetime
 from collections import OrderedDict
 
 import pandas as pd
 
 from btscreener.collector.tickers import default_faves, dji_components
-from btscreener.collector.collect import run_collection
+from btscreener.collector.collect import (
+    yield_rows, run_panel_collection, DEFAULT_SYMBOL_TIMEOUT
+)
+from btscreener.collector.pipeline import (
+    yield_pipeline_rows, DEFAULT_FETCH_WORKERS, DEFAULT_COMPUTE_WORKERS,
+    DEFAULT_CHUNK_SIZE
+)
+from btscreener.collector.checkpoint import (
+    Checkpoint, run_checkpointed, DEFAULT_CHECKPOINT_ROWS
+)
+from btscreener.collector.columnar import (
+    write_collection, read_collection, export_csv, collection_schema
+)
+from btscreener.collector.archive import CollectionArchive, find_collections
+from btscreener.collector.shard import (
+    parse_shard, select_shard, shard_path, find_shards, write_shard,
+    merge_shards
+)
 from btscreener.report.screener import make_screener_table
+from btscreener.report.offline import render_screener_html
+from btscreener.sources import iex
+from btscreener.sources.store import BarStore
+from btscreener.sources.cache import ResponseCache
+from btscreener.chart.state import StateStore
+from btscreener.chart.backtest import TIMEFRAMES
+from btscreener.tracing.spans import start_tracing, stop_tracing, span
+from btscreener.tracing.profile import write_profile
 
 logger = logging.getLogger(__name__)
 
 
 def get_collection_dir(args):
-    date = datetime.date.today()
+    date = args.collection_date or datetime.date.today()
     dest = "collections/{date}".format(date=date)
     os.makedirs(dest, exist_ok=True)
     return dest
@@ -25,19 +50,16 @@ def get_symbols(group_name):
         return default_faves
     elif group_name == "dji":
         return dji_components
+    elif group_name == "iex":
+        return iex.load_symbols()
     else:
         raise KeyError("No group '{}'".format(group_name))
 
 
 def yield_collections(collection_dir):
-    for root, dirs, files in os.walk(collection_dir):
-        for file in files:
-            if file.endswith("_collection.pickle"):
-                date, group, suffix = file.split("_")
-                fn = os.path.join(root, file)
-                logger.info("Loading collection: {}".format(fn))
-                with open(fn, "rb") as fobj:
-                    yield (date, group, pickle.load(fobj))
+    for date, group, fn in find_collections(collection_dir):
+        logger.info("Loading collection: {}".format(fn))
+        yield (str(date), group, read_collection(fn))
 
 parser = argparse.ArgumentParser(description="""
 Runs a full technical screening process to produce one or more reports and/or
@@ -52,12 +74,18 @@ I. Collection
 3. a. TODO: Allow user to pickle the price data and misc data as well
 4. Run indicators against the price data using backtrader
 5. Collect all available data into a big table
-6. Pickle the data table into the output directory
+6. Save the data table into the output directory as a typed columnar file
 
 II. Reporting
 1. Load a collection table from an collection output directory
 2. Perform preprocessing and summarization of the data for the visualization
-3. Pass the data off to plotly or another service to report the information
+3. Pass the data off to plotly or another service to report the information,
+   or write it as an HTML page that works offline
+
+A group too large for one machine can be split with --shard i/n, each node
+collecting its share of the symbols into a partial collection. Once the
+partials are gathered in the collection dir, --merge combines them into the
+collection of the whole group and goes on with the reporting.
 """)
 
 parser.add_argument('-v', '--verbose', action='count', default=0,
@@ -66,22 +94,119 @@ parser.add_argument("--cache",
                     choices=["collection"],
                     action="append")
 parser.add_argument("--group",
-                    choices=["faves", "dji"],
+                    choices=["faves", "dji", "iex"],
                     default="faves",
-                    help="symbol group to collect")
+                    help="symbol group to collect, iex being every symbol "
+                         "IEX has data for")
 parser.add_argument("--pool-size",
                     type=int,
                     default=4,
                     help="pool size for multiprocessing")
+parser.add_argument("--pipeline",
+                    action="store_true",
+                    help="fetch with a pool of threads while a pool of "
+                         "processes runs the backtests")
+parser.add_argument("--fetch-workers",
+                    type=int,
+                    default=DEFAULT_FETCH_WORKERS,
+                    help="threads fetching data in pipeline mode")
+parser.add_argument("--compute-workers",
+                    type=int,
+                    default=DEFAULT_COMPUTE_WORKERS,
+                    help="processes running backtests in pipeline mode")
+parser.add_argument("--chunk-size",
+                    type=int,
+                    default=DEFAULT_CHUNK_SIZE,
+                    help="symbols fetched together in pipeline mode")
+parser.add_argument("--panel",
+                    action="store_true",
+                    help="evaluate indicators for all symbols in one "
+                         "vectorized pass instead of a backtest per symbol")
+parser.add_argument("--timeframe",
+                    action="append",
+                    choices=list(TIMEFRAMES),
+                    help="also evaluate the indicators over the daily data "
+                         "resampled to this timeframe, as fields prefixed "
+                         "with its name, may be repeated; given with --merge "
+                         "as well, the merged fields keep their types")
+parser.add_argument("--store",
+                    help="directory of a local bar store, so only bars missing "
+                         "since the last run are downloaded")
+parser.add_argument("--state",
+                    help="directory of saved indicator states, so each run "
+                         "only steps the indicators over the new bars; the "
+                         "values then differ slightly from a backtest of the "
+                         "lookback alone, until the states are replayed")
+parser.add_argument("--http-cache",
+                    help="database file of cached IEX responses, so data that "
+                         "has not changed is not downloaded again")
+parser.add_argument("--request-timeout",
+                    type=float,
+                    default=iex.REQUEST_TIMEOUT,
+                    help="seconds to wait on each IEX request")
+parser.add_argument("--retries",
+                    type=int,
+                    default=iex.RETRIES,
+                    help="attempts made again after a transient IEX error")
+parser.add_argument("--symbol-timeout",
+                    type=float,
+                    help="seconds a pool worker gets per symbol before its "
+                         "chunk is stopped and its symbols are queued again "
+                         "one at a time (default: {}); there is no such "
+                         "deadline with a --pool-size of 0, and none in "
+                         "--pipeline mode".format(DEFAULT_SYMBOL_TIMEOUT))
+parser.add_argument("--resume",
+                    action="store_true",
+                    help="resume today's collection from its checkpoint, "
+                         "skipping the symbols already collected")
+parser.add_argument("--checkpoint-rows",
+                    type=int,
+                    default=DEFAULT_CHECKPOINT_ROWS,
+                    help="collected rows buffered between checkpoint writes")
+parser.add_argument("--shard",
+                    type=parse_shard,
+                    metavar="I/N",
+                    help="collect only the i-th of n shards of the group, "
+                         "split by a stable hash of the tickers, into a "
+                         "partial collection")
+parser.add_argument("--merge",
+                    action="store_true",
+                    help="merge the partial collections of every shard in "
+                         "the collection dir instead of collecting, failing "
+                         "if a shard is missing")
+parser.add_argument("--date",
+                    dest="collection_date",
+                    type=datetime.date.fromisoformat,
+                    help="date of the partial collections to merge, "
+                         "defaults to today")
 parser.add_argument("--format-file",
                     default="{date}_{group}_collection.{ext}")
+parser.add_argument("--archive",
+                    help="directory of the collection archive to fold the "
+                         "new collection into, for queries across dates")
 parser.add_argument("--csv",
                     action="store_true",
-                    help="enable csv output")
+                    help="export the collection as csv")
 parser.add_argument("--report",
                     action="append",
-                    choices=["screener"],
-                    help="generate a report from the collection")
+                    choices=["screener", "html"],
+                    help="generate a report from the collection, screener "
+                         "uploads it to plotly and html writes it next to "
+                         "the collection")
+parser.add_argument("--profile",
+                    action="store_true",
+                    help="time each stage of the run in every worker, and "
+                         "write per symbol timings, stage histograms and "
+                         "peak memory per worker into the collection dir")
+parser.add_argument("--profile-rate",
+                    type=float,
+                    default=0.0,
+                    help="fraction of the symbols to also run under cProfile "
+                         "when profiling, e.g. 0.05")
+parser.add_argument("--top",
+                    type=int,
+                    help="show only this many of the highest ranked symbols "
+                         "in the screener")
 
 if __name__ == "__main__":
     import sys
@@ -93,6 +218,20 @@ if __name__ == "__main__":
     consoleHandler.setFormatter(logging.Formatter())
 
     args = parser.parse_args()
+    if args.shard and args.merge:
+        parser.error("--shard and --merge do not go together")
+    if args.collection_date and not args.merge:
+        parser.error("--date only applies to --merge")
+    if args.symbol_timeout is not None and args.pipeline:
+        parser.error("--pipeline has no deadline per symbol, so it does not "
+                     "go with --symbol-timeout")
+    if args.timeframe and (args.panel or args.state):
+        parser.error("--timeframe needs a backtest per symbol, so it does "
+                     "not go with --panel or --state")
+    timeframes = args.timeframe or ()
+    schema = collection_schema(timeframes)
+    symbol_timeout = (DEFAULT_SYMBOL_TIMEOUT if args.symbol_timeout is None
+                      else args.symbol_timeout)
 
     v_count = args.verbose if args.verbose < 3 else 3
     # set the error level for the console handler
@@ -101,43 +240,133 @@ if __name__ == "__main__":
     consoleHandler.setLevel(logLevel)
     rootLogger.addHandler(consoleHandler)
 
-    today = datetime.date.today()
+    today = args.collection_date or datetime.date.today()
+
+    collection_dir = get_collection_dir(args)
+    logger.debug("Using collection dir: {}".format(collection_dir))
+
+    collection_fn = args.format_file.format(date=today, ext="parquet",
+                                            **vars(args))
+    collection_path = os.path.join(collection_dir, collection_fn)
+    if args.shard:
+        # each shard writes its own partial next to the whole collection
+        collection_path = shard_path(collection_path, *args.shard)
 
-    if args.cache:
-        collection_dir = get_collection_dir(args)
-        logger.debug("Using collection dir: {}".format(collection_dir))
+    if args.http_cache:
+        iex.CACHE = ResponseCache(args.http_cache)
+    iex.REQUEST_TIMEOUT = args.request_timeout
+    iex.RETRIES = args.retries
 
-        collection_fn = args.format_file.format(date=today, ext="pickle",
-                                                **vars(args))
-        collection_path = os.path.join(collection_dir, collection_fn)
+    if args.profile:
+        # pool workers forked from here on record their spans as well
+        profile_prefix = os.path.splitext(collection_path)[0]
+        shutil.rmtree(profile_prefix + ".trace", ignore_errors=True)
+        start_tracing(profile_prefix + ".trace",
+                      profile_rate=args.profile_rate)
 
-    symbols = get_symbols(args.group)
+    if args.merge:
+        # the partials were collected on other nodes and copied here
+        shard_paths = find_shards(collection_path)
+        logger.info("Merging {} partial collections".format(
+            len(shard_paths)))
+        collection = merge_shards(shard_paths)
+        logger.debug("Saving collection: {}".format(collection_path))
+        write_collection(collection, collection_path, schema=schema)
 
-    if args.cache and "collection" in args.cache and (
+    elif args.cache and "collection" in args.cache and (
             os.path.exists(collection_path)):
         # we are using caching and we found a cached collection for today
-        with open(collection_path, mode="rb") as fobj:
-            collection = pickle.load(fobj)
+        collection = read_collection(collection_path)
 
     else:
+        symbols = get_symbols(args.group)
+        if args.shard:
+            group_symbols = symbols
+            symbols = select_shard(group_symbols, *args.shard)
+            logger.info("Collecting shard {}/{}: {} of {} symbols".format(
+                args.shard[0], args.shard[1], len(symbols),
+                len(group_symbols)))
+
         # run_collection downloads symbol data and runs backtests
-        collection = run_collection(symbols, pool_size=args.pool_size)
+        store = BarStore(args.store) if args.store else None
+        states = StateStore(args.state) if args.state else None
+        if args.panel:
+            collection = run_panel_collection(symbols, store=store)
+        else:
+            # rows are checkpointed as they finish, so a failed run can resume
+            checkpoint_fn = args.format_file.format(date=today,
+                                                    ext="checkpoint",
+                                                    **vars(args))
+            checkpoint_path = os.path.join(collection_dir, checkpoint_fn)
+            if args.shard:
+                checkpoint_path = shard_path(checkpoint_path, *args.shard)
+            checkpoint = Checkpoint(checkpoint_path,
+                                    chunk_rows=args.checkpoint_rows)
+            if args.resume:
+                done = checkpoint.resume()
+                logger.info("Resuming {} with {} of {} symbols done".format(
+                    checkpoint.path, len(done), len(symbols)))
+            else:
+                checkpoint.clear()
+                done = set()
+            remaining = [symbol for symbol in symbols if symbol not in done]
+            if args.pipeline:
+                rows = yield_pipeline_rows(
+                    remaining, fetch_workers=args.fetch_workers,
+                    compute_workers=args.compute_workers,
+                    chunk_size=args.chunk_size, store=store, states=states,
+                    timeframes=timeframes)
+            else:
+                rows = yield_rows(remaining, pool_size=args.pool_size,
+                                  store=store,
+                                  symbol_timeout=symbol_timeout,
+                                  states=states, timeframes=timeframes)
+            collection = run_checkpointed(rows, checkpoint, symbols)
+            if "error" in collection:
+                failed = collection["error"].dropna()
+                logger.warning("Failed to collect {} symbols: {}".format(
+                    len(failed.index), ", ".join(failed.index)))
+        if iex.CACHE is not None:
+            logger.info("HTTP cache: {}".format(iex.CACHE.stats()))
 
-        # if we are using caching, update the cache with the new collection
-        if args.cache and "collection" in args.cache:
-            with open(collection_path, mode="wb") as fobj:
-                logger.debug("Saving pickle: {}".format(collection_path))
-                pickle.dump(collection, fobj)
+        # the saved collection is reused by later runs with --cache
+        logger.debug("Saving collection: {}".format(collection_path))
+        if args.shard:
+            write_shard(collection, collection_path, *args.shard,
+                        symbols=group_symbols, schema=schema)
+        else:
+            write_collection(collection, collection_path, schema=schema)
 
     with pd.option_context('display.max_rows', None,
                            'display.max_columns', None):
         logger.info(collection)
 
     if args.csv:
-        csv_fn = args.format_csv.format(date=today, ext="csv", **vars(args))
+        csv_fn = args.format_file.format(date=today, ext="csv", **vars(args))
         csv_path = os.path.join(collection_dir, csv_fn)
-        logger.info("Saving csv: {}".format(csv_path))
-        collection.to_csv(csv_path)
+        logger.info("Exporting csv: {}".format(csv_path))
+        export_csv(collection_path, csv_path)
+
+    if args.archive:
+        folded = CollectionArchive(args.archive).compact(collection_dir)
+        logger.info("Archived {} collections".format(len(folded)))
 
     if args.report and "screener" in args.report:
-        url = make_screener_table(args.group, collection)
+        with span("report.screener"):
+            url = make_screener_table(args.group, collection, top=args.top)
+
+    if args.report and "html" in args.report:
+        # written next to the collection, without going through plotly
+        report_fn = args.format_file.format(date=today, ext="html",
+                                            **vars(args))
+        with span("report.html"):
+            render_screener_html(args.group, collection,
+                                 os.path.join(collection_dir, report_fn),
+                                 top=args.top)
+
+    if args.profile:
+        stop_tracing()
+        stages = write_profile(profile_prefix + ".trace", profile_prefix)
+        with pd.option_context('display.max_rows', None,
+                               'display.max_columns', None):
+            logger.info(stages)
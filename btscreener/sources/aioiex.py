@@ -0,0 +1,162 @@
+"""
+Asyncio variant of :mod:`btscreener.sources.iex`.
+
+All requests go through one pooled ``aiohttp`` session, and a semaphore caps
+how many are in flight at once, so a single process can keep hundreds of
+requests open while it waits on the network.
+"""
+import logging
+import asyncio
+
+import aiohttp
+
+from . import iex
+from .iex import (
+    URL_CHART, URL_EARNINGS, URL_DIVIDENDS, RETRY_STATUS, RequestException,
+    loads, retry_delay, decode_historical, decode_earnings, decode_dividends
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 100
+"""int: default limit on requests in flight at once"""
+
+
+class AsyncIEXClient(object):
+    """
+    Async loaders for IEX Finance sharing one connection pool.
+
+    Use it as an async context manager::
+
+        async with AsyncIEXClient(concurrency=200) as client:
+            hist, dividends, earnings = await client.load_symbol("AAPL")
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, base_url=None,
+                 timeout=None):
+        """
+        Args:
+            concurrency (int): maximum number of requests in flight at once
+            base_url (str): root of the IEX API, defaults to iex.BASE_URL
+            timeout (float): total seconds allowed for each request, defaults
+                to iex.REQUEST_TIMEOUT
+        """
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=self.timeout or iex.REQUEST_TIMEOUT))
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+        self.session = None
+
+    def url(self, template, **kwargs):
+        return template.format(base=self.base_url or iex.BASE_URL, **kwargs)
+
+    async def fetch_json(self, url):
+        """
+        Requests a URL and decodes its JSON payload
+
+        Args:
+            url (str): URL to request
+
+        Returns:
+            object: decoded payload
+
+        Raises:
+            RequestException: if the server does not respond with success,
+                after retrying transient errors
+        """
+        for attempt in range(iex.RETRIES + 1):
+            async with self.semaphore:
+                logger.info("Loading: '{}'".format(url))
+                try:
+                    async with self.session.get(url) as response:
+                        if response.status == 200:
+                            return loads(await response.read())
+                        error = RequestException(
+                            "Failed to load '{}': {} {}".format(
+                                url, response.status, response.reason))
+                        if response.status not in RETRY_STATUS:
+                            raise error
+                except (aiohttp.ClientConnectionError,
+                        asyncio.TimeoutError) as e:
+                    error = RequestException("Failed to load '{}': {}".format(
+                        url, e))
+            if attempt == iex.RETRIES:
+                raise error
+            await asyncio.sleep(retry_delay(attempt))
+
+    async def load_historical(self, symbol, lookback="1m"):
+        url = self.url(URL_CHART, symbol=symbol, range=lookback)
+        return decode_historical(await self.fetch_json(url))
+
+    async def load_earnings(self, symbol):
+        url = self.url(URL_EARNINGS, symbol=symbol)
+        return decode_earnings(await self.fetch_json(url))
+
+    async def load_dividends(self, symbol, lookback="5y"):
+        url = self.url(URL_DIVIDENDS, symbol=symbol, range=lookback)
+        return decode_dividends(await self.fetch_json(url))
+
+    async def load_symbol(self, symbol, lookback="1m"):
+        """
+        Loads the chart, dividends and earnings of a symbol concurrently
+
+        Args:
+            symbol (str): stock ticker to look up
+            lookback (str): chart lookback period
+
+        Returns:
+            tuple: historical, dividends and earnings tables, as returned by
+                the iex loaders
+        """
+        return tuple(await asyncio.gather(
+            self.load_historical(symbol, lookback=lookback),
+            self.load_dividends(symbol),
+            self.load_earnings(symbol),
+        ))
+
+    async def load_universe(self, symbols, lookback="1m"):
+        """
+        Loads every symbol concurrently, within the concurrency limit
+
+        Args:
+            symbols (list(str)): stock tickers to look up
+            lookback (str): chart lookback period
+
+        Returns:
+            dict: load_symbol results keyed by symbol
+        """
+        symbols = list(symbols)
+        results = await asyncio.gather(*(
+            self.load_symbol(symbol, lookback=lookback) for symbol in symbols))
+        return dict(zip(symbols, results))
+
+
+def load_universe(symbols, lookback="1m", concurrency=DEFAULT_CONCURRENCY):
+    """
+    Blocking wrapper around AsyncIEXClient.load_universe
+
+    Args:
+        symbols (list(str)): stock tickers to look up
+        lookback (str): chart lookback period
+        concurrency (int): maximum number of requests in flight at once
+
+    Returns:
+        dict: historical, dividends and earnings tables keyed by symbol
+    """
+    async def run():
+        async with AsyncIEXClient(concurrency=concurrency) as client:
+            return await client.load_universe(symbols, lookback=lookback)
+    return asyncio.run(run())
@@ -0,0 +1,184 @@
+"""
+Shared memory arena of price histories for pool workers.
+
+The parent process publishes the bars of many symbols once, into one shared
+memory block, and hands the workers an ArenaHandle, which only holds the name
+of the block and the position of each symbol in it. A worker attaches to the
+block and maps the bars read-only, so the histories are never pickled and
+nothing is copied between processes, however large the universe.
+"""
+import logging
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .store import STORE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTACHED = 4
+"""int: arenas a worker keeps attached before closing the oldest"""
+
+_ATTACHED = OrderedDict()
+
+
+class ArenaHandle(object):
+    """
+    Picklable reference to a published PriceArena
+    """
+
+    def __init__(self, name, bars, spans):
+        """
+        Args:
+            name (str): shared memory block name
+            bars (int): number of bars in the arena
+            spans (dict): start and stop bar of each symbol keyed by symbol
+        """
+        self.name = name
+        self.bars = bars
+        self.spans = spans
+
+    def __repr__(self):
+        return "ArenaHandle({!r}, {} symbols)".format(self.name,
+                                                     len(self.spans))
+
+
+class PriceArena(object):
+    """
+    Daily bars of many symbols in one shared memory block.
+
+    The block holds the dates of every bar as int64 nanoseconds, followed by
+    their STORE_COLUMNS as a float64 array of shape (bars, columns). The bars
+    of a symbol are consecutive, oldest first.
+    """
+
+    def __init__(self, shm, handle, owner=False):
+        self.shm = shm
+        self.handle = handle
+        self.owner = owner
+        bars = handle.bars
+        self.dates = np.ndarray((bars,), dtype=np.int64, buffer=shm.buf)
+        self.values = np.ndarray((bars, len(STORE_COLUMNS)), dtype=np.float64,
+                                 buffer=shm.buf, offset=bars * 8)
+        if not owner:
+            self.dates.flags.writeable = False
+            self.values.flags.writeable = False
+
+    def __repr__(self):
+        return "PriceArena({!r})".format(self.handle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, symbol):
+        return symbol in self.handle.spans
+
+    @property
+    def symbols(self):
+        return list(self.handle.spans)
+
+    @classmethod
+    def publish(cls, tables):
+        """
+        Copies histories into a new shared memory block. The arena owns the
+        block, which lives until the arena is closed.
+
+        Args:
+            tables (dict): historical tables keyed by symbol, with a date
+                column and the STORE_COLUMNS. Symbols without a table are
+                left out.
+
+        Returns:
+            PriceArena: the published arena
+        """
+        tables = OrderedDict((symbol, table) for symbol, table in tables.items()
+                             if table is not None and len(table.index) > 0)
+        spans = OrderedDict()
+        start = 0
+        for symbol, table in tables.items():
+            spans[symbol] = (start, start + len(table.index))
+            start += len(table.index)
+        size = max(start * 8 * (1 + len(STORE_COLUMNS)), 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        arena = cls(shm, ArenaHandle(shm.name, start, spans), owner=True)
+        for symbol, table in tables.items():
+            first, last = spans[symbol]
+            arena.dates[first:last] = np.asarray(
+                table["date"], dtype="datetime64[ns]").view(np.int64)
+            for i, column in enumerate(STORE_COLUMNS):
+                arena.values[first:last, i] = table[column].values
+        logger.debug("Published {} bars of {} symbols to {}".format(
+            start, len(spans), shm.name))
+        return arena
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Maps a published arena read-only. A worker keeps the last
+        MAX_ATTACHED arenas attached, so a run attaches to each arena once
+        per worker.
+
+        Args:
+            handle (ArenaHandle): handle of the published arena
+
+        Returns:
+            PriceArena: the attached arena
+        """
+        arena = _ATTACHED.pop(handle.name, None)
+        if arena is None:
+            arena = cls(shared_memory.SharedMemory(name=handle.name), handle)
+            while len(_ATTACHED) >= MAX_ATTACHED:
+                _ATTACHED.popitem(last=False)[1].close()
+        _ATTACHED[handle.name] = arena
+        return arena
+
+    def arrays(self, symbol):
+        """
+        The views point into the shared block, so they must be dropped before
+        the arena is closed.
+
+        Args:
+            symbol (str): ticker to look up
+
+        Returns:
+            tuple: views of the dates, as datetime64[ns], and of the
+                STORE_COLUMNS of the symbol's bars
+        """
+        first, last = self.handle.spans[symbol]
+        return (self.dates[first:last].view("datetime64[ns]"),
+                self.values[first:last])
+
+    def table(self, symbol):
+        """
+        Args:
+            symbol (str): ticker to look up
+
+        Returns:
+            pd.DataFrame: historical table of the symbol, as the sources load
+                it, or None if the arena has no bars of the symbol
+        """
+        if symbol not in self:
+            return None
+        dates, values = self.arrays(symbol)
+        # the table is the worker's own, so it outlives the mapping
+        table = pd.DataFrame(values, columns=STORE_COLUMNS, copy=True)
+        table.insert(0, "date", dates.copy())
+        return table
+
+    def close(self):
+        """
+        Unmaps the arena, and frees the block if this arena published it
+        """
+        if self.shm is None:
+            return
+        # the views must go before the buffer they point into
+        self.dates = self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
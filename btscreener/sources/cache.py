@@ -0,0 +1,256 @@
+"""
+HTTP response cache shared by the processes of a collection run.
+
+Responses are kept in a SQLite database, which serializes writers across
+processes, so ``multiprocessing`` workers can share one cache file. Each entry
+stays fresh for the TTL of its endpoint. Once an entry is stale, it is
+revalidated with its ETag or Last-Modified validator when the server sent one,
+and fetched again otherwise. When the cache grows past its size limit, the
+least recently used entries are evicted.
+"""
+import logging
+import os
+import time
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    "chart": 60 * 60,
+    "dividends": 24 * 60 * 60,
+    "earnings": 24 * 60 * 60,
+    "symbols": 24 * 60 * 60,
+}
+"""dict: seconds a response stays fresh, keyed by IEX endpoint"""
+
+DEFAULT_MAX_ENTRIES = 20000
+"""int: default number of responses kept before evicting"""
+
+COUNTERS = ["hits", "misses", "revalidated", "evicted"]
+"""list(str): statistics kept by a ResponseCache"""
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        endpoint TEXT,
+        payload TEXT,
+        etag TEXT,
+        last_modified TEXT,
+        stored REAL,
+        accessed REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+    """CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        count INTEGER
+    )""",
+]
+
+
+class CacheEntry(object):
+    """
+    A cached response, as returned by ResponseCache.get
+    """
+
+    def __init__(self, payload, etag, last_modified, stored, fresh):
+        """
+        Args:
+            payload (str): JSON text of the response
+            etag (str): ETag header of the response, or None
+            last_modified (str): Last-Modified header of the response, or None
+            stored (float): time the response was stored or last revalidated
+            fresh (bool): whether the entry is still within its TTL
+        """
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored = stored
+        self.fresh = fresh
+
+    def validators(self):
+        """
+        Returns:
+            dict: conditional request headers to revalidate the entry with
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """
+    Size-bounded cache of JSON responses, keyed by URL.
+
+    The cache can be pickled into pool workers. Each thread of each process
+    opens its own connection to the database the first time it uses the
+    cache.
+    """
+
+    def __init__(self, path, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path (str): SQLite database file, created if needed
+            ttls (dict): seconds a response stays fresh keyed by endpoint,
+                updating DEFAULT_TTLS. Endpoints without a TTL are always
+                revalidated.
+            max_entries (int): number of responses kept before evicting the
+                least recently used ones
+        """
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def __repr__(self):
+        return "ResponseCache({!r})".format(self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # connections must not be shared between threads, nor with forked
+        # pool workers
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            local.connection = sqlite3.connect(self.path, timeout=60,
+                                               isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                local.connection.execute(statement)
+            local.pid = os.getpid()
+        return local.connection
+
+    def ttl(self, endpoint):
+        """
+        Args:
+            endpoint (str): endpoint name, or a comma separated list of the
+                endpoints a batch request covers
+
+        Returns:
+            float: seconds a response of the endpoint stays fresh
+        """
+        if not endpoint:
+            return 0
+        return min(self.ttls.get(name, 0) for name in endpoint.split(","))
+
+    def get(self, key, endpoint=None):
+        """
+        Looks up a response and marks it as recently used
+
+        Args:
+            key (str): request URL, including its query string
+            endpoint (str): endpoint of the request, for its TTL
+
+        Returns:
+            CacheEntry: the cached response, or None if there is none
+        """
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT payload, etag, last_modified, stored FROM responses "
+            "WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        payload, etag, last_modified, stored = row
+        return CacheEntry(payload, etag, last_modified, stored,
+                          fresh=now - stored < self.ttl(endpoint))
+
+    def put(self, key, payload, endpoint=None, etag=None, last_modified=None):
+        """
+        Stores a response, evicting the least recently used ones if the cache
+        is full
+
+        Args:
+            key (str): request URL, including its query string
+            payload (str): JSON text of the response
+            endpoint (str): endpoint of the request
+            etag (str): ETag header of the response
+            last_modified (str): Last-Modified header of the response
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, payload, etag, last_modified, now, now))
+            evicted = connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        if evicted > 0:
+            self.count("evicted", evicted)
+
+    def touch(self, key):
+        """
+        Restarts the TTL of a response the server confirmed is unchanged
+
+        Args:
+            key (str): request URL, including its query string
+        """
+        now = time.time()
+        self.connection.execute(
+            "UPDATE responses SET stored = ?, accessed = ? WHERE key = ?",
+            (now, now, key))
+
+    def transaction(self):
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        return _Transaction(connection)
+
+    def count(self, name, increment=1):
+        """
+        Adds to one of the COUNTERS
+
+        Args:
+            name (str): counter name
+            increment (int): amount to add
+        """
+        self.connection.execute(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) "
+            "DO UPDATE SET count = count + excluded.count", (name, increment))
+
+    def stats(self):
+        """
+        Returns:
+            dict: COUNTERS summed over every process using the cache, and the
+                number of stored entries
+        """
+        counts = dict(self.connection.execute(
+            "SELECT name, count FROM counters").fetchall())
+        stats = {name: counts.get(name, 0) for name in COUNTERS}
+        stats["entries"] = self.connection.execute(
+            "SELECT COUNT(*) FROM responses").fetchone()[0]
+        return stats
+
+    def clear(self):
+        """
+        Drops every response and resets the counters
+        """
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM responses")
+            connection.execute("DELETE FROM counters")
+
+
+class _Transaction(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
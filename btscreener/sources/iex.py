@@ -1,24 +1,69 @@
 import logging
+import os
+import json
+import time
+import random
 import datetime
+from collections import OrderedDict
 
 import pandas as pd
 import numpy as np
 import requests
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+from btscreener.tracing.spans import span
+from .store import RANGE_DAYS
+from .cache import ResponseCache
 
-URL_CHART = "https://api.iextrading.com/1.0/stock/{symbol}/chart/{range}"
-URL_EARNINGS = "https://api.iextrading.com/1.0/stock/{symbol}/earnings"
-URL_DIVIDENDS = (
-    "https://api.iextrading.com/1.0/stock/{symbol}/dividends/{range}"
-)
+BASE_URL = os.environ.get("IEX_BASE_URL", "https://api.iextrading.com/1.0")
+"""str: root of the IEX API, overridden by $IEX_BASE_URL"""
+
+CACHE = (ResponseCache(os.environ["IEX_CACHE"])
+         if os.environ.get("IEX_CACHE") else None)
+"""ResponseCache: cache of IEX responses, set from $IEX_CACHE, None to always
+request"""
+
+URL_CHART = "{base}/stock/{symbol}/chart/{range}"
+URL_EARNINGS = "{base}/stock/{symbol}/earnings"
+URL_DIVIDENDS = "{base}/stock/{symbol}/dividends/{range}"
+URL_BATCH = "{base}/stock/market/batch"
+URL_SYMBOLS = "{base}/ref-data/symbols"
+
+BATCH_SIZE = 100
+"""int: maximum number of symbols IEX accepts in one batch request"""
+
+REQUEST_TIMEOUT = float(os.environ.get("IEX_TIMEOUT", 10))
+"""float: seconds to wait for a connection or for data, per request"""
+
+RETRIES = 3
+"""int: attempts made again after a request fails with a transient error"""
+
+RETRY_BACKOFF = 0.5
+"""float: base of the exponential backoff between attempts, in seconds"""
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+"""set(int): HTTP status codes worth retrying"""
+
+DATE_FORMAT = "%Y-%m-%d"
 
 HISTORICAL_DATE_COLUMNS = ["date"]
 DIVIDEND_DATE_COLUMNS = ["declaredDate", "exDate", "paymentDate", "recordDate"]
 EARNINGS_DATE_COLUMNS = ["EPSReportDate", "fiscalEndDate"]
 
+HISTORICAL_NUMERIC_COLUMNS = ["open", "high", "low", "close", "volume"]
+DIVIDEND_NUMERIC_COLUMNS = ["amount"]
+EARNINGS_NUMERIC_COLUMNS = ["actualEPS", "consensusEPS", "estimatedEPS",
+                            "EPSSurpriseDollar"]
+
 
 logger = logging.getLogger(__name__)
 
+_session = None
+_session_pid = None
+
 
 class RequestException(Exception):
     """
@@ -35,7 +80,7 @@ def parse_date(s):
     :type: datetime.date
     """
     try:
-        return datetime.datetime.strptime(s, "%Y-%m-%d")
+        return datetime.datetime.strptime(s, DATE_FORMAT)
     except ValueError:
         return pd.NaT
 
@@ -53,26 +98,211 @@ def parse_numeric(s, how=pd.to_numeric):
         return np.NaN
 
 
-def load_historical(symbol, lookback="1m"):
+def loads(text):
     """
-    Loads historical data from IEX Finance
-    :param symbol: stock ticker to look up
+    Decodes JSON text, with orjson when it is installed
+    :param text: JSON document
+    :type: str or bytes
+    :return: decoded payload
+    """
+    with span("json"):
+        if orjson is not None:
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                # orjson is strict about NaN and Infinity, json is not
+                pass
+        return json.loads(text)
+
+
+def decode_records(records, date_columns=(), numeric_columns=()):
+    """
+    Builds a table from JSON records one column at a time, parsing each date
+    and numeric column with a single vectorized call. Values that fail to
+    parse become NaT or NaN, like parse_date and parse_numeric.
+    :param records: decoded JSON objects, one per row
+    :type: list(dict)
+    :param date_columns: columns of "YYYY-MM-DD" dates to parse
+    :type: list(str)
+    :param numeric_columns: columns of numbers to parse
+    :type: list(str)
+    :return: the table, with columns in the order they first appear
+    :type: pd.DataFrame
+    """
+    with span("decode"):
+        keys = OrderedDict.fromkeys(key for record in records
+                                    for key in record)
+        df = pd.DataFrame(OrderedDict(
+            (key, [record.get(key) for record in records]) for key in keys))
+        with span("decode.dates"):
+            for column in date_columns:
+                if column in df:
+                    df[column] = pd.to_datetime(df[column], format=DATE_FORMAT,
+                                                errors="coerce")
+        with span("decode.numeric"):
+            for column in numeric_columns:
+                if column in df:
+                    df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
+
+
+def get_session():
+    """
+    Gets the HTTP session of this process, so that connections to IEX are
+    pooled and reused between requests instead of opened for every call
+    :return: the session for the current process
+    :type: requests.Session
+    """
+    global _session, _session_pid
+    # sessions must not be shared with forked pool workers
+    if _session is None or _session_pid != os.getpid():
+        _session = requests.Session()
+        _session_pid = os.getpid()
+    return _session
+
+
+def fetch_json(url, params=None, endpoint=None):
+    """
+    Requests a URL and decodes its JSON payload, going through CACHE when one
+    is set
+    :param url: URL to request
     :type: str
-    :param lookback: lookback period
+    :param params: query string parameters
+    :type: dict
+    :param endpoint: endpoint name(s) of the request, for the cache TTL
+    :type: str
+    :return: decoded payload
+    :raises RequestException: if the server does not respond with success
+    """
+    if CACHE is None:
+        return loads(_check_response(_get(url, params)).content)
+
+    key = requests.Request("GET", url, params=params).prepare().url
+    entry = CACHE.get(key, endpoint)
+    if entry is not None and entry.fresh:
+        CACHE.count("hits")
+        return loads(entry.payload)
+
+    response = _get(url, params,
+                    headers=entry.validators() if entry is not None else None)
+    if entry is not None and response.status_code == 304:
+        CACHE.count("revalidated")
+        CACHE.touch(key)
+        return loads(entry.payload)
+    _check_response(response)
+    CACHE.count("misses")
+    CACHE.put(key, response.text, endpoint=endpoint,
+              etag=response.headers.get("ETag"),
+              last_modified=response.headers.get("Last-Modified"))
+    return loads(response.content)
+
+
+def retry_delay(attempt, backoff=RETRY_BACKOFF):
+    """
+    Picks how long to wait before attempting a request again, with full
+    jitter so that workers which failed together do not retry together
+    :param attempt: number of the attempt that failed, from 0
     :type: int
+    :param backoff: base of the exponential backoff, in seconds
+    :type: float
+    :return: seconds to wait
+    :type: float
+    """
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+def _get(url, params=None, headers=None):
+    for attempt in range(RETRIES + 1):
+        logger.info("Loading: '{}' {}".format(url, params or ""))
+        try:
+            with span("http"):
+                response = get_session().get(url, params=params,
+                                             headers=headers,
+                                             timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == RETRIES:
+                raise RequestException("Failed to load '{}': {}".format(
+                    url, e)) from e
+            reason = type(e).__name__
+        else:
+            if response.status_code not in RETRY_STATUS or attempt == RETRIES:
+                return response
+            reason = response.status_code
+        delay = retry_delay(attempt)
+        logger.warning("Retrying '{}' in {:.2f}s after {}".format(
+            url, delay, reason))
+        time.sleep(delay)
+
+
+def _check_response(response):
+    if response.status_code != 200:
+        raise RequestException("Failed to load '{}': {} {}".format(
+            response.url, response.status_code, response.reason))
+    return response
+
+
+def decode_historical(result):
+    """
+    Decodes a chart payload from IEX Finance
+    :param result: decoded JSON payload
+    :type: list
     :return: loaded DataFrame
     :type: pd.DataFrame
     """
-    url = URL_CHART.format(symbol=symbol, range=lookback)
-    logger.info("Loading: '{}'".format(url))
-    result = requests.get(url).json()
+    if len(result) == 0:
+        return None
+    return decode_records(result, date_columns=HISTORICAL_DATE_COLUMNS,
+                          numeric_columns=HISTORICAL_NUMERIC_COLUMNS)
+
+
+def decode_earnings(result):
+    """
+    Decodes an earnings payload from IEX Finance
+    :param result: decoded JSON payload
+    :type: dict
+    :return: loaded table
+    :type: pd.DataFrame
+    """
     try:
-        df = pd.DataFrame(result)
+        records = result["earnings"]
     except KeyError:
         return None
-    df[HISTORICAL_DATE_COLUMNS] = df[HISTORICAL_DATE_COLUMNS].applymap(
-        parse_date)
-    return df
+    return decode_records(records, date_columns=EARNINGS_DATE_COLUMNS,
+                          numeric_columns=EARNINGS_NUMERIC_COLUMNS)
+
+
+def decode_dividends(data):
+    """
+    Decodes a dividends payload from IEX Finance
+    :param data: decoded JSON payload
+    :type: list
+    :return: loaded DataFrame
+    :type: pd.DataFrame
+    """
+    if len(data) == 0 or not isinstance(data, list):
+        return None
+    return decode_records(data, date_columns=DIVIDEND_DATE_COLUMNS,
+                          numeric_columns=DIVIDEND_NUMERIC_COLUMNS)
+
+
+def load_historical(symbol, lookback="1m", store=None):
+    """
+    Loads historical data from IEX Finance
+    :param symbol: stock ticker to look up
+    :type: str
+    :param lookback: lookback period
+    :type: int
+    :param store: local bar store to serve the history from, only fetching
+        the bars it is missing
+    :type: btscreener.sources.store.BarStore
+    :return: loaded DataFrame
+    :type: pd.DataFrame
+    """
+    if store is not None and lookback in RANGE_DAYS:
+        return store.load(symbol, lookback,
+                          lambda rng: load_historical(symbol, lookback=rng))
+    url = URL_CHART.format(base=BASE_URL, symbol=symbol, range=lookback)
+    return decode_historical(fetch_json(url, endpoint="chart"))
 
 
 def load_earnings(symbol):
@@ -83,15 +313,8 @@ def load_earnings(symbol):
     :return: loaded table
     :type: pd.DataFrame
     """
-    url = URL_EARNINGS.format(symbol=symbol)
-    logger.info("Loading: '{}'".format(url))
-    result = requests.get(url).json()
-    try:
-        df = pd.DataFrame(result["earnings"])
-    except KeyError:
-        return None
-    df[EARNINGS_DATE_COLUMNS] = df[EARNINGS_DATE_COLUMNS].applymap(parse_date)
-    return df
+    url = URL_EARNINGS.format(base=BASE_URL, symbol=symbol)
+    return decode_earnings(fetch_json(url, endpoint="earnings"))
 
 
 def load_dividends(symbol, lookback="5y"):
@@ -104,15 +327,149 @@ def load_dividends(symbol, lookback="5y"):
     :return: loaded DataFrame
     :type: pd.DataFrame
     """
-    url = URL_DIVIDENDS.format(symbol=symbol, range=lookback)
-    logger.info("Loading: '{}'".format(url))
-    data = requests.get(url).json()
-    if len(data) == 0:
-        return None
-    try:
-        df = pd.DataFrame(data)
-    except ValueError:
+    url = URL_DIVIDENDS.format(base=BASE_URL, symbol=symbol, range=lookback)
+    return decode_dividends(fetch_json(url, endpoint="dividends"))
+
+
+def load_symbols():
+    """
+    Loads the list of symbols IEX Finance has data for
+    :return: enabled stock tickers
+    :type: list(str)
+    """
+    records = fetch_json(URL_SYMBOLS.format(base=BASE_URL), endpoint="symbols")
+    return [record["symbol"] for record in records
+            if record.get("isEnabled", True)]
+
+
+def load_batch(symbols, types, lookback=None):
+    """
+    Loads several data types for many symbols from the IEX Finance market batch
+    endpoint, splitting the symbols into requests of at most BATCH_SIZE
+    :param symbols: stock tickers to look up
+    :type: list(str)
+    :param types: data types to load, e.g. ["chart", "earnings"]
+    :type: list(str)
+    :param lookback: range for the chart and dividends types
+    :type: str
+    :return: raw payloads keyed by upper case symbol and then by type
+    :type: dict
+    """
+    symbols = list(symbols)
+    payloads = {}
+    for i in range(0, len(symbols), BATCH_SIZE):
+        params = {
+            "symbols": ",".join(symbols[i:i + BATCH_SIZE]),
+            "types": ",".join(types),
+        }
+        if lookback is not None:
+            params["range"] = lookback
+        payloads.update(fetch_json(URL_BATCH.format(base=BASE_URL),
+                                   params=params, endpoint=params["types"]))
+    return payloads
+
+
+BATCH_DECODERS = {
+    "chart": decode_historical,
+    "earnings": decode_earnings,
+    "dividends": decode_dividends,
+}
+
+
+def decode_batch(payloads, symbol, data_type):
+    """
+    Decodes one symbol's payload from a load_batch result
+    :param payloads: load_batch result
+    :type: dict
+    :param symbol: stock ticker
+    :type: str
+    :param data_type: one of "chart", "earnings" or "dividends"
+    :type: str
+    :return: the table the matching load_* function returns, or None if the
+        batch has no data for the symbol
+    :type: pd.DataFrame
+    """
+    payload = payloads.get(symbol.upper(), {}).get(data_type)
+    if payload is None:
         return None
+    return BATCH_DECODERS[data_type](payload)
 
-    df[DIVIDEND_DATE_COLUMNS] = df[DIVIDEND_DATE_COLUMNS].applymap(parse_date)
-    return df
+
+def load_stored_histories(symbols, lookback, store):
+    """
+    Serves histories from a local bar store, fetching the missing bars of all
+    symbols with batch requests grouped by the chart range they need
+    :param symbols: stock tickers to look up
+    :type: list(str)
+    :param lookback: lookback period
+    :type: str
+    :param store: local bar store
+    :type: btscreener.sources.store.BarStore
+    :return: historical tables keyed by symbol
+    :type: dict
+    """
+    groups = {}
+    for symbol in symbols:
+        tail_range, append = store.plan(symbol, lookback)
+        if tail_range is not None:
+            groups.setdefault(tail_range, []).append(symbol)
+    charts = {tail_range: load_batch(group, ["chart"], lookback=tail_range)
+              for tail_range, group in groups.items()}
+
+    def fetch(symbol, rng):
+        if symbol in groups.get(rng, []):
+            return decode_batch(charts[rng], symbol, "chart")
+        # the store changed its mind, e.g. after spotting an adjustment
+        return load_historical(symbol, lookback=rng)
+
+    return {symbol: store.load(symbol, lookback,
+                               lambda rng, symbol=symbol: fetch(symbol, rng))
+            for symbol in symbols}
+
+
+def load_histories(symbols, lookback="1m", store=None):
+    """
+    Loads the charts of many symbols with batch requests
+    :param symbols: stock tickers to look up
+    :type: list(str)
+    :param lookback: chart lookback period
+    :type: str
+    :param store: local bar store to serve the histories from
+    :type: btscreener.sources.store.BarStore
+    :return: historical tables keyed by symbol, as returned by load_historical
+    :type: dict
+    """
+    symbols = list(symbols)
+    if store is not None and lookback in RANGE_DAYS:
+        return load_stored_histories(symbols, lookback, store)
+    charts = load_batch(symbols, ["chart"], lookback=lookback)
+    return {symbol: decode_batch(charts, symbol, "chart")
+            for symbol in symbols}
+
+
+def load_universe(symbols, lookback="1m", dividend_lookback="5y", store=None):
+    """
+    Loads the chart, dividends and earnings of many symbols with a handful of
+    batch requests instead of three requests per symbol
+    :param symbols: stock tickers to look up
+    :type: list(str)
+    :param lookback: chart lookback period
+    :type: str
+    :param dividend_lookback: dividends lookback period
+    :type: str
+    :param store: local bar store to serve the histories from
+    :type: btscreener.sources.store.BarStore
+    :return: historical, dividends and earnings tables keyed by symbol, each
+        as returned by the matching load_* function
+    :type: dict
+    """
+    symbols = list(symbols)
+    histories = load_histories(symbols, lookback=lookback, store=store)
+    # the batch range applies to both chart and dividends, so the calendars
+    # go in their own requests
+    calendars = load_batch(symbols, ["dividends", "earnings"],
+                           lookback=dividend_lookback)
+    return {symbol: (histories[symbol],
+                     decode_batch(calendars, symbol, "dividends"),
+                     decode_batch(calendars, symbol, "earnings"))
+            for symbol in symbols}
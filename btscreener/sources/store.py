@@ -0,0 +1,241 @@
+import logging
+import os
+import json
+import datetime
+
+import pandas as pd
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_COLUMNS = ["open", "high", "low", "close", "volume"]
+"""list(str): historical columns kept in the store, besides the date"""
+
+RANGE_BARS = [
+    ("5d", 5),
+    ("1m", 20),
+    ("3m", 62),
+    ("6m", 125),
+    ("1y", 250),
+    ("2y", 500),
+    ("5y", 1250),
+]
+"""list(tuple): IEX chart ranges and the trading days each one returns"""
+
+RANGE_DAYS = {
+    "5d": 7,
+    "1m": 31,
+    "3m": 92,
+    "6m": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+}
+"""dict: calendar days covered by each IEX chart range"""
+
+ADJUSTMENT_TOLERANCE = 1e-6
+"""float: relative change in a stored close that marks a history as adjusted"""
+
+
+class BarStore(object):
+    """
+    Local store of daily bars, with one memory-mappable file per symbol.
+
+    Each symbol has a ``{symbol}.npy`` structured array of its bars and a small
+    ``{symbol}.json`` metadata record, which together form the store's index.
+    Files are written to a temporary name and renamed into place, so readers in
+    other processes never see a partial file.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root (str): directory to keep the store in, created if needed
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return "BarStore({!r})".format(self.root)
+
+    def _path(self, symbol, ext):
+        return os.path.join(self.root, "{}.{}".format(symbol.upper(), ext))
+
+    def metadata(self, symbol):
+        """
+        Args:
+            symbol (str): stock ticker
+
+        Returns:
+            dict: metadata for the symbol, or None if it is not stored
+        """
+        try:
+            with open(self._path(symbol, "json")) as fobj:
+                return json.load(fobj)
+        except IOError:
+            return None
+
+    def index(self):
+        """
+        Returns:
+            pd.DataFrame: metadata of every stored symbol, indexed by symbol
+        """
+        records = [self.metadata(fn[:-len(".json")])
+                   for fn in sorted(os.listdir(self.root))
+                   if fn.endswith(".json")]
+        return pd.DataFrame([r for r in records if r is not None],
+                            columns=["symbol", "first", "last", "bars",
+                                     "covers", "updated"]).set_index("symbol")
+
+    def read(self, symbol):
+        """
+        Reads a symbol's bars, memory-mapping the file
+
+        Args:
+            symbol (str): stock ticker
+
+        Returns:
+            pd.DataFrame: stored bars with a date column, or None if the symbol
+                is not stored
+        """
+        try:
+            bars = np.load(self._path(symbol, "npy"), mmap_mode="r")
+        except IOError:
+            return None
+        table = pd.DataFrame({column: bars[column]
+                              for column in ["date"] + STORE_COLUMNS})
+        table["date"] = pd.to_datetime(table["date"])
+        return table
+
+    def write(self, symbol, table, covers=None):
+        """
+        Replaces a symbol's bars
+
+        Args:
+            symbol (str): stock ticker
+            table (pd.DataFrame): historical table with a date column
+            covers (datetime.date): earliest date the history was requested
+                from, defaults to the first date in the table
+        """
+        table = table.sort_values("date")
+        dtype = [("date", "datetime64[D]")] + [
+            (column, "f8") for column in STORE_COLUMNS]
+        bars = np.empty(len(table.index), dtype=dtype)
+        bars["date"] = pd.to_datetime(table["date"]).values.astype(
+            "datetime64[D]")
+        for column in STORE_COLUMNS:
+            bars[column] = table[column].values
+        self._replace(self._path(symbol, "npy"),
+                      lambda fobj: np.save(fobj, bars))
+
+        first = str(bars["date"][0]) if len(bars) else None
+        metadata = {
+            "symbol": symbol.upper(),
+            "first": first,
+            "last": str(bars["date"][-1]) if len(bars) else None,
+            "bars": len(bars),
+            "covers": str(covers) if covers else first,
+            "updated": datetime.datetime.now().isoformat(),
+        }
+        self._replace(self._path(symbol, "json"),
+                      lambda fobj: fobj.write(json.dumps(metadata).encode()))
+
+    @staticmethod
+    def _replace(path, dump):
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as fobj:
+            dump(fobj)
+        os.replace(tmp_path, path)
+
+    def plan(self, symbol, lookback, today=None):
+        """
+        Works out which chart range a load would fetch, so that callers can
+        fetch it ahead of time for many symbols at once
+
+        Args:
+            symbol (str): stock ticker
+            lookback (str): IEX chart range to serve, e.g. "3m"
+            today (datetime.date): date of the run, defaults to today
+
+        Returns:
+            tuple: the chart range to fetch (None if the store is up to date),
+                and whether it is a tail to append (False for a full refresh)
+        """
+        today = today or datetime.date.today()
+        start = today - datetime.timedelta(RANGE_DAYS[lookback])
+        metadata = self.metadata(symbol)
+        if metadata is None or not metadata["bars"] or (
+                datetime.date.fromisoformat(metadata["covers"]) > start):
+            return lookback, False
+
+        last = datetime.date.fromisoformat(metadata["last"])
+        missing = len(pd.bdate_range(last + datetime.timedelta(1), today))
+        if missing == 0:
+            return None, True
+        # ask for at least one stored bar as well, to detect adjustments
+        tail_range = next((name for name, bars in RANGE_BARS
+                           if bars > missing), None)
+        if tail_range is None:
+            return lookback, False
+        return tail_range, True
+
+    def load(self, symbol, lookback, fetch, today=None):
+        """
+        Serves a history from the store, only fetching the bars that are
+        missing since the last update
+
+        The full lookback is fetched again when the store does not reach back
+        far enough, the gap is longer than any chart range, or the refreshed
+        bars disagree with the stored ones (for example after a split
+        adjustment).
+
+        Args:
+            symbol (str): stock ticker
+            lookback (str): IEX chart range to serve, e.g. "3m"
+            fetch (callable): called with an IEX chart range, returns the
+                historical table for that range or None
+            today (datetime.date): date of the run, defaults to today
+
+        Returns:
+            pd.DataFrame: historical table covering the lookback, or None if
+                nothing could be loaded
+        """
+        today = today or datetime.date.today()
+        start = today - datetime.timedelta(RANGE_DAYS[lookback])
+        tail_range, append = self.plan(symbol, lookback, today=today)
+        if not append:
+            return self._refresh(symbol, lookback, fetch, start)
+
+        stored = self.read(symbol)
+        if tail_range is not None:
+            tail = fetch(tail_range)
+            if tail is None:
+                return self._refresh(symbol, lookback, fetch, start)
+            tail = tail[["date"] + STORE_COLUMNS]
+            overlap = stored.merge(tail, on="date", suffixes=("", "_new"))
+            if not np.allclose(overlap["close"], overlap["close_new"],
+                               rtol=ADJUSTMENT_TOLERANCE):
+                logger.info("Stored history for {} was adjusted".format(
+                    symbol))
+                return self._refresh(symbol, lookback, fetch, start)
+            logger.debug("Appending {} bars to {}".format(
+                len(tail.index) - len(overlap.index), symbol))
+            stored = pd.concat([stored[~stored["date"].isin(tail["date"])],
+                                tail], ignore_index=True)
+            self.write(symbol, stored,
+                       covers=self.metadata(symbol)["covers"])
+
+        return self._since(stored, start)
+
+    def _refresh(self, symbol, lookback, fetch, start):
+        table = fetch(lookback)
+        if table is None:
+            return None
+        table = table[["date"] + STORE_COLUMNS]
+        self.write(symbol, table, covers=start)
+        return self._since(table, start)
+
+    @staticmethod
+    def _since(table, start):
+        table = table[table["date"] >= pd.Timestamp(start)]
+        return table.sort_values("date").reset_index(drop=True)
@@ -0,0 +1,340 @@
+"""
+Local HTTP stand-in for the IEX Finance endpoints used by
+:mod:`btscreener.sources.iex`, serving synthetic data from
+:mod:`btscreener.sources.synthetic`
+"""
+import logging
+import re
+import json
+import hashlib
+import time
+import random
+import datetime
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .iex import BATCH_SIZE
+from .store import RANGE_BARS
+from .synthetic import (
+    symbol_seed, make_synthetic_history, make_synthetic_symbols,
+    make_chart_payload, make_earnings_payload, make_dividends_payload
+)
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BARS = dict(RANGE_BARS)
+"""dict: bars served for each chart range"""
+
+ROUTES = [
+    ("chart", re.compile(r"^/stock/(?P<symbol>[^/]+)/chart/(?P<range>\w+)$")),
+    ("earnings", re.compile(r"^/stock/(?P<symbol>[^/]+)/earnings$")),
+    ("dividends",
+     re.compile(r"^/stock/(?P<symbol>[^/]+)/dividends/(?P<range>\w+)$")),
+    ("batch", re.compile(r"^/stock/market/batch$")),
+    ("ref_symbols", re.compile(r"^/ref-data/symbols$")),
+]
+"""list(tuple): endpoint names and the paths they answer"""
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server.stub
+        self.start_time = time.perf_counter()
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self.respond(server)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def send_response(self, code, message=None):
+        # recorded before the client can see the response, so the stats are
+        # complete as soon as a request returns. Malformed requests are
+        # answered before do_GET and not recorded.
+        if getattr(self, "start_time", None) is not None:
+            self.server.stub.record(code,
+                                    time.perf_counter() - self.start_time)
+        super().send_response(code, message)
+
+    def respond(self, server):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        status, delay = server.fault(url.path, query)
+        delay += server.latency
+        if server.latency_jitter:
+            delay += server.rng.uniform(0, server.latency_jitter)
+        if delay:
+            time.sleep(delay)
+        if status is not None:
+            if status == 429:
+                self.send_response(429, "Too Many Requests")
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_error(status, "Injected fault")
+            return
+        payload = server.route(url.path, query)
+        if payload is None:
+            self.send_error(404, "Unknown symbol")
+            return
+        body = json.dumps(payload).encode()
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class StubIEXServer(object):
+    """
+    Serves synthetic chart, earnings and dividends payloads on localhost.
+
+    Use it as a context manager and point the loaders at ``base_url``, either
+    through ``btscreener.sources.iex.BASE_URL`` or ``$IEX_BASE_URL``.
+
+    By default any symbol is served. With a universe, only the made up
+    tickers of make_synthetic_symbols are, and ``/ref-data/symbols`` lists
+    them, so a load test can collect every symbol of a universe of any size.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, today=None,
+                 universe=None, latency_jitter=0.0, error_rate=0.0,
+                 rate_limit=None, seed=0):
+        """
+        Args:
+            host (str): interface to listen on
+            port (int): port to listen on, 0 to pick a free one
+            latency (float): seconds to wait before answering each request
+            today (datetime.date): date of the last bar served
+            universe (int): number of made up tickers served, None to serve
+                any symbol
+            latency_jitter (float): up to this many more seconds to wait
+                before answering each request, picked at random
+            error_rate (float): fraction of the requests answered with a 500,
+                picked at random
+            rate_limit (float): requests answered per second, over which
+                requests get a 429, None for no limit
+            seed (int): random seed of the jitter and errors
+        """
+        self.latency = latency
+        self.today = today or datetime.date.today()
+        self.universe = universe
+        self.universe_symbols = (make_synthetic_symbols(universe)
+                                 if universe is not None else [])
+        self.known_symbols = set(self.universe_symbols)
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate_limit or 0.0
+        self.refilled = time.monotonic()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = Counter()
+        self.latencies = []
+        self.failures = 0
+        self.fail_symbols = set()
+        self.stalls = {}
+        self.stall_time = 0.0
+        self.httpd = ThreadingHTTPServer((host, port), StubRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.httpd.stub = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        logger.info("Stub IEX server listening on {}".format(self.base_url))
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def stats(self):
+        """
+        Returns:
+            OrderedDict: number of requests, of each response status, and the
+                median, 95th and 99th percentile seconds taken to answer
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+        stats = OrderedDict([
+            ("requests", len(latencies)),
+            ("statuses", statuses),
+        ])
+        for percent in (50, 95, 99):
+            stats["p{}".format(percent)] = (
+                latencies[min(len(latencies) - 1,
+                              len(latencies) * percent // 100)]
+                if latencies else None)
+        return stats
+
+    def record(self, status, seconds):
+        """
+        Args:
+            status (int): HTTP status of a response
+            seconds (float): time taken to answer
+        """
+        with self.lock:
+            self.statuses[status] += 1
+            self.latencies.append(seconds)
+
+    def reset_stats(self):
+        with self.lock:
+            self.statuses.clear()
+            self.latencies = []
+
+    def known(self, symbol):
+        """
+        Args:
+            symbol (str): stock ticker
+
+        Returns:
+            bool: whether the server has data for the symbol
+        """
+        return self.universe is None or symbol.upper() in self.known_symbols
+
+    def fault(self, path, query):
+        """
+        Decides whether to answer a request with an injected fault: one of the
+        ``failures`` next requests (503), a request naming one of the
+        ``fail_symbols`` (500), one of the next ``stalls[symbol]`` requests
+        naming a symbol (answered ``stall_time`` late), a request over the
+        ``rate_limit`` (429) or one of the ``error_rate`` of the requests
+        picked at random (500)
+
+        Args:
+            path (str): request path below the base URL
+            query (dict): parsed query string, as from parse_qs
+
+        Returns:
+            tuple: HTTP status to fail with (None to answer normally) and
+                seconds to wait before answering
+        """
+        symbols = set(query.get("symbols", [""])[0].upper().split(","))
+        for endpoint, pattern in ROUTES:
+            match = pattern.match(path)
+            if match and "symbol" in match.groupdict():
+                symbols.add(match.group("symbol").upper())
+        with self.lock:
+            if self.failures > 0:
+                self.failures -= 1
+                return 503, 0.0
+            if symbols & self.fail_symbols:
+                return 500, 0.0
+            if self.rate_limit is not None:
+                # token bucket holding up to a second of requests
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (
+                    now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1:
+                    return 429, 0.0
+                self.tokens -= 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return 500, 0.0
+            stalled = [symbol for symbol in symbols
+                       if self.stalls.get(symbol, 0) > 0]
+            for symbol in stalled:
+                self.stalls[symbol] -= 1
+            return None, self.stall_time if stalled else 0.0
+
+    def route(self, path, query=None):
+        """
+        Args:
+            path (str): request path below the base URL
+            query (dict): parsed query string, as from parse_qs
+
+        Returns:
+            object: JSON payload for the path, or None for a 404
+        """
+        for endpoint, pattern in ROUTES:
+            match = pattern.match(path)
+            if match:
+                kwargs = match.groupdict()
+                if endpoint == "batch":
+                    kwargs["query"] = query or {}
+                return getattr(self, endpoint)(**kwargs)
+        return None
+
+    @lru_cache(maxsize=4096)
+    def history(self, symbol):
+        return make_synthetic_history(HISTORY_BARS["5y"],
+                                      seed=symbol_seed(symbol), end=self.today)
+
+    def chart(self, symbol, range):
+        if range not in HISTORY_BARS or not self.known(symbol):
+            return None
+        return make_chart_payload(self.history(symbol).tail(HISTORY_BARS[range]))
+
+    def earnings(self, symbol):
+        if not self.known(symbol):
+            return None
+        return make_earnings_payload(symbol, today=self.today)
+
+    def dividends(self, symbol, range):
+        if not self.known(symbol):
+            return None
+        return make_dividends_payload(symbol, today=self.today)
+
+    def ref_symbols(self):
+        return [{
+            "symbol": symbol,
+            "name": "Synthetic {}".format(symbol),
+            "date": self.today.strftime("%Y-%m-%d"),
+            "isEnabled": True,
+            "type": "cs",
+        } for symbol in self.universe_symbols]
+
+    def batch(self, query):
+        symbols = query.get("symbols", [""])[0].split(",")
+        types = query.get("types", [""])[0].split(",")
+        range = query.get("range", ["1m"])[0]
+        if len(symbols) > BATCH_SIZE:
+            return None
+        payloads = {}
+        for symbol in filter(self.known, filter(None, symbols)):
+            payload = {}
+            for data_type in types:
+                if data_type == "earnings":
+                    payload[data_type] = self.earnings(symbol)
+                elif data_type in ("chart", "dividends"):
+                    payload[data_type] = getattr(self, data_type)(symbol, range)
+            payloads[symbol.upper()] = payload
+        return payloads
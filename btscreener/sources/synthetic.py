@@ -0,0 +1,181 @@
+"""
+Deterministic synthetic market data, shaped like the IEX Finance payloads
+used by :mod:`btscreener.sources.iex`, for tests and local stand-ins
+"""
+import zlib
+import datetime
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def symbol_seed(symbol):
+    """
+    :param symbol: stock ticker
+    :type: str
+    :return: a random seed that is stable across processes and runs
+    :type: int
+    """
+    return zlib.crc32(symbol.upper().encode())
+
+
+def make_synthetic_history(bars, seed=0, start="2015-01-02", end=None):
+    """
+    Creates a deterministic random walk shaped like a load_historical table
+    :param bars: number of daily bars to generate
+    :type: int
+    :param seed: random seed
+    :type: int
+    :param start: date of the first bar
+    :type: str
+    :param end: date of the last bar, takes precedence over start
+    :type: str
+    :return: table with date, open, high, low, close and volume
+    :type: pd.DataFrame
+    """
+    rng = np.random.RandomState(seed)
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))), 2)
+    prev_close = np.concatenate([close[:1], close[:-1]])
+    open = np.round(prev_close * (1 + rng.normal(0, 0.005, bars)), 2)
+    high = np.round(np.maximum(open, close) * (
+        1 + np.abs(rng.normal(0, 0.01, bars))), 2)
+    low = np.round(np.minimum(open, close) * (
+        1 - np.abs(rng.normal(0, 0.01, bars))), 2)
+    dates = _business_days(bars, start, end)
+    return pd.DataFrame({
+        "date": dates,
+        "open": open,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.randint(100000, 1000000, bars),
+    })
+
+
+@lru_cache(maxsize=64)
+def _business_days(bars, start, end):
+    """ The calendar of a history, shared by the histories of a universe as
+    building it takes longer than the random walk """
+    if end is not None:
+        return pd.bdate_range(end=end, periods=bars)
+    return pd.bdate_range(start, periods=bars)
+
+
+def make_synthetic_symbols(size):
+    """
+    :param size: number of tickers
+    :type: int
+    :return: made up tickers, S0000, S0001 and so on
+    :type: list(str)
+    """
+    return ["S{:04d}".format(i) for i in range(size)]
+
+
+def make_synthetic_universe(size, bars, start="2015-01-02", end=None):
+    """
+    Creates deterministic histories for a universe of made up tickers
+    :param size: number of tickers
+    :type: int
+    :param bars: number of daily bars of each history
+    :type: int
+    :param start: date of the first bar
+    :type: str
+    :param end: date of the last bar, takes precedence over start
+    :type: str
+    :return: make_synthetic_history tables keyed by ticker, each seeded by
+        its ticker
+    :type: OrderedDict
+    """
+    return OrderedDict((symbol, make_synthetic_history(
+        bars, seed=symbol_seed(symbol), start=start, end=end))
+        for symbol in make_synthetic_symbols(size))
+
+
+def make_chart_payload(history):
+    """
+    :param history: table from make_synthetic_history
+    :type: pd.DataFrame
+    :return: records like the IEX chart endpoint returns
+    :type: list(dict)
+    """
+    records = history.assign(date=history["date"].dt.strftime("%Y-%m-%d"))
+    records["change"] = records["close"].diff().fillna(0.0).round(2)
+    records["label"] = history["date"].dt.strftime("%b %d, %y")
+    return records.to_dict("records")
+
+
+def _quarter_dates(today, quarters, offset):
+    """ Dates one quarter apart going back from today, offset into the
+    quarter by a number of days """
+    last = pd.Timestamp(today) - pd.DateOffset(days=offset)
+    return [(last - pd.DateOffset(months=3 * i)).date()
+            for i in range(quarters)]
+
+
+def make_earnings_payload(symbol, today=None):
+    """
+    :param symbol: stock ticker
+    :type: str
+    :param today: date to generate the past four reports up to
+    :type: datetime.date
+    :return: payload like the IEX earnings endpoint returns
+    :type: dict
+    """
+    rng = np.random.RandomState(symbol_seed(symbol))
+    today = today or datetime.date.today()
+    earnings = []
+    for report_date in _quarter_dates(today, 4, rng.randint(1, 90)):
+        estimate = round(rng.uniform(0.1, 3.0), 2)
+        actual = round(estimate + rng.normal(0, 0.1), 2)
+        earnings += [{
+            "actualEPS": actual,
+            "consensusEPS": estimate,
+            "estimatedEPS": estimate,
+            "announceTime": "AMC" if rng.rand() < 0.5 else "BTO",
+            "numberOfEstimates": int(rng.randint(1, 30)),
+            "EPSSurpriseDollar": round(actual - estimate, 2),
+            "EPSReportDate": report_date.strftime("%Y-%m-%d"),
+            "fiscalPeriod": "Q{} {}".format(
+                (report_date.month - 1) // 3 + 1, report_date.year),
+            "fiscalEndDate": (report_date - datetime.timedelta(30)).strftime(
+                "%Y-%m-%d"),
+        }]
+    return {"symbol": symbol.upper(), "earnings": earnings}
+
+
+def make_dividends_payload(symbol, quarters=20, today=None):
+    """
+    :param symbol: stock ticker
+    :type: str
+    :param quarters: number of quarterly dividends to generate
+    :type: int
+    :param today: date to generate past dividends up to
+    :type: datetime.date
+    :return: records like the IEX dividends endpoint returns, empty for about
+        half of all symbols
+    :type: list(dict)
+    """
+    rng = np.random.RandomState(symbol_seed(symbol) + 1)
+    if rng.rand() < 0.5:
+        return []
+    today = today or datetime.date.today()
+    amount = round(rng.uniform(0.05, 1.0), 2)
+    dividends = []
+    for ex_date in _quarter_dates(today, quarters, rng.randint(1, 90)):
+        dividends += [{
+            "exDate": ex_date.strftime("%Y-%m-%d"),
+            "paymentDate": (ex_date + datetime.timedelta(14)).strftime(
+                "%Y-%m-%d"),
+            "recordDate": (ex_date + datetime.timedelta(2)).strftime(
+                "%Y-%m-%d"),
+            "declaredDate": (ex_date - datetime.timedelta(10)).strftime(
+                "%Y-%m-%d"),
+            "amount": amount,
+            "flag": "",
+            "type": "Dividend income",
+            "qualified": "Q",
+            "indicated": "",
+        }]
+    return dividends
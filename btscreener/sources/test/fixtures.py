@@ -0,0 +1,16 @@
+import pytest
+
+from btscreener.sources import iex
+from btscreener.sources.stubserver import StubIEXServer
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    """ A local IEX stand-in that the loaders are pointed at """
+    with StubIEXServer() as server:
+        base_url = iex.BASE_URL
+        iex.BASE_URL = server.base_url
+        try:
+            yield server
+        finally:
+            iex.BASE_URL = base_url
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+import pandas as pd
+
+from btscreener.sources.iex import (
+    load_historical, load_dividends, load_earnings, RequestException
+)
+from btscreener.sources.aioiex import AsyncIEXClient, load_universe
+
+from .fixtures import *
+
+SYMBOLS = ["AAPL", "MSFT", "SPY", "KO", "XOM", "GE", "F", "T"]
+
+
+def test_load_universe(stub_server):
+    loaded = load_universe(SYMBOLS, lookback="3m")
+    assert list(loaded) == SYMBOLS
+    for symbol, (hist, dividends, earnings) in loaded.items():
+        pd.testing.assert_frame_equal(hist,
+                                      load_historical(symbol, lookback="3m"))
+        pd.testing.assert_frame_equal(earnings, load_earnings(symbol))
+        expected_dividends = load_dividends(symbol)
+        if expected_dividends is None:
+            assert dividends is None
+        else:
+            pd.testing.assert_frame_equal(dividends, expected_dividends)
+
+
+def test_concurrency_limit(stub_server):
+    stub_server.latency = 0.05
+    stub_server.max_in_flight = 0
+    try:
+        load_universe(SYMBOLS * 4, lookback="5d", concurrency=6)
+    finally:
+        stub_server.latency = 0.0
+    assert 1 < stub_server.max_in_flight <= 6
+
+
+def test_unknown_endpoint(stub_server):
+    async def run():
+        async with AsyncIEXClient() as client:
+            await client.load_historical("AAPL", lookback="10y")
+
+    with pytest.raises(RequestException):
+        asyncio.run(run())
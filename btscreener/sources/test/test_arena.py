@@ -0,0 +1,89 @@
+import pickle
+from multiprocessing import Pool
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from btscreener.sources import arena as arena_module
+from btscreener.sources.arena import PriceArena
+from btscreener.sources.store import STORE_COLUMNS
+from btscreener.sources.synthetic import make_synthetic_history, symbol_seed
+
+SYMBOLS = ["AAPL", "MSFT", "SPY", "KO"]
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return {symbol: make_synthetic_history(250 + 10 * i,
+                                           seed=symbol_seed(symbol))
+            for i, symbol in enumerate(SYMBOLS)}
+
+
+@pytest.fixture
+def arena(tables):
+    with PriceArena.publish(dict(tables, NONE=None)) as arena:
+        yield arena
+
+
+def last_close(args):
+    handle, symbol = args
+    return PriceArena.attach(handle).table(symbol)["close"].iloc[-1]
+
+
+def test_round_trip(tables, arena):
+    assert arena.symbols == SYMBOLS
+    attached = PriceArena.attach(pickle.loads(pickle.dumps(arena.handle)))
+    for symbol in SYMBOLS:
+        table = attached.table(symbol)
+        expected = tables[symbol][["date"] + STORE_COLUMNS]
+        pd.testing.assert_frame_equal(table, expected, check_dtype=False)
+    assert attached.table("NONE") is None
+
+
+def test_handle_is_small(tables, arena):
+    # the handle does not grow with the number of bars
+    assert len(pickle.dumps(arena.handle)) < 512
+    assert arena.handle.bars == sum(len(table.index)
+                                    for table in tables.values())
+
+
+def test_read_only(arena):
+    dates, values = PriceArena.attach(arena.handle).arrays("SPY")
+    with pytest.raises(ValueError):
+        values[0, 0] = 0.0
+    table = PriceArena.attach(arena.handle).table("SPY")
+    table.loc[0, "close"] = 0.0
+    assert arena.arrays("SPY")[1][0, STORE_COLUMNS.index("close")] != 0.0
+    del dates, values
+
+
+def test_workers(tables, arena):
+    with Pool(2) as p:
+        closes = p.map(last_close, [(arena.handle, symbol)
+                                    for symbol in SYMBOLS])
+    np.testing.assert_array_equal(
+        closes, [tables[symbol]["close"].iloc[-1] for symbol in SYMBOLS])
+
+
+def test_close(tables):
+    arena = PriceArena.publish(tables)
+    handle = arena.handle
+    arena.close()
+    arena.close()
+    arena_module._ATTACHED.pop(handle.name, None)
+    with pytest.raises(FileNotFoundError):
+        PriceArena.attach(handle)
+
+
+def test_attached_limit(tables, monkeypatch):
+    monkeypatch.setattr(arena_module, "MAX_ATTACHED", 2)
+    arenas = [PriceArena.publish(tables) for _ in range(3)]
+    try:
+        for arena in arenas:
+            PriceArena.attach(arena.handle)
+        assert list(arena_module._ATTACHED) == [arena.handle.name
+                                                for arena in arenas[1:]]
+    finally:
+        for arena in arenas:
+            arena.close()
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from btscreener.sources.iex import (
+    BATCH_SIZE, load_historical, load_dividends, load_earnings, load_batch,
+    load_universe
+)
+from btscreener.sources.store import BarStore
+
+from .fixtures import *
+
+SYMBOLS = ["AAPL", "MSFT", "SPY", "KO", "XOM", "GE", "F", "T"]
+
+
+def assert_same(actual, expected, **kwargs):
+    if expected is None:
+        assert actual is None
+    else:
+        pd.testing.assert_frame_equal(actual, expected, **kwargs)
+
+
+def test_load_universe(stub_server):
+    requests_before = stub_server.requests
+    loaded = load_universe(SYMBOLS, lookback="3m")
+    assert stub_server.requests - requests_before == 2
+    assert list(loaded) == SYMBOLS
+    for symbol, (hist, dividends, earnings) in loaded.items():
+        assert_same(hist, load_historical(symbol, lookback="3m"))
+        assert_same(dividends, load_dividends(symbol))
+        assert_same(earnings, load_earnings(symbol))
+
+
+def test_batch_size(stub_server):
+    symbols = ["SYM{}".format(i) for i in range(BATCH_SIZE + 1)]
+    requests_before = stub_server.requests
+    payloads = load_batch(symbols, ["chart"], lookback="5d")
+    assert stub_server.requests - requests_before == 2
+    assert sorted(payloads) == sorted(symbols)
+
+
+def test_load_universe_store(stub_server, tmpdir):
+    store = BarStore(str(tmpdir))
+    loaded = load_universe(SYMBOLS, lookback="3m", store=store)
+    for symbol, (hist, _, _) in loaded.items():
+        last = stub_server.history(symbol)["date"].iloc[-1]
+        assert store.metadata(symbol)["last"] == str(last.date())
+        # the store keeps every column as float
+        assert_same(hist, store.load(symbol, "3m", None), check_dtype=False)
+
+    # everything is stored and current, so only the calendars are fetched
+    requests_before = stub_server.requests
+    load_universe(SYMBOLS, lookback="3m", store=store)
+    assert stub_server.requests - requests_before == 1
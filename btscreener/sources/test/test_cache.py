@@ -0,0 +1,84 @@
+from multiprocessing import Pool
+
+import pytest
+import pandas as pd
+
+from btscreener.sources import iex
+from btscreener.sources.cache import ResponseCache
+
+from .fixtures import *
+
+SYMBOLS = ["AAPL", "MSFT", "SPY", "KO"]
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = ResponseCache(str(tmpdir.join("responses.db")))
+    previous = iex.CACHE
+    iex.CACHE = cache
+    try:
+        yield cache
+    finally:
+        iex.CACHE = previous
+
+
+def test_cache_hits(stub_server, cache):
+    requests_before = stub_server.requests
+    first = iex.load_earnings("AAPL")
+    second = iex.load_earnings("AAPL")
+    pd.testing.assert_frame_equal(first, second)
+    assert stub_server.requests - requests_before == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_revalidates(stub_server, cache):
+    cache.ttls["earnings"] = 0
+    first = iex.load_earnings("AAPL")
+    requests_before = stub_server.requests
+    second = iex.load_earnings("AAPL")
+    # the stale entry is revalidated with its ETag instead of downloaded
+    assert stub_server.requests - requests_before == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_cache_batch_ttl(cache):
+    assert cache.ttl("chart,earnings") == cache.ttls["chart"]
+    assert cache.ttl("unknown") == 0
+    assert cache.ttl(None) == 0
+
+
+def test_cache_eviction(stub_server, cache):
+    cache.max_entries = 2
+    iex.load_earnings("AAPL")
+    iex.load_earnings("MSFT")
+    iex.load_earnings("AAPL")
+    iex.load_earnings("SPY")
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evicted"] == 1
+    # MSFT was the least recently used
+    requests_before = stub_server.requests
+    iex.load_earnings("AAPL")
+    iex.load_earnings("SPY")
+    assert stub_server.requests == requests_before
+    iex.load_earnings("MSFT")
+    assert stub_server.requests == requests_before + 1
+
+
+def test_cache_pool(stub_server, cache):
+    with Pool(4) as p:
+        first = p.map(iex.load_earnings, SYMBOLS * 4)
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == len(SYMBOLS) * 4
+    assert stats["entries"] == len(SYMBOLS)
+
+    requests_before = stub_server.requests
+    with Pool(4) as p:
+        second = p.map(iex.load_earnings, SYMBOLS)
+    assert stub_server.requests == requests_before
+    for expected, actual in zip(first, second):
+        pd.testing.assert_frame_equal(expected, actual)
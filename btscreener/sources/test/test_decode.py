@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from btscreener.sources import iex
+from btscreener.sources.iex import (
+    HISTORICAL_DATE_COLUMNS, DIVIDEND_DATE_COLUMNS, EARNINGS_DATE_COLUMNS,
+    parse_date, decode_historical, decode_dividends, decode_earnings, loads
+)
+from btscreener.sources.synthetic import (
+    make_synthetic_history, make_chart_payload, make_earnings_payload,
+    make_dividends_payload
+)
+
+
+def reference_decode(records, date_columns):
+    """ The per-cell decoding the loaders used to do """
+    df = pd.DataFrame(records)
+    df[date_columns] = df[date_columns].applymap(parse_date)
+    return df
+
+
+def test_decode_historical():
+    payload = make_chart_payload(make_synthetic_history(300))
+    pd.testing.assert_frame_equal(
+        decode_historical(payload),
+        reference_decode(payload, HISTORICAL_DATE_COLUMNS))
+
+
+def test_decode_calendars():
+    payload = make_earnings_payload("AAPL")
+    pd.testing.assert_frame_equal(
+        decode_earnings(payload),
+        reference_decode(payload["earnings"], EARNINGS_DATE_COLUMNS))
+    payload = make_dividends_payload("KO", quarters=8)
+    assert payload
+    pd.testing.assert_frame_equal(
+        decode_dividends(payload),
+        reference_decode(payload, DIVIDEND_DATE_COLUMNS))
+
+
+def test_decode_bad_values():
+    payload = make_dividends_payload("KO", quarters=4)
+    payload[0]["exDate"] = "not a date"
+    payload[1]["paymentDate"] = ""
+    payload[2]["amount"] = "n/a"
+    del payload[3]["recordDate"]
+    df = decode_dividends(payload)
+    assert df["exDate"].dtype == "datetime64[ns]"
+    assert pd.isnull(df.loc[0, "exDate"])
+    assert pd.isnull(df.loc[1, "paymentDate"])
+    assert pd.isnull(df.loc[3, "recordDate"])
+    assert np.isnan(df.loc[2, "amount"])
+    assert df["amount"].dtype == float
+    assert df["exDate"].notnull().sum() == 3
+
+
+def test_decode_empty():
+    assert decode_historical([]) is None
+    assert decode_dividends([]) is None
+    assert decode_earnings({}) is None
+
+
+def test_loads(monkeypatch):
+    text = json.dumps({"close": float("nan"), "volume": 10})
+    assert np.isnan(loads(text)["close"])
+    monkeypatch.setattr(iex, "orjson", None)
+    assert loads(text.encode())["volume"] == 10
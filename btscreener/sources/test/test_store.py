@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+import pandas as pd
+
+from btscreener.sources.store import BarStore, STORE_COLUMNS
+from btscreener.sources.synthetic import make_synthetic_history
+
+TODAY = datetime.date(2019, 3, 1)
+
+
+@pytest.fixture
+def history():
+    table = make_synthetic_history(400, start="2017-09-01")
+    # pretend the feed's last bar is today
+    return table[table["date"] <= pd.Timestamp(TODAY)].reset_index(drop=True)
+
+
+class FakeChart(object):
+    """ Serves ranges of a history as of a given day and counts requests """
+
+    range_bars = {"5d": 5, "1m": 21, "3m": 63, "1y": 252}
+
+    def __init__(self, history, today):
+        self.history = history
+        self.today = today
+        self.requests = []
+
+    def __call__(self, rng):
+        self.requests += [rng]
+        available = self.history[self.history["date"] <= pd.Timestamp(
+            self.today)]
+        return available.tail(self.range_bars[rng]).reset_index(drop=True)
+
+
+def test_store_roundtrip(tmpdir, history):
+    store = BarStore(str(tmpdir))
+    store.write("aapl", history)
+    table = store.read("AAPL")
+    pd.testing.assert_frame_equal(table, history[["date"] + STORE_COLUMNS],
+                                  check_dtype=False)
+    index = store.index()
+    assert list(index.index) == ["AAPL"]
+    assert index.loc["AAPL", "bars"] == len(history.index)
+
+
+def test_store_appends_tail(tmpdir, history):
+    store = BarStore(str(tmpdir))
+    yesterday = TODAY - datetime.timedelta(1)
+    first = store.load("AAPL", "3m", FakeChart(history, yesterday),
+                       today=yesterday)
+    fetch = FakeChart(history, TODAY)
+    second = store.load("AAPL", "3m", fetch, today=TODAY)
+    assert fetch.requests == ["5d"]
+    assert second["date"].iloc[-1] == pd.Timestamp(TODAY)
+    assert second["date"].iloc[-2] == first["date"].iloc[-1]
+
+    # nothing is missing on a second run the same day
+    fetch = FakeChart(history, TODAY)
+    third = store.load("AAPL", "3m", fetch, today=TODAY)
+    assert fetch.requests == []
+    pd.testing.assert_frame_equal(third, second)
+
+
+def test_store_longer_lookback(tmpdir, history):
+    store = BarStore(str(tmpdir))
+    store.load("AAPL", "3m", FakeChart(history, TODAY), today=TODAY)
+    fetch = FakeChart(history, TODAY)
+    table = store.load("AAPL", "1y", fetch, today=TODAY)
+    assert fetch.requests == ["1y"]
+    assert table["date"].iloc[0] >= pd.Timestamp(
+        TODAY - datetime.timedelta(366))
+
+
+def test_store_adjusted_history(tmpdir, history):
+    store = BarStore(str(tmpdir))
+    yesterday = TODAY - datetime.timedelta(1)
+    store.load("AAPL", "3m", FakeChart(history, yesterday), today=yesterday)
+
+    split = history.copy()
+    split[STORE_COLUMNS[:4]] /= 2.0
+    fetch = FakeChart(split, TODAY)
+    table = store.load("AAPL", "3m", fetch, today=TODAY)
+    assert fetch.requests == ["5d", "3m"]
+    pd.testing.assert_series_equal(
+        table["close"], fetch("3m")["close"], check_names=False)
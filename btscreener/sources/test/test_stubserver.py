@@ -0,0 +1,63 @@
+import pytest
+
+from btscreener.sources import iex
+from btscreener.sources.iex import (
+    RequestException, load_symbols, load_historical, load_universe
+)
+from btscreener.sources.stubserver import StubIEXServer
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """ Points the loaders at a stub server made with the given settings """
+    servers = []
+    monkeypatch.setattr(iex, "RETRIES", 0)
+
+    def serve(**kwargs):
+        server = StubIEXServer(**kwargs).start()
+        servers.append(server)
+        monkeypatch.setattr(iex, "BASE_URL", server.base_url)
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+def test_universe(serve):
+    serve(universe=150)
+    symbols = load_symbols()
+    assert symbols[:2] == ["S0000", "S0001"]
+    assert len(symbols) == 150
+    loaded = load_universe(symbols + ["AAPL"], lookback="1m")
+    assert all(loaded[symbol][0] is not None for symbol in symbols)
+    assert loaded["AAPL"] == (None, None, None)
+    with pytest.raises(RequestException):
+        load_historical("AAPL")
+
+
+def test_error_rate(serve):
+    server = serve(error_rate=1.0)
+    with pytest.raises(RequestException):
+        load_historical("AAPL")
+    assert server.stats()["statuses"] == {500: 1}
+
+
+def test_rate_limit(serve):
+    server = serve(rate_limit=2)
+    load_historical("AAPL")
+    load_historical("MSFT")
+    with pytest.raises(RequestException):
+        load_historical("KO")
+    stats = server.stats()
+    assert stats["requests"] == 3
+    assert stats["statuses"] == {200: 2, 429: 1}
+    server.reset_stats()
+    assert server.stats()["requests"] == 0
+
+
+def test_latency(serve):
+    server = serve(latency=0.05, latency_jitter=0.05)
+    load_historical("AAPL")
+    stats = server.stats()
+    assert 0.05 <= stats["p50"] == stats["p99"] < 1.0
@@ -1,5 +1,8 @@
 import datetime
 
+import numpy as np
+import pandas as pd
+
 
 def yield_period_ydays(dates, after=datetime.date.today(), period=91):
     """
@@ -40,3 +43,50 @@ def yield_period_ydays(dates, after=datetime.date.today(), period=91):
 
         year = after.year if (after_yday < yday) else (after.year + 1)
         yield (datetime.date(year, 1, 1) + datetime.timedelta(yday - 1))
+
+
+def next_period_dates(dates, symbols, after=None, period=91):
+    """
+    Does what yield_period_ydays does for the events of many symbols at once,
+    with array operations instead of a scan per window, and keeps the
+    earliest date guessed for each symbol
+    :param dates: dates of past events, the most recent first within each
+        symbol like the IEX payloads list them
+    :type: pd.Series
+    :param symbols: symbol of each event, aligned with dates
+    :type: pd.Series
+    :param after: the years of the guessed dates are adjusted to make them
+        less than this date, defaults to today
+    :type: datetime.date
+    :param period: number of days to divide the year into, defaults to quarters
+    :type: int
+    :returns: earliest guessed date of each symbol, in order of first appearance
+    :type: pd.Series
+    """
+    after = after or datetime.date.today()
+    freq = int(365 / period)
+    dates = pd.to_datetime(pd.Series(np.asarray(dates)))
+    symbols = np.asarray(symbols)
+    ydays = dates.dt.dayofyear.values
+    # the last window takes the days left over by the others, but like in
+    # yield_period_ydays it stops short of day 366
+    windows = np.minimum(ydays // period, freq - 1)
+    valid = dates.notnull().values & (ydays < 366)
+    events = pd.DataFrame({
+        "symbol": symbols[valid],
+        "window": windows[valid],
+        "yday": ydays[valid],
+    })
+    # the first event of each window is the most recent
+    first = events.drop_duplicates(["symbol", "window"]).set_index(
+        ["symbol", "window"])["yday"]
+    grid = pd.MultiIndex.from_product([pd.unique(symbols), range(freq)],
+                                      names=["symbol", "window"])
+    # windows without events get the guess yield_period_ydays makes for them
+    yday = first.reindex(grid).fillna(31 + period).values.astype(int)
+    after_yday = after.timetuple().tm_yday
+    years = np.where(after_yday < yday, after.year, after.year + 1)
+    guesses = ((years - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+               + (yday - 1).astype("timedelta64[D]"))
+    return pd.Series(guesses, index=grid).groupby(level="symbol",
+                                                  sort=False).min()
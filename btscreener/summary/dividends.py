@@ -2,7 +2,7 @@ from collections import OrderedDict
 
 import pandas as pd
 
-from .dateutil import yield_period_ydays
+from .dateutil import yield_period_ydays, next_period_dates
 
 
 def make_dividend_summary(dividend_history):
@@ -27,3 +27,32 @@ def make_dividend_summary(dividend_history):
         ("dividend_period", 91),
         ("next_ex_date", next_ex_date),
     ]))
+
+
+def make_dividend_summaries(dividend_histories, after=None):
+    """
+    Creates the make_dividend_summary of every symbol of a universe at once,
+    with grouped operations over one table instead of a call per symbol.
+    :param dividend_histories: tables of past dividend payments of every
+        symbol stacked together, with a "symbol" column
+    :type: pd.DataFrame
+    :param after: date the next dividends are guessed after, defaults to today
+    :type: datetime.date
+    :return: table of summary data indexed by symbol, in order of first
+        appearance
+    :type: pd.DataFrame
+    """
+    symbols = dividend_histories["symbol"]
+    grouped = dividend_histories.groupby("symbol", sort=False)
+    # the payments are listed most recent first, like make_dividend_summary
+    # expects them
+    last_amounts = dividend_histories.drop_duplicates("symbol").set_index(
+        "symbol")["amount"]
+    next_ex_dates = next_period_dates(dividend_histories["exDate"], symbols,
+                                      after=after)
+    return pd.DataFrame(OrderedDict([
+        ("last_ex_date", grouped["exDate"].max()),
+        ("last_dividend_amount", last_amounts),
+        ("dividend_period", 91),
+        ("next_ex_date", next_ex_dates.dt.date),
+    ]), index=pd.Index(pd.unique(symbols), name="symbol"))
@@ -2,7 +2,7 @@ from collections import OrderedDict
 
 import pandas as pd
 
-from .dateutil import yield_period_ydays
+from .dateutil import yield_period_ydays, next_period_dates
 
 
 def make_earnings_summary(earnings_history):
@@ -23,3 +23,26 @@ def make_earnings_summary(earnings_history):
         ("last_report_date", max(last_report_dates)),
         ("next_report_date", min(next_report_dates)),
     ]))
+
+
+def make_earnings_summaries(earnings_histories, after=None):
+    """
+    Creates the make_earnings_summary of every symbol of a universe at once,
+    with grouped operations over one table instead of a call per symbol.
+    :param earnings_histories: tables of past earnings reports of every
+        symbol stacked together, with a "symbol" column
+    :type: pd.DataFrame
+    :param after: date the next reports are guessed after, defaults to today
+    :type: datetime.date
+    :return: table of summary data indexed by symbol, in order of first
+        appearance
+    :type: pd.DataFrame
+    """
+    symbols = earnings_histories["symbol"]
+    grouped = earnings_histories.groupby("symbol", sort=False)
+    next_report_dates = next_period_dates(earnings_histories["EPSReportDate"],
+                                          symbols, after=after)
+    return pd.DataFrame(OrderedDict([
+        ("last_report_date", grouped["EPSReportDate"].max()),
+        ("next_report_date", next_report_dates),
+    ]), index=pd.Index(pd.unique(symbols), name="symbol"))
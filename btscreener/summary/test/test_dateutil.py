@@ -0,0 +1,32 @@
+import datetime
+
+import pytest
+import pandas as pd
+
+from btscreener.summary.dateutil import yield_period_ydays, next_period_dates
+
+
+@pytest.mark.parametrize("period", [30, 91, 182])
+@pytest.mark.parametrize("after", [
+    datetime.date(2018, 1, 1),
+    datetime.date(2018, 6, 29),
+    datetime.date(2018, 12, 31),
+])
+def test_next_period_dates(period, after):
+    histories = {
+        "A": [datetime.date(2017, 8, 10), datetime.date(2017, 5, 11),
+              datetime.date(2017, 2, 9), datetime.date(2016, 11, 10)],
+        "B": [datetime.date(2017, 12, 28)],
+        # day 366 of a leap year falls in no window
+        "C": [datetime.date(2016, 12, 31), datetime.date(2016, 3, 1)],
+    }
+    dates = pd.Series([date for history in histories.values()
+                       for date in history])
+    symbols = pd.Series([symbol for symbol, history in histories.items()
+                         for _ in history])
+    actual = next_period_dates(dates, symbols, after=after, period=period)
+    assert list(actual.index) == list(histories)
+    for symbol, history in histories.items():
+        expected = min(yield_period_ydays(history, after=after,
+                                          period=period))
+        assert actual[symbol] == pd.Timestamp(expected)
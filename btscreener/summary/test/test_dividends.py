@@ -29,3 +29,23 @@ def test_dividend_summary(dividend_history):
     assert summary.last_dividend_amount == 0.63
     assert summary.dividend_period == 91
     assert summary.next_ex_date > datetime.date.today()
+
+
+def test_dividend_summaries(dividend_history):
+    from btscreener.summary.dividends import make_dividend_summaries
+
+    later = dividend_history.assign(exDate=datetime.date(2016, 2, 29),
+                                    amount=0.57)
+    histories = pd.concat([
+        dividend_history.assign(symbol="A"),
+        pd.concat([dividend_history, later]).assign(symbol="B"),
+    ], ignore_index=True)
+    summaries = make_dividend_summaries(histories)
+    assert list(summaries.index) == ["A", "B"]
+    for symbol, history in histories.groupby("symbol"):
+        expected = make_dividend_summary(history)
+        actual = summaries.loc[symbol]
+        assert actual.last_ex_date == expected.last_ex_date
+        assert actual.last_dividend_amount == expected.last_dividend_amount
+        assert actual.dividend_period == expected.dividend_period
+        assert actual.next_ex_date == expected.next_ex_date
@@ -47,4 +47,25 @@ def test_earnings_summary(earnings_history):
     summary = make_earnings_summary(earnings_history)
     print(summary)
     assert summary.last_report_date == datetime.date(year=2017, month=5, day=2)
-    assert summary.next_report_date > datetime.date.today()
\ No newline at end of file
+    assert summary.next_report_date > datetime.date.today()
+
+def test_earnings_summaries(earnings_history):
+    from btscreener.summary.earnings import make_earnings_summaries
+
+    # with the report dates as decode_earnings loads them
+    history = earnings_history.assign(
+        EPSReportDate=pd.to_datetime(earnings_history["EPSReportDate"]))
+    histories = pd.concat([
+        history.assign(symbol="A"),
+        history.iloc[1:].assign(symbol="B"),
+    ], ignore_index=True)
+    summaries = make_earnings_summaries(histories)
+    assert list(summaries.index) == ["A", "B"]
+    for symbol, history in histories.groupby("symbol"):
+        expected = make_earnings_summary(history)
+        actual = summaries.loc[symbol]
+        assert actual.last_report_date == expected.last_report_date
+        assert actual.next_report_date == expected.next_report_date
+        # a Timestamp, as the collection schema stores it
+        assert type(actual.next_report_date) is pd.Timestamp
+        assert type(expected.next_report_date) is pd.Timestamp
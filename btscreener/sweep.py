@@ -0,0 +1,124 @@
+import logging
+import argparse
+import os
+import json
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+from btscreener.run import get_symbols
+from btscreener.collector.checkpoint import Checkpoint
+from btscreener.collector.columnar import write_arrow
+from btscreener.collector.sweep import (
+    run_sweep, summarize_sweep, DEFAULT_LOOKBACK, DEFAULT_CELLS_PER_JOB
+)
+from btscreener.sources.store import BarStore
+
+logger = logging.getLogger(__name__)
+
+
+def parse_grid_arg(text):
+    """
+    Args:
+        text (str): parameter and comma separated values, e.g. "factor=2,3"
+
+    Returns:
+        tuple: parameter name and list of values, parsed as JSON where they
+            can be
+    """
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(
+            "expected NAME=VALUE[,VALUE...], got {!r}".format(text))
+
+    def parse(value):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+
+    return name.strip(), [parse(value.strip()) for value in values.split(",")]
+
+
+parser = argparse.ArgumentParser(description="""
+Backtests the BreakoutStrategy against a group of symbols for every cell of a
+parameter grid, e.g.
+
+    --grid factor=2,3,4 --grid period=7,10 --grid max_entry_td=-1,0,4
+
+Finished cells are checkpointed, so an interrupted sweep can be resumed. The
+results of every cell and their averages over the symbols are saved to the
+sweep directory.
+""", formatter_class=argparse.RawDescriptionHelpFormatter)
+
+parser.add_argument('-v', '--verbose', action='count', default=0,
+                    help="Logging verbosity level")
+parser.add_argument("--group",
+                    choices=["faves", "dji"],
+                    default="faves",
+                    help="symbol group to backtest")
+parser.add_argument("--grid",
+                    type=parse_grid_arg,
+                    action="append",
+                    required=True,
+                    help="strategy parameter and the values to try")
+parser.add_argument("--lookback",
+                    default=DEFAULT_LOOKBACK,
+                    help="history each cell is backtested over")
+parser.add_argument("--pool-size",
+                    type=int,
+                    default=os.cpu_count(),
+                    help="pool size for multiprocessing")
+parser.add_argument("--cells-per-job",
+                    type=int,
+                    default=DEFAULT_CELLS_PER_JOB,
+                    help="cells of a symbol backtested in one pool job")
+parser.add_argument("--store",
+                    help="directory of a local bar store")
+parser.add_argument("--resume",
+                    action="store_true",
+                    help="resume the sweep from its checkpoint, skipping the "
+                         "cells already finished")
+parser.add_argument("--sweep-dir",
+                    default="sweeps",
+                    help="directory of the sweep checkpoint and results")
+
+if __name__ == "__main__":
+    import sys
+
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(logging.DEBUG)
+    consoleHandler = logging.StreamHandler(stream=sys.stdout)
+    consoleHandler.setFormatter(logging.Formatter())
+
+    args = parser.parse_args()
+
+    v_count = args.verbose if args.verbose < 3 else 3
+    # 0 - ERROR, 1 - WARNING, 2 - INFO, 3 - DEBUG
+    consoleHandler.setLevel(logging.ERROR - (10 * v_count))
+    rootLogger.addHandler(consoleHandler)
+
+    grid = dict(args.grid)
+    name = "{}_{}_sweep".format(datetime.date.today(), args.group)
+    checkpoint = Checkpoint(os.path.join(args.sweep_dir,
+                                         name + ".checkpoint"))
+    os.makedirs(args.sweep_dir, exist_ok=True)
+    if not args.resume:
+        checkpoint.clear()
+
+    store = BarStore(args.store) if args.store else None
+    results = run_sweep(get_symbols(args.group), grid,
+                        pool_size=args.pool_size, checkpoint=checkpoint,
+                        lookback=args.lookback, store=store,
+                        cells_per_job=args.cells_per_job)
+    summary = summarize_sweep(results, params=list(grid))
+
+    results_path = os.path.join(args.sweep_dir, name + ".parquet")
+    logger.info("Saving sweep results: {}".format(results_path))
+    write_arrow(pa.Table.from_pandas(results, preserve_index=False),
+                results_path)
+
+    with pd.option_context('display.max_rows', None,
+                           'display.max_columns', None):
+        logger.info(summary)
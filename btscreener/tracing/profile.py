@@ -0,0 +1,160 @@
+"""
+Aggregates the span records of a traced run into timing tables.
+"""
+import logging
+import os
+import glob
+import json
+import pstats
+
+import numpy as np
+import pandas as pd
+
+from .spans import SYMBOL_STAGE
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_EDGES = [0.0, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1.0,
+                   3.0, 10.0, np.inf]
+"""list(float): edges in seconds of the buckets of the stage histograms"""
+
+RECORD_FIELDS = ["pid", "symbol", "stage", "seconds", "count", "maxrss"]
+"""list(str): fields of a span record"""
+
+
+def load_records(trace_dir):
+    """
+    Args:
+        trace_dir (str): directory of the records of a traced run
+
+    Returns:
+        pd.DataFrame: the RECORD_FIELDS of every record of every process
+    """
+    records = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, "spans-*.jsonl"))):
+        with open(path) as fobj:
+            records += [json.loads(line) for line in fobj if line.strip()]
+    return pd.DataFrame(records, columns=RECORD_FIELDS)
+
+
+def summarize_stages(records):
+    """
+    Args:
+        records (pd.DataFrame): load_records result
+
+    Returns:
+        pd.DataFrame: number of records, number of spans, total, mean,
+            percentiles and maximum seconds of each stage, costliest first.
+            A record is the sum of the spans of one symbol, or a span that
+            belongs to no symbol.
+    """
+    grouped = records.groupby("stage")["seconds"]
+    summary = pd.DataFrame({
+        "records": grouped.size(),
+        "spans": records.groupby("stage")["count"].sum(),
+        "total": grouped.sum(),
+        "mean": grouped.mean(),
+        "p50": grouped.quantile(0.5),
+        "p90": grouped.quantile(0.9),
+        "p99": grouped.quantile(0.99),
+        "max": grouped.max(),
+    })
+    return summary.sort_values("total", ascending=False)
+
+
+def stage_histograms(records, edges=HISTOGRAM_EDGES):
+    """
+    Args:
+        records (pd.DataFrame): load_records result
+        edges (list(float)): bucket edges in seconds
+
+    Returns:
+        pd.DataFrame: number of records of each stage in each bucket, with a
+            column per bucket named by its upper edge
+    """
+    labels = ["<{:g}s".format(edge) for edge in edges[1:-1]] + [
+        ">={:g}s".format(edges[-2])]
+    buckets = pd.cut(records["seconds"], edges, right=False, labels=labels)
+    return pd.crosstab(records["stage"], buckets).reindex(
+        columns=labels, fill_value=0)
+
+
+def symbol_timings(records):
+    """
+    Args:
+        records (pd.DataFrame): load_records result
+
+    Returns:
+        pd.DataFrame: seconds of each stage, with a row per symbol, slowest
+            symbol first
+    """
+    records = records[records["symbol"].notnull()]
+    timings = records.pivot_table(index="symbol", columns="stage",
+                                  values="seconds", aggfunc="sum")
+    if SYMBOL_STAGE in timings:
+        columns = [SYMBOL_STAGE] + [column for column in timings.columns
+                                    if column != SYMBOL_STAGE]
+        timings = timings[columns].sort_values(SYMBOL_STAGE, ascending=False)
+    return timings
+
+
+def worker_memory(records):
+    """
+    Args:
+        records (pd.DataFrame): load_records result
+
+    Returns:
+        pd.DataFrame: peak resident memory in MB and number of symbols of each
+            process
+    """
+    grouped = records.groupby("pid")
+    return pd.DataFrame({
+        "peak_rss_mb": grouped["maxrss"].max() / 2 ** 20,
+        "symbols": grouped["symbol"].nunique(),
+    })
+
+
+def merge_profiles(trace_dir, path):
+    """
+    Merges the cProfile stats of every process into one file
+
+    Args:
+        trace_dir (str): directory of the records of a traced run
+        path (str): file to write the merged stats to
+
+    Returns:
+        str: path of the merged stats, None if no symbol was profiled
+    """
+    paths = sorted(glob.glob(os.path.join(trace_dir, "cprofile-*.prof")))
+    if not paths:
+        return None
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(path)
+    return path
+
+
+def write_profile(trace_dir, prefix):
+    """
+    Writes the timing tables of a traced run next to each other, as
+    prefix.timings.csv (per symbol), prefix.stages.csv (summary),
+    prefix.histogram.csv, prefix.workers.csv and prefix.prof (cProfile)
+
+    Args:
+        trace_dir (str): directory of the records of a traced run
+        prefix (str): path the files start with
+
+    Returns:
+        pd.DataFrame: summarize_stages result
+    """
+    records = load_records(trace_dir)
+    summary = summarize_stages(records)
+    summary.to_csv(prefix + ".stages.csv")
+    stage_histograms(records).to_csv(prefix + ".histogram.csv")
+    symbol_timings(records).to_csv(prefix + ".timings.csv")
+    worker_memory(records).to_csv(prefix + ".workers.csv")
+    profile_path = merge_profiles(trace_dir, prefix + ".prof")
+    logger.info("Wrote profile of {} records to {}.*".format(
+        len(records.index), prefix))
+    if profile_path is not None:
+        logger.info("Wrote cProfile stats: {}".format(profile_path))
+    return summary
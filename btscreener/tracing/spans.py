@@ -0,0 +1,243 @@
+"""
+Timing spans of the stages of a collection.
+
+Code marks a stage with ``with span("backtest.run"):``, or a function with the
+traced decorator. Spans cost next to nothing until tracing is started, after
+which every process of the run records them: pool workers forked afterwards
+inherit the Tracer, and each process appends its records to its own file in
+the trace directory, so the records of all workers can be aggregated once
+they are gone.
+
+Spans inside a trace_symbol block are summed per symbol and stage, and written
+when the block ends. Other spans, e.g. the batch requests of a whole chunk,
+are recorded one by one.
+"""
+import logging
+import os
+import json
+import time
+import zlib
+import resource
+import threading
+import cProfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_STAGE = "total"
+"""str: stage spanning all the work on one symbol"""
+
+RECORDS_FORMAT = "spans-{pid}.jsonl"
+"""str: file name of the span records of a process"""
+
+PROFILE_FORMAT = "cprofile-{pid}.prof"
+"""str: file name of the cProfile stats of a process"""
+
+_tracer = None
+
+
+class Tracer(object):
+    """
+    Records the spans of the process it lives in, and of its forked children
+    """
+
+    def __init__(self, trace_dir, profile_rate=0.0):
+        """
+        Args:
+            trace_dir (str): directory of the records, created if needed
+            profile_rate (float): fraction of the symbols run under cProfile,
+                picked by their ticker so every run profiles the same ones
+        """
+        self.trace_dir = trace_dir
+        self.profile_rate = profile_rate
+        os.makedirs(trace_dir, exist_ok=True)
+        self._reset()
+
+    def __repr__(self):
+        return "Tracer({!r})".format(self.trace_dir)
+
+    def _reset(self):
+        # a forked child starts over with its own records, lock and profiler
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.records = []
+        self.profiler = None
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            self._reset()
+
+    def add(self, stage, seconds):
+        """
+        Args:
+            stage (str): name of the stage
+            seconds (float): time the stage took
+        """
+        self._check_pid()
+        stages = getattr(self.local, "stages", None)
+        if stages is not None:
+            total = stages.setdefault(stage, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+        else:
+            with self.lock:
+                self.records.append((None, stage, seconds, 1))
+
+    def sampled(self, symbol):
+        """
+        Args:
+            symbol (str): stock ticker
+
+        Returns:
+            bool: whether the work on the symbol is run under cProfile
+        """
+        return (self.profile_rate > 0 and
+                zlib.crc32(symbol.encode()) % 10000 < self.profile_rate * 1e4)
+
+    @contextmanager
+    def symbol(self, symbol):
+        """
+        Sums the spans of the block per stage, and records them for the
+        symbol when the block ends. Nested blocks count towards the outer one.
+
+        Args:
+            symbol (str): stock ticker being worked on
+        """
+        self._check_pid()
+        if getattr(self.local, "stages", None) is not None:
+            yield
+            return
+        self.local.stages = OrderedDict()
+        profiler = None
+        if self.sampled(symbol):
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+            profiler = self.profiler
+        start_time = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start_time
+            stages, self.local.stages = self.local.stages, None
+            with self.lock:
+                self.records.append((symbol, SYMBOL_STAGE, seconds, 1))
+                self.records += [(symbol, stage, total, count) for stage, (
+                    total, count) in stages.items()]
+            self.flush()
+            if profiler is not None:
+                profiler.dump_stats(os.path.join(
+                    self.trace_dir, PROFILE_FORMAT.format(pid=self.pid)))
+
+    def flush(self):
+        """
+        Appends the records so far to the file of this process, with the peak
+        resident memory of the process
+        """
+        self._check_pid()
+        with self.lock:
+            records, self.records = self.records, []
+        if not records:
+            return
+        # ru_maxrss is in kilobytes on Linux
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        path = os.path.join(self.trace_dir,
+                            RECORDS_FORMAT.format(pid=self.pid))
+        with open(path, "a") as fobj:
+            for symbol, stage, seconds, count in records:
+                fobj.write(json.dumps(OrderedDict([
+                    ("pid", self.pid),
+                    ("symbol", symbol),
+                    ("stage", stage),
+                    ("seconds", seconds),
+                    ("count", count),
+                    ("maxrss", maxrss),
+                ])) + "\n")
+
+
+def start_tracing(trace_dir, profile_rate=0.0):
+    """
+    Starts recording spans in this process and the processes it forks from
+    now on
+
+    Args:
+        trace_dir (str): directory of the records
+        profile_rate (float): fraction of the symbols run under cProfile
+
+    Returns:
+        Tracer: the tracer recording the spans
+    """
+    global _tracer
+    _tracer = Tracer(trace_dir, profile_rate=profile_rate)
+    logger.info("Tracing to {}".format(trace_dir))
+    return _tracer
+
+
+def stop_tracing():
+    """
+    Writes the records left in this process and stops recording
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = None
+
+
+@contextmanager
+def span(stage):
+    """
+    Times a block as a stage, when tracing
+
+    Args:
+        stage (str): name of the stage, dotted for the stages within another,
+            e.g. "backtest.run"
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(stage, time.perf_counter() - start_time)
+
+
+def traced(stage):
+    """
+    Args:
+        stage (str): name of the stage
+
+    Returns:
+        function: decorator timing each call of a function as the stage
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def trace_symbol(symbol):
+    """
+    Attributes the spans of a block to a symbol, when tracing
+
+    Args:
+        symbol (str): stock ticker being worked on, None to leave the spans
+            unattributed
+    """
+    tracer = _tracer
+    if tracer is None or symbol is None:
+        yield
+        return
+    with tracer.symbol(symbol):
+        yield
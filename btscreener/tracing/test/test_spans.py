@@ -0,0 +1,102 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from btscreener.sources.synthetic import make_synthetic_history
+from btscreener.chart.basket import BasketStrategy
+from btscreener.chart.backtest import run_backtest
+from btscreener.tracing.spans import (
+    start_tracing, stop_tracing, span, traced, trace_symbol, SYMBOL_STAGE
+)
+from btscreener.tracing.profile import (
+    load_records, summarize_stages, stage_histograms, symbol_timings,
+    worker_memory, write_profile
+)
+
+
+@pytest.fixture
+def trace_dir(tmpdir):
+    path = str(tmpdir.join("run.trace"))
+    yield path
+    stop_tracing()
+
+
+@traced("work.traced")
+def work(symbol):
+    with trace_symbol(symbol):
+        with span("work.outer"):
+            with span("work.inner"):
+                time.sleep(0.001)
+            with span("work.inner"):
+                pass
+    return os.getpid()
+
+
+def test_not_tracing(trace_dir):
+    work("AAPL")
+    assert not os.path.exists(trace_dir)
+
+
+def test_spans(trace_dir):
+    start_tracing(trace_dir)
+    work("AAPL")
+    with span("unattributed"):
+        pass
+    stop_tracing()
+    records = load_records(trace_dir)
+    by_stage = records.set_index(["symbol", "stage"])
+    assert by_stage.loc[("AAPL", "work.inner"), "count"] == 2
+    assert by_stage.loc[("AAPL", "work.inner"), "seconds"] >= 0.001
+    assert (by_stage.loc[("AAPL", SYMBOL_STAGE), "seconds"] >=
+            by_stage.loc[("AAPL", "work.outer"), "seconds"])
+    # the decorator is outside the symbol block
+    unattributed = records[records["symbol"].isnull()]
+    assert sorted(unattributed["stage"]) == ["unattributed", "work.traced"]
+
+    summary = summarize_stages(records)
+    assert summary.loc["work.inner", "spans"] == 2
+    assert summary.loc["work.inner", "records"] == 1
+    histograms = stage_histograms(records)
+    assert (histograms.sum(axis=1) == summary["records"].reindex(
+        histograms.index)).all()
+    timings = symbol_timings(records)
+    assert list(timings.index) == ["AAPL"]
+    assert timings.columns[0] == SYMBOL_STAGE
+
+
+def test_pool_workers(trace_dir):
+    start_tracing(trace_dir)
+    symbols = ["S{}".format(i) for i in range(6)]
+    with multiprocessing.get_context("fork").Pool(2) as p:
+        pids = set(p.map(work, symbols, chunksize=1))
+    stop_tracing()
+    records = load_records(trace_dir)
+    assert set(records["symbol"].dropna()) == set(symbols)
+    assert set(records["pid"]) == pids
+    memory = worker_memory(records)
+    assert memory["symbols"].sum() == len(symbols)
+    assert (memory["peak_rss_mb"] > 0).all()
+
+
+def test_backtest_stages(trace_dir):
+    start_tracing(trace_dir)
+    with trace_symbol("S0"):
+        run_backtest(make_synthetic_history(100), BasketStrategy)
+    stop_tracing()
+    stages = set(load_records(trace_dir)["stage"])
+    assert {"backtest.setup", "backtest.run", "backtest.summary",
+            "indicator.adbreakout", "indicator.tdsequential"} <= stages
+
+
+def test_write_profile(trace_dir, tmpdir):
+    start_tracing(trace_dir, profile_rate=1.0)
+    work("AAPL")
+    stop_tracing()
+    prefix = str(tmpdir.join("run"))
+    summary = write_profile(trace_dir, prefix)
+    assert SYMBOL_STAGE in summary.index
+    for ext in ["stages.csv", "histogram.csv", "timings.csv", "workers.csv",
+                "prof"]:
+        assert os.path.exists("{}.{}".format(prefix, ext))